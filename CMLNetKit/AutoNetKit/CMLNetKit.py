@@ -2,11 +2,18 @@
 # (c) 2020-2023 Piotr Wojciechowski <piotr@it-playground.pl>
 # GNU General Public License v3.0+ (see COPYING or https://www.gnu.org/licenses/gpl-3.0.txt)
 
-import netaddr
-import yaml
-from ciscoconfparse import CiscoConfParse
-from virl2_client import ClientLibrary
-from prettytable import PrettyTable
+import sys
+
+# Libraries that take long to import (virl2_client, netaddr, yaml, prettytable, asyncio) and the modules using them
+# are imported by the methods that need them, so listing the labs or printing the help starts fast
+from CMLNetKit.AutoNetKit.CMLNetKitConfigCache import CMLNetKitConfigCache
+from CMLNetKit.AutoNetKit.CMLNetKitInventory import CMLNetKitInventory
+from CMLNetKit.AutoNetKit.CMLNetKitOutput import CMLNetKitOutput
+from CMLNetKit.AutoNetKit.CMLNetKitPlatform import CMLNetKitInterfaceEdit
+from CMLNetKit.AutoNetKit.CMLNetKitPlatform import CMLNetKitPlatform
+from CMLNetKit.AutoNetKit.CMLNetKitProfiler import CMLNetKitProfiler
+from CMLNetKit.AutoNetKit.CMLNetKitState import CMLNetKitState
+from CMLNetKit.AutoNetKit.CMLNetKitTopology import CMLNetKitTopology
 
 
 class CMLNetKit(object):
@@ -15,101 +22,165 @@ class CMLNetKit(object):
 
     :param cml_options: Configuration stored in CMLNetKitConfig class.
     :type cml_options: CMLNetKitConfig class
+    :param cml_client: Client already connected to CML2 server that should be used instead of creating a new one
+    :type cml_client: virl2_client.ClientLibrary
+    :param lab_id: ID of the lab to process instead of the one stored in CMLNetKitConfig class
+    :type lab_id: str
+    :param profiler: Profiler recording the phases of the run
+    :type profiler: CMLNetKitProfiler
+    :param topology_cache: Topology cache shared with other instances instead of the one created from options
+    :type topology_cache: CMLNetKitTopologyCache
+    :param lab_catalog: Lab catalog shared with other instances instead of the one created from options
+    :type lab_catalog: CMLNetKitLabCatalog
+    :param states: Dictionary of lab titles and saved states of incremental mode shared with other instances
+    :type states: dict
+    :param config_templates: Parsed node configurations of the labs shared with other instances
+    :type config_templates: CMLNetKitConfigTemplates
     """
 
+    lab_id = None
     lab_conf = None
     lab_handler = None
+    lab_uploaded = None
+    cml_client = None
+    topology = None
+    profiler = None
+    state = None
+    _lab_configs = None
     _cmlnetkitconfig = None
+    _node_configs = None
+    _node_edits = None
+    _changed_nodes = None
+    _allocators = None
+    _topology_cache = None
+    _lab_catalog = None
+    _states = None
+    _config_templates = None
+    _lab_validator = None
+    _address_table = None
 
     lab_conf_changed = False
 
-    # Some static definitions
-    _node_types = ['iosv', 'csr1000v', 'iosxrv', 'iosxrv9000', 'nxosv', 'nxosv9000', 'cat8000v']
-    _node_iosv_fn = 'update_node_loopback_conf_iosv'
-    _node_csr1000v_fn = 'update_node_loopback_conf_csr1000v'
-    _node_types_fn = {}
-
-    _node_management_interface_name = {'iosv': 'GigabitEthernet0/0',
-                                       'csr1000v': 'GigabitEthernet1',
-                                       'iosxrv': 'MgmtEth0/0/CPU0/0',
-                                       'iosxrv9000': 'MgmtEth0/RP0/CPU0/0',
-                                       'nxosv': 'mgmt0',
-                                       'nxosv9000': 'mgmt0',
-                                       'iosvl2': 'GigabitEthernet0/0',
-                                       'asav': 'Management0/0',
-                                       'cat8000v': 'GigabitEthernet1',
-                                       }
-
-    _node_types_supported = ['iosv', 'csr1000v', 'iosxrv', 'iosxrv9000', 'nxosv', 'nxosv9000', 'asav', 'cat8000v']
-    _node_types_ignored = ['external_connector', 'iosvl2']
-
-    def __init__(self, cml_options):
+    # Node types are defined by platform profiles with the management interface name and the plans of changes
+    # of the interfaces, see CMLNetKitPlatform
+    _node_management_interface_name = CMLNetKitPlatform.management_interfaces()
+    _node_types_supported = CMLNetKitPlatform.supported()
+    _node_types_ignored = CMLNetKitPlatform.ignored()
+
+    # Fields of the rows written in machine-readable output formats
+    _labs_fields = ['lab_id', 'lab_title']
+    _ip_addresses_fields = ['lab_id', 'report', 'device', 'interface', 'address', 'peer_device', 'peer_interface',
+                            'peer_address']
+
+    def __init__(self, cml_options, cml_client=None, lab_id=None, profiler=None, topology_cache=None,
+                 lab_catalog=None, states=None, config_templates=None):
         super(CMLNetKit, self).__init__()
 
         self._cmlnetkitconfig = cml_options
-
-        # Define functions to call for particular device type identified by node_definition key in the node
-        # configuration downloaded from CML2 server. In some cases, we will call the dummy method because the proper
-        # method is not yet implemented. In other cases, the same method applies to more than one node type.
-        self._node_types_fn = {'update_node_loopback_conf_iosv': self.update_node_loopback_conf_iosv,
-                               'update_node_loopback_conf_csr1000v': self.update_node_loopback_conf_iosv,
-                               'update_node_loopback_conf_iosxrv': self.update_node_loopback_conf_iosxrv,
-                               'update_node_loopback_conf_iosxrv9000': self.update_node_loopback_conf_iosxrv,
-                               'update_node_loopback_conf_nxosv': self.update_node_loopback_conf_iosv,
-                               'update_node_loopback_conf_nxosv9000': self.update_node_loopback_conf_iosv,
-                               'update_node_loopback_conf_iosvl2': self.update_node_loopback_conf_iosv,
-                               'update_node_loopback_conf_asav': self.dummy,
-                               'update_node_loopback_conf_cat8000v': self.update_node_loopback_conf_iosv,
-                               'update_node_loopback_conf_external_connector': self.dummy,
-                               'update_node_management_conf_iosv': self.update_node_management_conf_iosv,
-                               'update_node_management_conf_csr1000v': self.update_node_management_conf_csr1000v,
-                               'update_node_management_conf_iosxrv': self.update_node_management_conf_iosxrv,
-                               'update_node_management_conf_iosxrv9000': self.update_node_management_conf_iosxrv9000,
-                               'update_node_management_conf_nxosv': self.update_node_management_conf_nxosv,
-                               'update_node_management_conf_nxosv9000': self.update_node_management_conf_nxosv,
-                               'update_node_management_conf_iosvl2': self.update_node_management_conf_iosvl2,
-                               'update_node_management_conf_asav': self.update_node_management_conf_asav,
-                               'update_node_management_conf_ccat8000v': self.update_node_management_conf_csr1000v,
-                               'update_node_management_conf_external_connector': self.dummy,
-                               'update_node_peer_interface_conf_iosv': self.update_node_interface_address_iosv,
-                               'update_node_peer_interface_conf_csr1000v': self.update_node_interface_address_iosv,
-                               'update_node_peer_interface_conf_iosxrv': self.update_node_interface_address_iosxrv,
-                               'update_node_peer_interface_conf_iosxrv9000': self.update_node_interface_address_iosxrv,
-                               'update_node_peer_interface_conf_asav': self.update_node_interface_address_iosv,
-                               'update_node_peer_interface_conf_nxosv': self.update_node_interface_address_iosv,
-                               'update_node_peer_interface_conf_nxosv9000': self.update_node_interface_address_iosv,
-                               'update_node_peer_interface_conf_cat8000v': self.update_node_interface_address_iosv,
-                               }
+        self.cml_client = cml_client
+        self.lab_id = lab_id if lab_id is not None else cml_options.lab_id
+        self.profiler = profiler if profiler is not None else CMLNetKitProfiler()
+        self._topology_cache = topology_cache
+        self._lab_catalog = lab_catalog
+        self._states = states
+        self._config_templates = config_templates
+        self._node_edits = {}
+        self._allocators = {}
+
+    def run(self):
+        """
+        Perform the operations requested in options: list the labs, list the IP addresses of the lab or update
+        the lab configuration.
+        """
+        if self._cmlnetkitconfig.input_file is not None:
+            self.process_lab_file()
+            return
 
         if self._cmlnetkitconfig.list_labs:
             self.print_labs()
-            exit(0)
+            return
 
-        if self._cmlnetkitconfig.lab_id is None:
+        if self.lab_id is None:
             self.print_labs()
-            exit(0)
+            return
+
+        if self._cmlnetkitconfig.list_ips:
+            self.lab_download()
+            self.print_lab_ip_addresses()
+            return
 
+        print(self.process_lab())
+
+    def process_lab(self):
+        """
+        Download the lab, update the nodes configurations and upload it as a new lab if anything was changed. In
+        in-place mode only the changed node configurations are updated in the downloaded lab.
+
+        :return: Result of processing the lab
+        :rtype: str
+        :raises requests.exceptions.HTTPError: if there was a transport error
+        """
         self.lab_download()
+        self.update_devices_confs()
+
+        if self.lab_conf_changed is not True:
+            self.save_state()
+            return "Lab configuration unchanged"
+
+        if self._cmlnetkitconfig.dry_run is True:
+            return "Dry Run mode: No changes applied to CML2 server"
+
+        if self._cmlnetkitconfig.in_place is True:
+            patched = self.lab_patch()
+            self.save_state()
+            return "Lab %s updated, %d node configurations changed" % (self.lab_id, patched)
+
+        self.lab_upload()
+        self.save_state()
+        return "Lab uploaded as " + self.lab_uploaded.id
+
+    def process_lab_file(self):
+        """
+        Read the lab topology from the file, update the nodes configurations and write the lab topology to the
+        output file. No connection to CML2 server is made. The topology is written even if nothing was changed, so
+        the output file always holds the result of the run.
+        """
+        self.lab_read(self._cmlnetkitconfig.input_file)
 
         if self._cmlnetkitconfig.list_ips:
             self.print_lab_ip_addresses()
-            exit(0)
+            return
 
         self.update_devices_confs()
 
-        if self.lab_conf_changed is True:
-            self.lab_upload()
-        else:
-            print("Lab configuration unchanged")
+        if self._cmlnetkitconfig.dry_run is True:
+            print("Dry Run mode: No changes written to the output file")
+            return
+
+        self.lab_write(self._cmlnetkitconfig.output_file)
+        self.save_state()
 
-    def dummy(self, *argv):
+    def _get_cml_client(self):
         """
-        This dummy method gets all the arguments and does nothing. Required for future methods implementations
-        when need to call variable name function.
+        Return the client connected to CML2 server. The client is created on first use and then shared by all
+        operations, so login, system readiness check and TLS handshake are done only once per run and the HTTP
+        connections are reused.
 
-        :param argv:
+        :return: Client connected to CML2 server
+        :rtype: virl2_client.ClientLibrary
+        :raises requests.exceptions.HTTPError: if there was a transport error
         """
-        pass
+        if self.cml_client is None:
+            from virl2_client import ClientLibrary
+
+            with self.profiler.phase('login'):
+                self.cml_client = ClientLibrary(url="https://" + self._cmlnetkitconfig.host,
+                                                username=self._cmlnetkitconfig.username,
+                                                password=self._cmlnetkitconfig.password,
+                                                ssl_verify=self._cmlnetkitconfig.ssl_verify)
+            with self.profiler.phase('system_ready'):
+                self.cml_client.is_system_ready(wait=True)
+        return self.cml_client
 
     def lab_download(self):
         """
@@ -120,20 +191,163 @@ class CMLNetKit(object):
         :raises requests.exceptions.HTTPError: if there was a transport error
         """
 
-        cl = ClientLibrary(url="https://" + self._cmlnetkitconfig.host, username=self._cmlnetkitconfig.username,
-                           password=self._cmlnetkitconfig.password,
-                           ssl_verify=self._cmlnetkitconfig.ssl_verify)
-        cl.is_system_ready(wait=True)
+        cl = self._get_cml_client()
         try:
-            self.lab_handler = cl.join_existing_lab(self._cmlnetkitconfig.lab_id)
-            self.lab_conf = yaml.safe_load(self.lab_handler.download())
+            if self._get_topology_cache() is None:
+                with self.profiler.phase('download'):
+                    self.lab_handler = cl.join_existing_lab(self.lab_id)
+                    topology = self.lab_handler.download()
+                self.lab_load(topology)
+                return
+
+            # The lab is not synchronized when joined, only its details are downloaded to revalidate the cached
+            # topology. Nodes are synchronized on first use, when the configurations are updated in place.
+            with self.profiler.phase('revalidate'):
+                self.lab_handler = cl.join_existing_lab(self.lab_id, sync_lab=False)
+                lab_details = self.lab_handler.details()
+            self._lab_validator = self._get_topology_cache().validator(lab_details)
+            if self.lab_load_cached(lab_details):
+                return
+            with self.profiler.phase('download'):
+                topology = self.lab_handler.download()
+            self.lab_load(topology, lab_details)
         except TypeError:
             print("TypeError: No lab_id provided. Use the -l option to provide the lab_id")
 
+    def lab_read(self, input_file):
+        """
+        Read the lab topology in YAML format from the file, as exported from CML2 server
+
+        :param input_file: Path to the file, or '-' to read from standard input
+        :type input_file: str
+        :raises OSError: if the file cannot be read
+        """
+        with self.profiler.phase('read'):
+            if input_file == '-':
+                topology = sys.stdin.read()
+            else:
+                with open(input_file) as f:
+                    topology = f.read()
+        self.lab_load(topology)
+
+    def lab_write(self, output_file):
+        """
+        Write the lab topology in YAML format to the file, it can be imported to CML2 server
+
+        :param output_file: Path to the file, or '-' to write to standard output
+        :type output_file: str
+        :raises OSError: if the file cannot be written
+        """
+        topology = self.lab_dump()
+        with self.profiler.phase('write'):
+            if output_file == '-':
+                sys.stdout.write(topology)
+            else:
+                with open(output_file, 'w') as f:
+                    f.write(topology)
+
+    def lab_load(self, topology, lab_details=None):
+        """
+        Parse the lab topology in YAML format and store it in self.lab_conf class variable. If the lab details are
+        provided and the topology cache is enabled, the parsed topology is stored in the cache.
+
+        :param topology: Lab topology in YAML format
+        :type topology: str
+        :param lab_details: Lab details returned by CML2 server when the topology was downloaded
+        :type lab_details: dict
+        """
+        from CMLNetKit.AutoNetKit.CMLNetKitYaml import CMLNetKitYaml
+
+        with self.profiler.phase('yaml_load') as phase:
+            self.lab_conf = CMLNetKitYaml.load(topology)
+        self._print_verbose("YAML parse time: %.3fs" % phase.elapsed)
+        # The topology is cached before it is indexed and updated, so the cache holds it as downloaded
+        if lab_details is not None and self._get_topology_cache() is not None:
+            with self.profiler.phase('cache_write'):
+                self._get_topology_cache().put(self.lab_id, lab_details, self.lab_conf)
+        self._index_lab()
+
+    def lab_load_cached(self, lab_details):
+        """
+        Load the lab topology from the topology cache if it is up to date and store it in self.lab_conf class
+        variable
+
+        :param lab_details: Lab details returned by CML2 server
+        :type lab_details: dict
+        :return: True if the topology was loaded from the cache, otherwise False
+        :rtype: bool
+        """
+        if self._get_topology_cache() is None:
+            return False
+        with self.profiler.phase('cache_read'):
+            lab_conf = self._get_topology_cache().get(self.lab_id, lab_details)
+        if lab_conf is None:
+            self.profiler.count('topology_cache_misses')
+            return False
+        self.profiler.count('topology_cache_hits')
+        self._print_verbose("Lab %s topology read from the cache" % self.lab_id)
+        self.lab_conf = lab_conf
+        self._index_lab()
+        return True
+
+    def _get_topology_cache(self):
+        """
+        Return the topology cache, created on first use
+
+        :return: Topology cache or None if the cache directory is not set
+        :rtype: CMLNetKitTopologyCache
+        """
+        if self._topology_cache is None and self._cmlnetkitconfig.cache_dir is not None:
+            from CMLNetKit.AutoNetKit.CMLNetKitTopologyCache import CMLNetKitTopologyCache
+
+            self._topology_cache = CMLNetKitTopologyCache(self._cmlnetkitconfig.cache_dir,
+                                                          '%s:%s' % (self._cmlnetkitconfig.host,
+                                                                     self._cmlnetkitconfig.port),
+                                                          self._cmlnetkitconfig.cache_max_size,
+                                                          self._cmlnetkitconfig.cache_max_age)
+        return self._topology_cache
+
+    def _index_lab(self):
+        """
+        Build the index of the lab topology stored in self.lab_conf class variable
+        """
+        with self.profiler.phase('topology_index'):
+            self.topology = CMLNetKitTopology(self.lab_conf)
+        # Configurations as loaded, to find the nodes changed by the run. Strings are immutable, so only the
+        # references are kept
+        self._lab_configs = [nodedef.get("configuration") for nodedef in self.lab_conf.get("nodes") or []]
+        self.profiler.count('nodes', len(self.lab_conf.get("nodes") or []))
+        self.profiler.count('links', len(self.lab_conf.get("links") or []))
+
+    def lab_dump(self):
+        """
+        Return the lab topology stored in self.lab_conf class variable in YAML format
+
+        :return: Lab topology in YAML format
+        :rtype: str
+        """
+        from CMLNetKit.AutoNetKit.CMLNetKitYaml import CMLNetKitYaml
+
+        with self.profiler.phase('yaml_dump') as phase:
+            topology = CMLNetKitYaml.dump(self.lab_conf)
+        self._print_verbose("YAML dump time: %.3fs" % phase.elapsed)
+        return topology
+
+    def _print_verbose(self, message):
+        """
+        Print the message on standard error if verbose mode is active. Standard output is not used, so the
+        messages are not mixed with the lab topology written to it.
+
+        :param message: Message to print
+        :type message: str
+        """
+        if self._cmlnetkitconfig.verbose is True:
+            print(message, file=sys.stderr)
+
     def lab_upload(self):
         """
         Upload topology from the self.lab_conf class variable to CML2 server as a new lab, except if
-        'dry run' mode is active.
+        'dry run' mode is active. The new lab is stored in self.lab_uploaded class variable.
 
         :raises requests.exceptions.HTTPError: if there was a transport error
         """
@@ -141,11 +355,44 @@ class CMLNetKit(object):
             print("Dry Run mode: No changes applied to CML2 server")
             return
 
-        cl = ClientLibrary(url="https://" + self._cmlnetkitconfig.host, username=self._cmlnetkitconfig.username,
-                           password=self._cmlnetkitconfig.password,
-                           ssl_verify=self._cmlnetkitconfig.ssl_verify)
-        cl.is_system_ready(wait=True)
-        self.lab_conf = cl.import_lab(topology=yaml.dump(self.lab_conf), title=self.lab_conf["lab"]["title"])
+        cl = self._get_cml_client()
+        topology = self.lab_dump()
+        with self.profiler.phase('upload'):
+            self.lab_uploaded = cl.import_lab(topology=topology, title=self.lab_conf["lab"]["title"])
+
+    def get_changed_node_configs(self):
+        """
+        Return the configurations of nodes changed since the lab was loaded
+
+        :return: List of tuples with node label and the new configuration
+        :rtype: list
+        """
+        return [(nodedef.get("label"), nodedef.get("configuration"))
+                for nodedef, lab_config in zip(self.lab_conf["nodes"], self._lab_configs)
+                if nodedef.get("configuration") != lab_config]
+
+    def lab_patch(self):
+        """
+        Update the changed node configurations in the downloaded lab on CML2 server, except if 'dry run' mode is
+        active. Only the configurations are sent, so the upload size depends on the number of changed nodes and
+        not on the size of the lab. Nodes are found by the label, as node IDs in downloaded topology are not the
+        IDs used by the server.
+
+        :return: Number of updated nodes
+        :rtype: int
+        :raises requests.exceptions.HTTPError: if there was a transport error
+        """
+        if self._cmlnetkitconfig.dry_run is True:
+            print("Dry Run mode: No changes applied to CML2 server")
+            return 0
+
+        changed_node_configs = self.get_changed_node_configs()
+        with self.profiler.phase('patch'):
+            for node_label, node_config in changed_node_configs:
+                # The config property is deprecated in virl2_client 2.5 and removed in later versions
+                self.lab_handler.get_node_by_label(node_label).configuration = node_config
+                self.profiler.count('node_config_patches')
+        return len(changed_node_configs)
 
     def update_bridge(self):
         """
@@ -167,9 +414,8 @@ class CMLNetKit(object):
         :returns: Array index for the node
         :rtype: Integer
         """
-        for nodenum, nodedef in enumerate(self.lab_conf["nodes"]):
-            if nodedef.get("label") == node_name:
-                return nodenum
+        self.profiler.count('topology_lookups')
+        return self.topology.node_index_by_label(node_name)
 
     def _get_node_index_by_id(self, node_id):
         """
@@ -180,9 +426,8 @@ class CMLNetKit(object):
         :returns: Array index for the node
         :rtype: Integer
         """
-        for nodenum, nodedef in enumerate(self.lab_conf["nodes"]):
-            if nodedef.get("id") == node_id:
-                return nodenum
+        self.profiler.count('topology_lookups')
+        return self.topology.node_index_by_id(node_id)
 
     def _get_node_label_by_id(self, node_id):
         """
@@ -193,24 +438,22 @@ class CMLNetKit(object):
         :returns: Array index for the node
         :rtype: String
         """
-        for nodenum, nodedef in enumerate(self.lab_conf["nodes"]):
-            if nodedef.get("id") == node_id:
-                return nodedef.get("label")
+        self.profiler.count('topology_lookups')
+        return self.topology.node_label_by_id(node_id)
 
-    def _get_interface_name_by_id(self, node_id, iface_id):
+    def _get_interface_name_by_id(self, node_index, iface_id):
         """
         Search for the interface in nodes definitions by the id and return the inteface configuration id when found
 
-        :param node_id: Node name
-        :type: node_id: str
+        :param node_index: Node index in the configuration list
+        :type: node_index: int
         :param iface_id: Interface id
         :type: iface_id: str
         :returns: Interface name
         :rtype: str
         """
-        for ifnum, ifdef in enumerate(self.lab_conf['nodes'][node_id]['interfaces']):
-            if ifdef.get("id") == iface_id:
-                return ifdef['label']
+        self.profiler.count('topology_lookups')
+        return self.topology.interface_label(self.lab_conf["nodes"][node_index].get("id"), iface_id)
 
     def _get_node_config(self, node_index):
         """
@@ -245,6 +488,94 @@ class CMLNetKit(object):
         """
         self.lab_conf["nodes"][node_index]["configuration"] = node_config
 
+    def _get_node_parsed_config(self, node_index):
+        """
+        Return the parsed startup configuration of the node shared by all update passes
+
+        :param node_index: Node index in the configuration list
+        :type node_index: int
+        :return: Parsed node configuration
+        :rtype: CMLNetKitParsedConfig or CMLNetKitConfParse
+        """
+        if self._node_configs is None:
+            self._node_configs = CMLNetKitConfigCache(self.lab_conf, self._cmlnetkitconfig.config_engine,
+                                                      self.profiler, self._get_config_templates())
+        return self._node_configs.get(node_index)
+
+    def _get_config_templates(self):
+        """
+        Return the parsed configurations of the lab as downloaded, kept by the long-running server while the lab is
+        not modified
+
+        :return: Dictionary of node indexes and parsed configurations, or None if they are not kept
+        :rtype: dict
+        """
+        if self._config_templates is None or self._lab_validator is None:
+            return None
+        return self._config_templates.get(self.lab_id, self._lab_validator, self._cmlnetkitconfig.config_engine)
+
+    def _get_node_edits(self, node_index):
+        """
+        Return the list of edits planned for the node configuration. Each edit is the tuple with the plan of
+        changes of the interface, the interface name and the values used in the plan.
+
+        :param node_index: Node index in the configuration list
+        :type node_index: int
+        :return: List of edits
+        :rtype: list
+        :raises KeyError: if node has no configuration
+        """
+        if "configuration" not in self.lab_conf["nodes"][node_index]:
+            raise KeyError("configuration")
+        return self._node_edits.setdefault(node_index, [])
+
+    @staticmethod
+    def apply_node_edits(node_parsed_config, node_edits):
+        """
+        Apply the edits to the parsed node configuration, in the order they were planned
+
+        :param node_parsed_config: The parsed node configuration
+        :type node_parsed_config: CMLNetKitParsedConfig or CMLNetKitConfParse
+        :param node_edits: List of edits
+        :type node_edits: list
+        """
+        for interface_edit, iface_name, values in node_edits:
+            interface_edit.apply(node_parsed_config, iface_name, values)
+
+    def _transform_node_configs(self):
+        """
+        Apply the planned edits to node configurations. With more than one job the configurations are parsed
+        and rewritten by worker processes and the changed ones are written back to lab configuration in the
+        order of nodes.
+        """
+        from CMLNetKit.AutoNetKit.CMLNetKitTransform import CMLNetKitTransform
+
+        jobs = self._cmlnetkitconfig.jobs
+        if jobs > 1 and len(self._node_edits) >= CMLNetKitTransform.min_nodes:
+            node_indexes = sorted(self._node_edits)
+            results = CMLNetKitTransform(self._cmlnetkitconfig, jobs).run(
+                [(self.lab_conf["nodes"][node_index]["configuration"], self._node_edits[node_index])
+                 for node_index in node_indexes])
+            self.profiler.count('node_config_parses', len(node_indexes))
+            for node_index, node_config in zip(node_indexes, results):
+                if node_config is not None:
+                    self.lab_conf["nodes"][node_index]["configuration"] = node_config
+                    self.lab_conf_changed = True
+            return
+
+        for node_index, node_edits in self._node_edits.items():
+            self.apply_node_edits(self._get_node_parsed_config(node_index), node_edits)
+
+    def _commit_node_configs(self):
+        """
+        Write the changed node configurations back to lab configuration
+        """
+        if self._node_configs is None:
+            return
+        with self.profiler.phase('commit'):
+            if self._node_configs.commit():
+                self.lab_conf_changed = True
+
     def _iface_ip_addr_defined(self, iface_conf=None):
         """
         Checks if IP address is defined in the provided interface configuration
@@ -254,14 +585,7 @@ class CMLNetKit(object):
         :return: False if IP address is not defined, otherwise return Tue
         :rtype: Bool
         """
-        if iface_conf is None:
-            return False
-        for config_line in iface_conf:
-            if "no ip address" in config_line:
-                return False
-            if "no ipv4 address" in config_line:
-                return False
-        return True
+        return CMLNetKitInterfaceEdit.ip_addr_defined(iface_conf)
 
     def _get_iface_ip_addr(self, iface_conf=None):
         """
@@ -274,6 +598,8 @@ class CMLNetKit(object):
         """
         if not self._iface_ip_addr_defined(iface_conf):
             return None
+        import netaddr
+
         for config_line in iface_conf:
             if "ip address" in config_line:
                 return netaddr.IPNetwork(config_line.lstrip().split(' ')[2] + '/' + config_line.lstrip().split(' ')[3])
@@ -288,568 +614,725 @@ class CMLNetKit(object):
         :raises requests.exceptions.HTTPError: if there was a transport error
         """
 
-        cl = ClientLibrary(url="https://" + self._cmlnetkitconfig.host, username=self._cmlnetkitconfig.username,
-                           password=self._cmlnetkitconfig.password,
-                           ssl_verify=self._cmlnetkitconfig.ssl_verify)
-        cl.is_system_ready(wait=True)
-        labs = cl.all_labs()
+        labs = [(lab['id'], lab['lab_title']) for lab in self.get_labs()]
+
+        if self._cmlnetkitconfig.output_format != 'table':
+            output = CMLNetKitOutput(self._cmlnetkitconfig.output_format, self._labs_fields)
+            for lab_id, lab_title in labs:
+                output.write({'lab_id': lab_id, 'lab_title': lab_title})
+            return
+
         print('\nLab ID\tLab Title')
-        for lab in labs:
-            print(lab.id + '\t' + lab.title)
+        for lab_id, lab_title in labs:
+            print(lab_id + '\t' + lab_title)
 
-    def print_lab_ip_addresses(self):
-        """
-        For selected lab read the configuration file and print to the console information on al addressed
+    def get_labs(self, refresh=False):
         """
+        Return the labs from the lab catalog matching the title, owner and state filters provided in options
 
-        self.print_lab_ip_peer_addresses()
-        self.print_lab_ip_loopback_addresses()
-        self.print_lab_ip_management_addresses()
+        :param refresh: Flag if the catalog is fetched from CML2 server even if the stored one is up to date
+        :type refresh: bool
+        :return: List of labs, each as dictionary with the catalog fields
+        :rtype: list
+        :raises requests.exceptions.HTTPError: if there was a transport error
+        """
+        catalog = self._get_lab_catalog()
+        if refresh:
+            labs = catalog.refresh(self._fetch_lab_tiles)
+        else:
+            labs = catalog.labs(self._fetch_lab_tiles, background=self._cmlnetkitconfig.background_refresh)
+        return self.select_labs(labs)
 
-    def print_lab_ip_peer_addresses(self):
+    def select_labs(self, labs):
         """
-        Print to the console information about IP addresses and link of L3 interfaces in the lab.
+        Return the labs matching the title, owner and state filters provided in options
+
+        :param labs: List of labs, each as dictionary with the catalog fields
+        :type labs: list
+        :rtype: list
         """
+        from CMLNetKit.AutoNetKit.CMLNetKitLabCatalog import CMLNetKitLabCatalog
 
-        # For each link we need to store 6 values. We use List of Dictionaries for this. Each link is described by
-        # following structure:
-        # {
-        #   DeviceA: String,
-        #   DeviceB: String,
-        #   InterfaceA: String,
-        #   InterfaceB: String,
-        #   IPAddressA: netaddr.IPNetwork,
-        #   IPAddressB: netaddr.IPNetwork
-        # }
-        links_database = []
+        return CMLNetKitLabCatalog.select(labs, self._cmlnetkitconfig.lab_title, self._cmlnetkitconfig.lab_owner,
+                                          self._cmlnetkitconfig.lab_state)
 
-        try:
-            for linknum, link in enumerate(self.lab_conf["links"]):
-                # We need to ignore connections to 'external_connector' and 'iosvl2' objects and continue to the
-                # next object on list
-                if self._get_node_type(
-                        self._get_node_index_by_id(link['n1'])) in self._node_types_ignored or self._get_node_type(
-                    self._get_node_index_by_id(link['n2'])) in self._node_types_ignored:
-                    continue
+    def _get_lab_catalog(self):
+        """
+        Return the lab catalog, created on first use
 
-                link_record = {
-                    'InterfaceA': self._get_interface_name_by_id(self._get_node_index_by_id(link["n1"]), link["i1"]),
-                    'InterfaceB': self._get_interface_name_by_id(self._get_node_index_by_id(link["n2"]), link["i2"]),
-                    'DeviceA': self._get_node_label_by_id(link["n1"]),
-                    'DeviceB': self._get_node_label_by_id(link["n2"]),
-                    'IPAddressA': None,
-                    'IPAddressB': None,
-                }
-
-                if self._get_node_type(
-                        self._get_node_index_by_id(link["n1"])) in self._node_types_supported:
-                    node_config = self._get_node_config(self._get_node_index_by_id(link["n1"]))
-                    node_parsed_config = CiscoConfParse(node_config.split('\n'))
-
-                    if self._iface_ip_addr_defined(
-                            node_parsed_config.find_children(
-                                r'^interface\s' + self._get_interface_name_by_id(self._get_node_index_by_id(link["n1"]),
-                                                                                 link["i1"]))):
-                        link_record['IPAddressA'] = self._get_iface_ip_addr(
-                            node_parsed_config.find_children(
-                                r'^interface\s' + self._get_interface_name_by_id(self._get_node_index_by_id(link["n1"]),
-                                                                                 link["i1"])))
-
-                if self._get_node_type(
-                        self._get_node_index_by_id(link["n2"])) in self._node_types_supported:
-                    node_config = self._get_node_config(self._get_node_index_by_id(link["n2"]))
-                    node_parsed_config = CiscoConfParse(node_config.split('\n'))
-                    if self._iface_ip_addr_defined(
-                            node_parsed_config.find_children(
-                                r'^interface\s' + self._get_interface_name_by_id(self._get_node_index_by_id(link["n2"]),
-                                                                                 link["i2"]))):
-                        link_record['IPAddressB'] = self._get_iface_ip_addr(
-                            node_parsed_config.find_children(
-                                r'^interface\s' + self._get_interface_name_by_id(self._get_node_index_by_id(link["n2"]),
-                                                                                 link["i2"])))
-
-                links_database.append(link_record)
-        except IndexError as e:
-            raise IndexError("peer-range: Not enough IP addresses provided")
+        :rtype: CMLNetKitLabCatalog
+        """
+        if self._lab_catalog is None:
+            from CMLNetKit.AutoNetKit.CMLNetKitLabCatalog import CMLNetKitLabCatalog
 
-        TOutput = PrettyTable()
-        TOutput.field_names = ['Device A', 'Interface A', 'IP Address A', 'Device B', 'Interface B', 'IP Address B']
-        for r in links_database:
-            TOutput.add_row(
-                [r['DeviceA'], r['InterfaceA'], r['IPAddressA'], r['DeviceB'], r['InterfaceB'], r['IPAddressB']])
-        print("\nL3 interfaces addressing")
-        print(TOutput)
+            self._lab_catalog = CMLNetKitLabCatalog(self._cmlnetkitconfig.cache_dir,
+                                                    '%s:%s %s' % (self._cmlnetkitconfig.host,
+                                                                  self._cmlnetkitconfig.port,
+                                                                  self._cmlnetkitconfig.username),
+                                                    self._cmlnetkitconfig.catalog_ttl)
+        return self._lab_catalog
 
-    def print_lab_ip_loopback_addresses(self):
-        """
-        Print to the console information about IP addresses assigned to loopback interfaces.
+    def _fetch_lab_tiles(self):
         """
-        # For each link we need to store 2 values. We use List of Dictionaries for this. Each link is described by
-        # following structure:
-        # {
-        #   Device: String,
-        #   LoopbackIP: String
-        # }
-        TOutput = PrettyTable()
-        TOutput.field_names = ['Device name', 'Loopback IP']
+        Fetch details of all labs from CML2 server with one request. The lab objects of virl2_client are not used,
+        as each of them downloads the whole lab topology.
 
-        for nodenum, nodedef in enumerate(self.lab_conf['nodes']):
+        :return: Response of CML2 API populate_lab_tiles endpoint
+        :rtype: dict
+        :raises requests.exceptions.HTTPError: if there was a transport error
+        """
+        if self._cmlnetkitconfig.use_async:
+            import asyncio
 
-            if self._get_node_type(nodenum) in self._node_types_supported:
-                interface_record = {'Device': nodedef['label'], 'LoopbackIPAddress': None}
+            return asyncio.run(self._fetch_lab_tiles_async())
 
-                node_config = self._get_node_config(nodenum)
-                node_parsed_config = CiscoConfParse(node_config.split('\n'))
+        cl = self._get_cml_client()
+        with self.profiler.phase('catalog'):
+            return self._api_get(cl, "populate_lab_tiles")
 
-                if self._iface_ip_addr_defined(node_parsed_config.find_children(r'^interface\sLoopback0')):
-                    interface_record['LoopbackIPAddress'] = self._get_iface_ip_addr(
-                        node_parsed_config.find_children(r'^interface\sLoopback0'))
-                else:
-                    interface_record['LoopbackIPAddress'] = None
-                TOutput.add_row([interface_record['Device'], interface_record['LoopbackIPAddress']])
+    @staticmethod
+    def _api_get(cl, path):
+        """
+        Send GET request to CML2 API endpoint that has no method in virl2_client, using the session of the client,
+        so the request is authenticated with its token and reuses its connections. virl2_client from version 2.5
+        to 2.10 keeps the session in the private _session attribute, an httpx.Client with the API base URL, so the
+        path is relative to /api/v0/. Older versions use requests and _url_for() and are not supported.
 
-        print("\nLoopback interfaces addressing")
-        print(TOutput)
+        :param cl: Client connected to CML2 server
+        :type cl: virl2_client.ClientLibrary
+        :param path: Path of the endpoint relative to the API base URL
+        :type path: str
+        :return: Decoded JSON response
+        :rtype: dict
+        :raises httpx.HTTPStatusError: if the server returned an error
+        """
+        response = cl._session.get(path)
+        response.raise_for_status()
+        return response.json()
 
-    def print_lab_ip_management_addresses(self):
+    async def _fetch_lab_tiles_async(self):
         """
-        Print to the console information about IP addresses assigned to management interfaces.
+        Fetch details of all labs from CML2 server with one request using the asyncio API client
+
+        :return: Response of CML2 API populate_lab_tiles endpoint
+        :rtype: dict
         """
-        # For each link we need to store 2 values. We use List of Dictionaries for this. Each link is described by
-        # following structure:
-        # {
-        #   Device: String,
-        #   ManagementIP: String
-        # }
-        TOutput = PrettyTable()
-        TOutput.field_names = ['Device name', 'Management IP']
+        from CMLNetKit.AutoNetKit.CMLNetKitAsync import CMLNetKitAsyncClient
 
-        for nodenum, nodedef in enumerate(self.lab_conf['nodes']):
+        async with CMLNetKitAsyncClient(self._cmlnetkitconfig, concurrency=self._cmlnetkitconfig.workers) as client:
+            with self.profiler.phase('catalog'):
+                return await client.lab_tiles()
+
+    def build_ip_inventory(self):
+        """
+        Build the table of IP addresses configured on Loopback0, management interface and all the interfaces of
+        the supported nodes. Each node configuration is parsed once and shared with the update passes.
 
+        :return: Table of IP addresses
+        :rtype: CMLNetKitInventory
+        """
+        inventory = CMLNetKitInventory()
+        for nodenum in range(len(self.lab_conf['nodes'])):
             if self._get_node_type(nodenum) in self._node_types_supported:
-                interface_record = {'Device': nodedef['label'], 'ManagementIPAddress': None}
+                self._add_node_to_ip_inventory(inventory, nodenum)
+        return inventory
 
-                node_config = self._get_node_config(nodenum)
-                node_parsed_config = CiscoConfParse(node_config.split('\n'))
+    def _add_node_to_ip_inventory(self, inventory, node_index):
+        """
+        Add IP addresses configured on Loopback0, management interface and all the interfaces of the node to
+        the table of IP addresses
 
-                if self._iface_ip_addr_defined(node_parsed_config.find_children(
-                        r'^interface\s' + self._node_management_interface_name[self._get_node_type(nodenum)])):
-                    interface_record['ManagementIPAddress'] = self._get_iface_ip_addr(
-                        node_parsed_config.find_children(
-                            r'^interface\s' + self._node_management_interface_name[self._get_node_type(nodenum)]))
-                else:
-                    interface_record['ManagementIPAddress'] = None
-                TOutput.add_row([interface_record['Device'], interface_record['ManagementIPAddress']])
+        :param inventory: Table of IP addresses
+        :type inventory: CMLNetKitInventory
+        :param node_index: Node index in the configuration list
+        :type node_index: int
+        """
+        nodedef = self.lab_conf['nodes'][node_index]
+        node_type = self._get_node_type(node_index)
+        node_parsed_config = self._get_node_parsed_config(node_index)
 
-        print("\nManagement interfaces addressing")
-        print(TOutput)
+        iface_names = ['Loopback0', self._node_management_interface_name[node_type]]
+        iface_names += [ifdef.get('label') for ifdef in nodedef.get('interfaces') or []]
+        for iface_name in iface_names:
+            iface_conf = node_parsed_config.find_children(CMLNetKitInterfaceEdit.parentspec(iface_name).pattern)
+            inventory.add(node_index, nodedef['label'], node_type, iface_name, self._get_iface_ip_addr(iface_conf))
 
-    def update_devices_confs(self):
+    def _get_link_ip_addresses(self, inventory, link):
         """
-        Iterates over the node lists. For known node types where configuration can be updated
-        it calls other methods
+        Return the devices, interfaces and IP addresses on both ends of the link
+
+        :param inventory: Table of IP addresses
+        :type inventory: CMLNetKitInventory
+        :param link: Link definition from lab configuration
+        :type link: dict
+        :return: Device, interface and IP address of A end followed by the same for B end, or None if the link
+            connects the ignored node type
+        :rtype: tuple
         """
+        node_a_index = self._get_node_index_by_id(link["n1"])
+        node_b_index = self._get_node_index_by_id(link["n2"])
+        node_a_type = self._get_node_type(node_a_index)
+        node_b_type = self._get_node_type(node_b_index)
 
-        if self._cmlnetkitconfig.update_bridge is True:
-            self.update_bridge()
+        # We need to ignore connections to 'external_connector' and 'iosvl2' objects
+        if node_a_type in self._node_types_ignored or node_b_type in self._node_types_ignored:
+            return None
 
-        if self._cmlnetkitconfig.update_loopback is True:
-            self.update_device_loopback_conf()
+        iface_a_name = self.topology.interface_label(link["n1"], link["i1"])
+        iface_b_name = self.topology.interface_label(link["n2"], link["i2"])
+        ip_addr_a = None
+        ip_addr_b = None
+        if node_a_type in self._node_types_supported:
+            ip_addr_a = inventory.address(node_a_index, iface_a_name)
+        if node_b_type in self._node_types_supported:
+            ip_addr_b = inventory.address(node_b_index, iface_b_name)
 
-        if self._cmlnetkitconfig.update_mgmt is True:
-            self.update_device_management_conf()
+        return (self._get_node_label_by_id(link["n1"]), iface_a_name, ip_addr_a,
+                self._get_node_label_by_id(link["n2"]), iface_b_name, ip_addr_b)
 
-        if self._cmlnetkitconfig.update_peer is True:
-            self.update_device_peer_interfaces_conf()
+    def print_lab_ip_addresses(self, output=None):
+        """
+        For selected lab read the configuration file and print to the console information on al addressed.
+        In machine-readable output formats the rows are written as soon as they are read.
 
-    def update_device_loopback_conf(self):
+        :param output: Writer of machine-readable output shared by many labs, created if not provided
+        :type output: CMLNetKitOutput
         """
-        Updates the Loopback interfaces configuration for nodes in the lab topology.
+        if self._cmlnetkitconfig.output_format != 'table':
+            if output is None:
+                output = CMLNetKitOutput(self._cmlnetkitconfig.output_format, self._ip_addresses_fields)
+            with self.profiler.phase('write_ip_addresses'):
+                self.write_lab_ip_addresses(output)
+            return
 
-        For each node it will call the platform specific method to update Loopback interface address
-        from provided subnet using the next available address for each device.
+        with self.profiler.phase('inventory'):
+            inventory = self.build_ip_inventory()
+        with self.profiler.phase('print_peer'):
+            self.print_lab_ip_peer_addresses(inventory)
+        with self.profiler.phase('print_loopback'):
+            self.print_lab_ip_loopback_addresses(inventory)
+        with self.profiler.phase('print_management'):
+            self.print_lab_ip_management_addresses(inventory)
+
+    def print_lab_ip_peer_addresses(self, inventory=None):
         """
-        ip = netaddr.IPNetwork(self._cmlnetkitconfig.loopback_subnet)
+        Print to the console information about IP addresses and link of L3 interfaces in the lab.
 
-        try:
-            for nodenum, nodedef in enumerate(self.lab_conf["nodes"]):
-                # We find the method to call using the self._node_types_fm dictionary
-                try:
-                    node_config = self._get_node_config(self._get_node_index_by_label(nodedef.get("label")))
-                    node_parsed_config = CiscoConfParse(node_config.split('\n'))
+        :param inventory: Table of IP addresses, built if not provided
+        :type inventory: CMLNetKitInventory
+        """
+        if inventory is None:
+            inventory = self.build_ip_inventory()
+        from prettytable import PrettyTable
 
-                    self._node_types_fn["update_node_loopback_conf_" + self._get_node_type(
-                        self._get_node_index_by_label(nodedef.get("label")))](node_parsed_config,
-                                                                              ip[nodenum + 1].__str__())
+        TOutput = PrettyTable()
+        TOutput.field_names = ['Device A', 'Interface A', 'IP Address A', 'Device B', 'Interface B', 'IP Address B']
 
-                    node_parsed_config.atomic()
-                    node_new_config = '\n'.join([i for i in node_parsed_config.ioscfg[0:]])
-                    self._set_node_config(self._get_node_index_by_label(nodedef.get("label")), node_new_config)
-                    self.lab_conf_changed = True
-                except TypeError as e:
-                    raise TypeError(e)
-                # No key found in self._node_types_fn
-                except KeyError as e:
-                    # For other than known and specified in self._node_types_fn node types do nothing just ignore
-                    continue
-                    # raise KeyError(e)
-                # Exception from CiscoConfParse constructor
-                except ValueError as e:
-                    raise ValueError(e)
+        for link in self.lab_conf["links"]:
+            link_ip_addresses = self._get_link_ip_addresses(inventory, link)
+            if link_ip_addresses is not None:
+                TOutput.add_row(list(link_ip_addresses))
 
-        except IndexError as e:
-            raise IndexError("lo-subnet: Not enough loopback addresses provided")
+        print("\nL3 interfaces addressing")
+        print(TOutput)
 
-    def update_device_management_conf(self):
+    def print_lab_ip_loopback_addresses(self, inventory=None):
         """
-        Updates the management interfaces configuration for nodes in the lab topology.
+        Print to the console information about IP addresses assigned to loopback interfaces.
 
-        For each node it will call the platform specific method to update Loopback interface address
-        from provided subnet using the next available address for each device.
+        :param inventory: Table of IP addresses, built if not provided
+        :type inventory: CMLNetKitInventory
         """
-        try:
-            for nodenum, nodedef in enumerate(self.lab_conf["nodes"]):
-                try:
-                    ip = netaddr.IPNetwork(self._cmlnetkitconfig.mgmt_range[nodenum])
-                except netaddr.AddrFormatError as e:
-                    raise ValueError("%s" % e)
-                except IndexError as e:
-                    raise IndexError("mgmt-range: Not enough management addresses provided")
-                ip.prefixlen = self._cmlnetkitconfig.mgmt_prefixlen
-
-                # We find the method to call using the self._node_types_fm dictionary
-                try:
-                    node_config = self._get_node_config(self._get_node_index_by_label(nodedef.get("label")))
-                    node_parsed_config = CiscoConfParse(node_config.split('\n'))
+        if inventory is None:
+            inventory = self.build_ip_inventory()
+        from prettytable import PrettyTable
 
-                    self._node_types_fn["update_node_management_conf_" + self._get_node_type(
-                        self._get_node_index_by_label(nodedef.get("label")))](node_parsed_config, ip.ip.__str__(),
-                                                                              ip.netmask.__str__())
+        TOutput = PrettyTable()
+        TOutput.field_names = ['Device name', 'Loopback IP']
+        for r in inventory:
+            if r['interface'] == 'Loopback0':
+                TOutput.add_row([r['device'], r['address']])
 
-                    node_parsed_config.atomic()
-                    node_new_config = '\n'.join([i for i in node_parsed_config.ioscfg[0:]])
-                    self._set_node_config(self._get_node_index_by_label(nodedef.get("label")), node_new_config)
-                    self.lab_conf_changed = True
-                except TypeError as e:
-                    raise TypeError(e)
-                # No key found in self._node_types_fn
-                except KeyError as e:
-                    # For other than known and specified in self._node_types_fn node types do nothing just ignore
-                    continue
-                    # raise KeyError(e)
-                # Exception from CiscoConfParse constructor
-                except ValueError as e:
-                    raise ValueError(e)
+        print("\nLoopback interfaces addressing")
+        print(TOutput)
 
-        except IndexError as e:
-            raise IndexError("mgmt-range: Not enough management addresses provided")
+    def print_lab_ip_management_addresses(self, inventory=None):
+        """
+        Print to the console information about IP addresses assigned to management interfaces.
 
-    def update_device_peer_interfaces_conf(self):
+        :param inventory: Table of IP addresses, built if not provided
+        :type inventory: CMLNetKitInventory
         """
-        Updates the addresses on interfaces if directly connected devices.
+        if inventory is None:
+            inventory = self.build_ip_inventory()
+        from prettytable import PrettyTable
+
+        TOutput = PrettyTable()
+        TOutput.field_names = ['Device name', 'Management IP']
+        for nodenum, nodedef in enumerate(self.lab_conf['nodes']):
+            node_type = self._get_node_type(nodenum)
+            if node_type in self._node_types_supported:
+                TOutput.add_row([nodedef['label'],
+                                 inventory.address(nodenum, self._node_management_interface_name[node_type])])
+
+        print("\nManagement interfaces addressing")
+        print(TOutput)
+
+    def write_lab_ip_addresses(self, output):
         """
-        subnets = list(netaddr.IPNetwork(self._cmlnetkitconfig.peer_subnet).subnet(30))
+        Write the IP addresses of the lab in machine-readable format. Nodes are read one by one, the Loopback and
+        management addresses of the node are written right after its configuration is read, and each link is
+        written as soon as the configurations of nodes on both its ends were read.
 
-        try:
-            for linknum, link in enumerate(self.lab_conf["links"]):
-                iface_a_name = self._get_interface_name_by_id(self._get_node_index_by_id(link["n1"]), link["i1"])
-                iface_b_name = self._get_interface_name_by_id(self._get_node_index_by_id(link["n2"]), link["i2"])
-
-                # We need to ignore connections to 'external_connector' and 'iosvl2' objects
-                if self._get_node_type(
-                        self._get_node_index_by_id(link['n1'])) in self._node_types_ignored or self._get_node_type(
-                    self._get_node_index_by_id(link['n2'])) in self._node_types_ignored:
+        :param output: Writer of machine-readable output
+        :type output: CMLNetKitOutput
+        """
+        links_by_node = {}
+        for link in self.lab_conf["links"]:
+            node_index = max(self._get_node_index_by_id(link["n1"]), self._get_node_index_by_id(link["n2"]))
+            links_by_node.setdefault(node_index, []).append(link)
+
+        inventory = CMLNetKitInventory()
+        for nodenum, nodedef in enumerate(self.lab_conf['nodes']):
+            node_type = self._get_node_type(nodenum)
+            if node_type in self._node_types_supported:
+                self._add_node_to_ip_inventory(inventory, nodenum)
+                for report, iface_name in [('loopback', 'Loopback0'),
+                                           ('management', self._node_management_interface_name[node_type])]:
+                    ip_addr = inventory.address(nodenum, iface_name)
+                    output.write({'lab_id': self.lab_id, 'report': report, 'device': nodedef['label'],
+                                  'interface': iface_name, 'address': None if ip_addr is None else str(ip_addr)})
+
+            for link in links_by_node.get(nodenum, []):
+                link_ip_addresses = self._get_link_ip_addresses(inventory, link)
+                if link_ip_addresses is None:
                     continue
+                device_a, iface_a_name, ip_addr_a, device_b, iface_b_name, ip_addr_b = link_ip_addresses
+                output.write({'lab_id': self.lab_id, 'report': 'peer',
+                              'device': device_a, 'interface': iface_a_name,
+                              'address': None if ip_addr_a is None else str(ip_addr_a),
+                              'peer_device': device_b, 'peer_interface': iface_b_name,
+                              'peer_address': None if ip_addr_b is None else str(ip_addr_b)})
+
+    def update_devices_confs(self):
+        """
+        Iterates over the node lists. For known node types where configuration can be updated
+        it calls other methods. The update passes assign the addresses and plan the edits of each node
+        configuration, then each node configuration is parsed once, all its edits are applied and it is
+        written back to lab configuration at the end if it was changed.
+        """
+        self._node_configs = CMLNetKitConfigCache(self.lab_conf, self._cmlnetkitconfig.config_engine, self.profiler,
+                                                  self._get_config_templates())
+        self._node_edits = {}
+        self._allocators = {}
+        self._changed_nodes = None
+        self._address_table = None
 
-                if self._get_node_type(
-                        self._get_node_index_by_id(link["n1"])) in self._node_types_supported:
-                    node_a_config = self._get_node_config(self._get_node_index_by_id(link["n1"]))
-                    node_a_parsed_config = CiscoConfParse(node_a_config.split('\n'))
+        if self._cmlnetkitconfig.state_dir is not None:
+            with self.profiler.phase('state'):
+                self._load_state()
 
-                    self._node_types_fn["update_node_peer_interface_conf_" + self._get_node_type(
-                        self._get_node_index_by_id(link["n1"]))](node_a_parsed_config, iface_a_name,
-                                                                 subnets[linknum][1].__str__(),
-                                                                 subnets[linknum].netmask.__str__())
+        if self._cmlnetkitconfig.update_bridge is True:
+            with self.profiler.phase('update_bridge'):
+                self.update_bridge()
 
-                    node_a_parsed_config.atomic()
-                    node_a_new_config = '\n'.join([i for i in node_a_parsed_config.ioscfg[0:]])
-                    self._set_node_config(self._get_node_index_by_id(link["n1"]), node_a_new_config)
-                    self.lab_conf_changed = True
+        if self._cmlnetkitconfig.update_loopback is True:
+            with self.profiler.phase('update_loopback'):
+                self.update_device_loopback_conf()
 
-                if self._get_node_type(
-                        self._get_node_index_by_id(link["n2"])) in self._node_types_supported:
-                    node_b_config = self._get_node_config(self._get_node_index_by_id(link["n2"]))
-                    node_b_parsed_config = CiscoConfParse(node_b_config.split('\n'))
+        if self._cmlnetkitconfig.update_mgmt is True:
+            with self.profiler.phase('update_management'):
+                self.update_device_management_conf()
 
-                    self._node_types_fn["update_node_peer_interface_conf_" + self._get_node_type(
-                        self._get_node_index_by_id(link["n2"]))](node_b_parsed_config, iface_b_name,
-                                                                 subnets[linknum][2].__str__(),
-                                                                 subnets[linknum].netmask.__str__())
+        if self._cmlnetkitconfig.update_peer is True:
+            with self.profiler.phase('update_peer'):
+                self.update_device_peer_interfaces_conf()
 
-                    node_b_parsed_config.atomic()
-                    node_b_new_config = '\n'.join([i for i in node_b_parsed_config.ioscfg[0:]])
-                    self._set_node_config(self._get_node_index_by_id(link["n2"]), node_b_new_config)
-                    self.lab_conf_changed = True
-        except IndexError as e:
-            raise IndexError("peer-range: Not enough IP addresses provided")
+        with self.profiler.phase('transform'):
+            self._transform_node_configs()
+        self._commit_node_configs()
+
+        if self._cmlnetkitconfig.check_conflicts is True:
+            with self.profiler.phase('check_conflicts'):
+                self.check_address_conflicts()
+
+        if self.state is not None:
+            with self.profiler.phase('state'):
+                self.state.update(self._get_node_hashes(), self._get_options_hash(),
+                                  dict((pool_name, (pool, allocator.table))
+                                       for pool_name, (pool, allocator) in self._allocators.items()))
 
-    def update_node_loopback_conf_iosv(self, node_parsed_config=None, ip_addr=None):
+    def _load_state(self):
         """
-        Update the IP address, description and shutdown state configuration of Loopback interface
-        if no IP address is assigned
+        Load the state of the lab after the last run and select the nodes changed since then. Only the changed
+        nodes are updated, the addresses assigned in the last run are reused.
+        """
+        self.state = CMLNetKitState(self._cmlnetkitconfig.state_dir, self.lab_conf["lab"]["title"], self._states)
+        changed = self.state.changed_nodes(self._get_node_hashes(), self._get_options_hash())
+        self._changed_nodes = set(nodenum for nodenum, nodedef in enumerate(self.lab_conf["nodes"])
+                                  if nodedef.get("label") in changed)
+        self._print_verbose("Incremental mode: %d of %d nodes changed since the last run"
+                            % (len(self._changed_nodes), len(self.lab_conf["nodes"])))
 
-        :param node_parsed_config: The parsed node configuration
-        :type node_parsed_config: CiscoConfParse
-        :param ip_addr: The IP address that will be assigned to Loopback interface of the device
-        :type ip_addr: str
+    def save_state(self):
         """
-        # Don't update the interface configuration if IP address is already set
-        if self._iface_ip_addr_defined(node_parsed_config.find_children(r'^interface\sLoopback0')):
-            return
+        Save the state of the lab after the run, if incremental mode is active
+        """
+        if self.state is not None:
+            self.state.save()
 
-        node_parsed_config.replace_children(r'^interface\sLoopback0', r'no ip address',
-                                            r'ip address ' + ip_addr + ' 255.255.255.255')
-        node_parsed_config.replace_children(r'^interface\sLoopback0', r'shutdown', r'no shutdown')
-        node_parsed_config.replace_children(r'^interface\sLoopback0', r'description to',
-                                            r'description Loopback interface')
+    def _node_changed(self, node_index):
+        """
+        Checks if the node must be updated. All nodes are updated unless incremental mode is active.
 
-    def update_node_loopback_conf_iosxrv(self, node_parsed_config=None, ip_addr=None):
+        :param node_index: Node index in the configuration list
+        :type node_index: int
+        :rtype: bool
         """
-        Update the IP address, description and shutdown state configuration of Loopback interface
-        if no IP address is assigned
+        return self._changed_nodes is None or node_index in self._changed_nodes
 
-        :param node_parsed_config: The parsed node configuration
-        :type node_parsed_config: CiscoConfParse
-        :param ip_addr: The IP address that will be assigned to Loopback interface of the device
-        :type ip_addr: str
+    def _get_link_key(self, link):
         """
-        # Don't update the interface configuration if IP address is already set
-        if self._iface_ip_addr_defined(node_parsed_config.find_children(r'^interface\sLoopback0')):
-            return
+        Return the key identifying the link by the labels of nodes and interfaces on both its ends. The key does
+        not depend on the order of links in the lab or on the direction of the link.
 
-        node_parsed_config.replace_children(r'^interface\sLoopback0', r'no ipv4 address',
-                                            r'ipv4 address ' + ip_addr + ' 255.255.255.255')
-        node_parsed_config.replace_children(r'^interface\sLoopback0', r'shutdown', r'no shutdown',
-                                            excludespec=r'no shutdown')
-        node_parsed_config.replace_children(r'^interface\sLoopback0', r'description to',
-                                            r'description Loopback interface')
+        :param link: Link definition from lab configuration
+        :type link: dict
+        :rtype: str
+        """
+        return '|'.join(sorted([self._get_node_label_by_id(link["n1"]) + ':' +
+                                str(self.topology.interface_label(link["n1"], link["i1"])),
+                                self._get_node_label_by_id(link["n2"]) + ':' +
+                                str(self.topology.interface_label(link["n2"], link["i2"]))]))
 
-    def update_node_management_conf_iosv(self, node_parsed_config=None, ip_addr=None, ip_netmask=None):
+    def _get_node_hashes(self):
         """
-        Update the IP address, description and shutdown state configuration of GigabitEthernet0/0 interface
-        if no IP address is assigned. There is no dedicated OOB Management interface so we take
-        first one. If should be connected to "External Connection" object and common management subnet
+        Return the hash of each node content: node type, startup configuration and attached links
 
-        :param node_parsed_config: The parsed node configuration
-        :type node_parsed_config: CiscoConfParse
-        :param ip_addr: The IP address that will be assigned to te interface of the device and subnet mask
-        :type ip_addr: str
-        :param ip_netmask: The subnet mask in dot notation
-        :type ip_netmask: str
-        """
-        # Don't update the interface configuration if IP address is already set
-        if self._iface_ip_addr_defined(node_parsed_config.find_children(r'^interface\sGigabitEthernet0/0')):
-            return
+        :return: Dictionary of node labels and hashes
+        :rtype: dict
+        """
+        links_by_node = {}
+        for link in self.lab_conf.get("links") or []:
+            link_key = self._get_link_key(link)
+            links_by_node.setdefault(link["n1"], []).append(link_key)
+            links_by_node.setdefault(link["n2"], []).append(link_key)
 
-        node_parsed_config.replace_children(r'^interface\sGigabitEthernet0/0', r'no ip address',
-                                            r'ip address ' + ip_addr + ' ' + ip_netmask)
-        node_parsed_config.replace_children(r'^interface\sGigabitEthernet0/0', r'shutdown', r'no shutdown',
-                                            excludespec=r'no shutdown')
-        node_parsed_config.replace_children(r'^interface\sGigabitEthernet0/0', r'description to',
-                                            r'description Management interface')
+        return dict((nodedef.get("label"), CMLNetKitState.hash([nodedef.get("node_definition"),
+                                                                 nodedef.get("configuration"),
+                                                                 sorted(links_by_node.get(nodedef.get("id"), []))]))
+                    for nodedef in self.lab_conf["nodes"])
 
-    def update_node_management_conf_csr1000v(self, node_parsed_config=None, ip_addr=None, ip_netmask=None):
+    def _get_options_hash(self):
         """
-        Update the IP address, description and shutdown state configuration of GigabitEthernet0/0 interface
-        if no IP address is assigned. There is no dedicated OOB Management interface so we take
-        first one. If should be connected to "External Connection" object and common management subnet
+        Return the hash of the options that affect the result of the run
 
-        :param node_parsed_config: The parsed node configuration
-        :type node_parsed_config: CiscoConfParse
-        :param ip_addr: The IP address that will be assigned to te interface of the device and subnet mask
-        :type ip_addr: str
-        :param ip_netmask: The subnet mask in dot notation
-        :type ip_netmask: str
-        """
-        # Don't update the interface configuration if IP address is already set
-        if self._iface_ip_addr_defined(node_parsed_config.find_children(r'^interface\sGigabitEthernet1')):
-            return
+        :rtype: str
+        """
+        config = self._cmlnetkitconfig
+        return CMLNetKitState.hash([config.update_bridge,
+                                    config.loopback_subnet if config.update_loopback else None,
+                                    [str(config.mgmt_range), config.mgmt_prefixlen] if config.update_mgmt else None,
+                                    [config.peer_subnet, config.peer_prefixlen] if config.update_peer else None,
+                                    config.allocation,
+                                    ])
 
-        node_parsed_config.replace_children(r'^interface\sGigabitEthernet1', r'no ip address',
-                                            r'ip address ' + ip_addr + ' ' + ip_netmask)
-        node_parsed_config.replace_children(r'^interface\sGigabitEthernet1', r'shutdown', r'no shutdown',
-                                            excludespec=r'no shutdown')
-        node_parsed_config.replace_children(r'^interface\sGigabitEthernet1', r'description to',
-                                            r'description Management interface')
+    def _get_address_table(self):
+        """
+        Return the table of addresses configured on the interfaces of lab nodes. It is built on first use with one
+        scan of each node configuration, before any configuration is changed.
 
-    def update_node_management_conf_iosxrv(self, node_parsed_config=None, ip_addr=None, ip_netmask=None):
+        :rtype: CMLNetKitAddressTable
         """
-        Update the IP address, description and shutdown state configuration of MgmtEth0/0/CPU0/0 interface
-        if no IP address is assigned. It should be connected to "External Connection" object and common
-        management subnet.
+        if self._address_table is None:
+            from CMLNetKit.AutoNetKit.CMLNetKitAddressTable import CMLNetKitAddressTable
 
-        :param node_parsed_config: The parsed node configuration
-        :type node_parsed_config: CiscoConfParse
-        :param ip_addr: The IP address that will be assigned to te interface of the device and subnet mask
-        :type ip_addr: str
-        :param ip_netmask: The subnet mask in dot notation
-        :type ip_netmask: str
-        """
-        # Don't update the interface configuration if IP address is already set
-        if self._iface_ip_addr_defined(node_parsed_config.find_children(r'^interface\sMgmtEth0/0/CPU0/0')):
-            return
+            with self.profiler.phase('address_table'):
+                self._address_table = CMLNetKitAddressTable()
+                for nodenum, nodedef in enumerate(self.lab_conf["nodes"]):
+                    if isinstance(nodedef.get("configuration"), str):
+                        self._address_table.add_config(nodenum, nodedef["configuration"])
+            self.profiler.count('interface_addresses', len(self._address_table))
+        return self._address_table
 
-        node_parsed_config.replace_children(r'^interface\sMgmtEth0/0/CPU0/0', r'no ipv4 address',
-                                            r'ipv4 address ' + ip_addr + ' ' + ip_netmask)
-        node_parsed_config.replace_children(r'^interface\sMgmtEth0/0/CPU0/0', r'shutdown', r'no shutdown',
-                                            excludespec=r'no shutdown')
-        node_parsed_config.replace_children(r'^interface\sMgmtEth0/0/CPU0/0', r'description to',
-                                            r'description Management interface')
+    def check_address_conflicts(self):
+        """
+        Check the addresses configured in the lab after the node configurations were updated. The addresses are
+        read again from the updated configurations, so the check covers exactly what is uploaded. The duplicated
+        addresses and the subnets overlapping other subnets are printed on standard error, the addresses assigned
+        in this run are marked as planned.
 
-    def update_node_management_conf_iosxrv9000(self, node_parsed_config=None, ip_addr=None, ip_netmask=None):
+        :raises ValueError: if any conflict is found
         """
-        Update the IP address, description and shutdown state configuration of MgmtEth0/0/CPU0/0 interface
-        if no IP address is assigned. It should be connected to "External Connection" object and common
-        management subnet.
+        from CMLNetKit.AutoNetKit.CMLNetKitAddressTable import CMLNetKitAddressTable
 
-        :param node_parsed_config: The parsed node configuration
-        :type node_parsed_config: CiscoConfParse
-        :param ip_addr: The IP address that will be assigned to te interface of the device and subnet mask
-        :type ip_addr: str
-        :param ip_netmask: The subnet mask in dot notation
-        :type ip_netmask: str
-        """
-        # Don't update the interface configuration if IP address is already set
-        if self._iface_ip_addr_defined(node_parsed_config.find_children(r'^interface\sMgmtEth0/RP0/CPU0/0')):
+        configured = self._get_address_table()
+        address_table = CMLNetKitAddressTable()
+        for nodenum, nodedef in enumerate(self.lab_conf["nodes"]):
+            if isinstance(nodedef.get("configuration"), str):
+                address_table.add_config(nodenum, nodedef["configuration"])
+        for row in range(len(address_table)):
+            if configured.interface_address(address_table.nodes[row],
+                                            address_table.interface_names[address_table.interfaces[row]]) is None:
+                address_table.planned[row] = 1
+
+        duplicates = address_table.duplicates()
+        overlaps = address_table.overlaps()
+        if not duplicates and not overlaps:
             return
 
-        node_parsed_config.replace_children(r'^interface\sMgmtEth0/RP0/CPU0/0', r'no ipv4 address',
-                                            r'ipv4 address ' + ip_addr + ' ' + ip_netmask)
-        node_parsed_config.replace_children(r'^interface\sMgmtEth0/RP0/CPU0/0', r'shutdown', r'no shutdown',
-                                            excludespec=r'no shutdown')
-        node_parsed_config.replace_children(r'^interface\sMgmtEth0/RP0/CPU0/0', r'description to',
-                                            r'description Management interface')
+        from prettytable import PrettyTable
 
-    def update_node_management_conf_nxosv(self, node_parsed_config=None, ip_addr=None, ip_netmask=None):
-        """
-        Update the IP address, description and shutdown state configuration of MgmtEth0/0/CPU0/0 interface
-        if no IP address is assigned. It should be connected to "External Connection" object and common
-        management subnet.
+        TOutput = PrettyTable()
+        TOutput.field_names = ['Conflict', 'Device', 'Interface', 'Address', 'Other device', 'Other interface',
+                               'Other address']
+        for conflict, pairs in [('duplicate', duplicates), ('overlap', overlaps)]:
+            for row_a, row_b in pairs:
+                row = [conflict]
+                for address_row in [address_table.row(row_a), address_table.row(row_b)]:
+                    row += [self.lab_conf["nodes"][address_row['node_index']].get("label"), address_row['interface'],
+                            address_row['address'] + (' (planned)' if address_row['planned'] else '')]
+                TOutput.add_row(row)
+        print("\nAddress conflicts in lab %s" % (self.lab_id if self.lab_id is not None
+                                                  else self.lab_conf["lab"].get("title")), file=sys.stderr)
+        print(TOutput, file=sys.stderr)
+        raise ValueError("check-conflicts: %d duplicated addresses and %d overlapping subnets found, the lab is not "
+                         "updated" % (len(duplicates), len(overlaps)))
+
+    def _get_allocator(self, pool_name, pool, size, keys, reserved=None):
+        """
+        Return the allocator of addresses from the pool using the strategy selected with --allocation. In
+        incremental mode the addresses assigned in the last run are reused. Reserved addresses, already configured
+        in the lab, are not assigned.
+
+        :param pool_name: Name of the pool
+        :type pool_name: str
+        :param pool: Definition of the pool
+        :type pool: str
+        :param size: Number of addresses in the pool
+        :type size: int
+        :param keys: Function returning keys of all nodes or links in the lab that can get the address
+        :type keys: function
+        :param reserved: Offsets of the addresses that must not be assigned
+        :type reserved: list
+        :rtype: CMLNetKitAddressAllocator
+        """
+        from CMLNetKit.AutoNetKit.CMLNetKitAllocator import CMLNetKitAddressAllocator
+
+        strategy = self._cmlnetkitconfig.allocation
+        # The table stored for other strategy is discarded, so the pool is renumbered when the strategy changes
+        pool = pool + ' ' + strategy
+        if self.state is not None:
+            allocator = CMLNetKitAddressAllocator(pool_name, size, self.state.allocation_table(pool_name, pool),
+                                                  keys(), strategy, reserved)
+        else:
+            allocator = CMLNetKitAddressAllocator(pool_name, size, strategy=strategy, reserved=reserved)
+        self._allocators[pool_name] = (pool, allocator)
+        return allocator
 
-        :param node_parsed_config: The parsed node configuration
-        :type node_parsed_config: CiscoConfParse
-        :param ip_addr: The IP address that will be assigned to te interface of the device and subnet mask
-        :type ip_addr: str
-        :param ip_netmask: The subnet mask in dot notation
-        :type ip_netmask: str
-        """
-        # Don't update the interface configuration if IP address is already set
-        if self._iface_ip_addr_defined(node_parsed_config.find_children(r'^interface\smgmt0')):
-            return
+    def _get_allocation_order(self, items, key):
+        """
+        Return the nodes or links with their indexes in the order the addresses are assigned. With the stable
+        allocation strategy they are sorted by their keys, so the collisions of hashes are resolved the same way
+        whatever the order of nodes and links in the lab is.
 
-        node_parsed_config.replace_children(r'^interface\smgmt0', r'no ip address',
-                                            r'ip address ' + ip_addr + ' ' + ip_netmask)
-        node_parsed_config.replace_children(r'^interface\smgmt0', r'shutdown', r'no shutdown',
-                                            excludespec=r'no shutdown')
-        node_parsed_config.replace_children(r'^interface\smgmt0', r'description to',
-                                            r'description Management interface')
+        :param items: Nodes or links from lab configuration
+        :type items: list
+        :param key: Function returning the key of the node or link
+        :type key: function
+        :return: Iterable of tuples with the index and the node or link
+        :rtype: iterable
+        """
+        if self._cmlnetkitconfig.allocation == 'stable':
+            return sorted(enumerate(items), key=lambda item: key(item[1]))
+        return enumerate(items)
 
-    def update_node_management_conf_iosvl2(self, node_parsed_config=None, ip_addr=None, ip_netmask=None):
+    def update_device_loopback_conf(self):
         """
-        Update the IP address, description and shutdown state configuration of GigabitEthernet0/0 interface
-        if no IP address is assigned. There is no dedicated OOB Management interface so we take
-        first one. If should be connected to "External Connection" object and common management subnet
+        Updates the Loopback interfaces configuration for nodes in the lab topology.
 
-        :param node_parsed_config: The parsed node configuration
-        :type node_parsed_config: CiscoConfParse
-        :param ip_addr: The IP address that will be assigned to te interface of the device and subnet mask
-        :type ip_addr: str
-        :param ip_netmask: The subnet mask in dot notation
-        :type ip_netmask: str
-        """
-        # Don't update the interface configuration if IP address is already set
-        if self._iface_ip_addr_defined(node_parsed_config.find_children(r'^interface\sGigabitEthernet0/0')):
-            return
+        For each node it will plan the call of the platform specific method to update Loopback interface address
+        from provided subnet using the next available address for each device.
+        """
+        import netaddr
 
-        node_parsed_config.replace_children(r'^interface\sGigabitEthernet0/0', r'no ip address',
-                                            r'ip address ' + ip_addr + ' ' + ip_netmask)
-        node_parsed_config.replace_children(r'^interface\sGigabitEthernet0/0', r'shutdown', r'no shutdown',
-                                            excludespec=r'no shutdown')
-        node_parsed_config.replace_children(r'^interface\sGigabitEthernet0/0', r'switchport', r'no no switchport',
-                                            excludespec=r'no switchport')
-        node_parsed_config.replace_children(r'^interface\sGigabitEthernet0/0', r'description to',
-                                            r'description Management interface')
+        ip = netaddr.IPNetwork(self._cmlnetkitconfig.loopback_subnet)
+        address_table = self._get_address_table()
+        allocator = self._get_allocator('lo-subnet', str(ip), ip.size - 1,
+                                        lambda: [nodedef.get("label") for nodedef in self.lab_conf["nodes"]],
+                                        [address - ip.first - 1
+                                         for address in address_table.addresses_in(ip.first + 1, ip.last)])
 
-    def update_node_management_conf_asav(self, node_parsed_config=None, ip_addr=None, ip_netmask=None):
-        """
-        Update the IP address, description and shutdown state configuration of GigabitEthernet0/0 interface
-        if no IP address is assigned. There is no dedicated OOB Management interface so we take
-        first one. If should be connected to "External Connection" object and common management subnet
+        try:
+            for nodenum, nodedef in self._get_allocation_order(self.lab_conf["nodes"],
+                                                               lambda nodedef: str(nodedef.get("label"))):
+                # We find the plan of changes in the profile of the node type
+                try:
+                    node_index = self._get_node_index_by_label(nodedef.get("label"))
+                    if not self._node_changed(node_index):
+                        continue
+                    interface_edit = CMLNetKitPlatform.get(self._get_node_type(node_index)).loopback
+                    if interface_edit is None:
+                        continue
+                    # The address already configured is kept and the node gets no other address
+                    address = address_table.interface_address(node_index, 'Loopback0')
+                    if address is not None:
+                        if ip.first < address <= ip.last:
+                            allocator.adopt(nodedef.get("label"), address - ip.first - 1)
+                        continue
+                    # The interface that is missing or does not take the address gets none from the pool
+                    if not address_table.needs_address(node_index, 'Loopback0'):
+                        continue
+                    node_edits = self._get_node_edits(node_index)
+                    # Addresses are taken from the subnet by the offset, skipping the network address
+                    ip_addr = ip[allocator.allocate(nodedef.get("label"), nodenum) + 1].__str__()
+                    node_edits.append((interface_edit, 'Loopback0', {'ip_addr': ip_addr}))
+                except TypeError as e:
+                    raise TypeError(e)
+                # Node type not registered in CMLNetKitPlatform or node without configuration
+                except KeyError as e:
+                    # For other than known node types do nothing just ignore
+                    continue
+                    # raise KeyError(e)
+                # Exception from CiscoConfParse constructor
+                except ValueError as e:
+                    raise ValueError(e)
 
-        :param node_parsed_config: The parsed node configuration
-        :type node_parsed_config: CiscoConfParse
-        :param ip_addr: The IP address that will be assigned to te interface of the device and subnet mask
-        :type ip_addr: str
-        :param ip_netmask: The subnet mask in dot notation
-        :type ip_netmask: str
-        """
-        # Don't update the interface configuration if IP address is already set
-        if self._iface_ip_addr_defined(node_parsed_config.find_children(r'^interface\sManagement0/0')):
-            return
+        except IndexError as e:
+            raise IndexError("lo-subnet: Not enough loopback addresses provided")
 
-        node_parsed_config.replace_children(r'^interface\sManagement0/0', r'no ip address',
-                                            r'ip address ' + ip_addr + ' ' + ip_netmask)
-        node_parsed_config.replace_children(r'^interface\sManagement0/0', r'shutdown', r'no shutdown',
-                                            excludespec=r'no shutdown')
-        node_parsed_config.replace_children(r'^interface\sManagement0/0', r'description to',
-                                            r'description Management interface')
+    def update_device_management_conf(self):
+        """
+        Updates the management interfaces configuration for nodes in the lab topology.
 
-    def update_node_interface_address_iosv(self, node_parsed_config=None, iface_name=None, ip_addr=None,
-                                           ip_netmask=None):
+        For each node it will plan the call of the platform specific method to update management interface address
+        from provided range using the next available address for each device.
         """
-        Update the IP address, description and shutdown state configuration of GigabitEthernet0/0 interface
-        if no IP address is assigned. There is no dedicated OOB Management interface so we take
-        first one. If should be connected to "External Connection" object and common management subnet
+        import netaddr
 
-        :param node_parsed_config: The parsed node configuration
-        :type node_parsed_config: CiscoConfParse
-        :param iface_name: Name of the interface to be updated
-        :type iface_name: str
-        :param ip_addr: The IP address that will be assigned to te interface of the device and subnet mask
-        :type ip_addr: str
-        :param ip_netmask: The subnet mask in dot notation
-        :type ip_netmask: str
-        """
-        # Don't update the interface configuration if IP address is already set
-        if self._iface_ip_addr_defined(node_parsed_config.find_children(r'^interface\s' + iface_name)):
-            return
+        mgmt_range = self._cmlnetkitconfig.mgmt_range
+        mgmt_netmask = netaddr.IPNetwork('0.0.0.0/%d' % self._cmlnetkitconfig.mgmt_prefixlen).netmask.__str__()
+        address_table = self._get_address_table()
+        allocator = self._get_allocator('mgmt-range', str(mgmt_range), mgmt_range.last - mgmt_range.first + 1,
+                                        lambda: [nodedef.get("label") for nodedef in self.lab_conf["nodes"]],
+                                        [address - mgmt_range.first
+                                         for address in address_table.addresses_in(mgmt_range.first,
+                                                                                   mgmt_range.last)])
+
+        try:
+            for nodenum, nodedef in self._get_allocation_order(self.lab_conf["nodes"],
+                                                               lambda nodedef: str(nodedef.get("label"))):
+                # We find the plan of changes in the profile of the node type
+                try:
+                    node_index = self._get_node_index_by_label(nodedef.get("label"))
+                    if not self._node_changed(node_index):
+                        continue
+                    platform = CMLNetKitPlatform.get(self._get_node_type(node_index))
+                    if platform.management is None:
+                        continue
+                    # The address already configured is kept and the node gets no other address
+                    address = address_table.interface_address(node_index, platform.management_interface)
+                    if address is not None:
+                        if mgmt_range.first <= address <= mgmt_range.last:
+                            allocator.adopt(nodedef.get("label"), address - mgmt_range.first)
+                        continue
+                    # The interface that is missing or does not take the address gets none from the pool
+                    if not address_table.needs_address(node_index, platform.management_interface):
+                        continue
+                    node_edits = self._get_node_edits(node_index)
+                    # Addresses are taken from the range by the offset
+                    ip_addr = netaddr.IPAddress(mgmt_range.first +
+                                                allocator.allocate(nodedef.get("label"), nodenum)).__str__()
+                    node_edits.append((platform.management, platform.management_interface,
+                                       {'ip_addr': ip_addr, 'ip_netmask': mgmt_netmask}))
+                except TypeError as e:
+                    raise TypeError(e)
+                # Node type not registered in CMLNetKitPlatform or node without configuration
+                except KeyError as e:
+                    # For other than known node types do nothing just ignore
+                    continue
+                    # raise KeyError(e)
+                # Exception from CiscoConfParse constructor
+                except ValueError as e:
+                    raise ValueError(e)
 
-        node_parsed_config.replace_children(r'^interface\s' + iface_name, r'no ip address',
-                                            r'ip address ' + ip_addr + ' ' + ip_netmask)
-        node_parsed_config.replace_children(r'^interface\s' + iface_name, r'shutdown', r'no shutdown',
-                                            excludespec=r'no shutdown')
+        except IndexError as e:
+            raise IndexError("mgmt-range: Not enough management addresses provided")
 
-    def update_node_interface_address_iosxrv(self, node_parsed_config=None, iface_name=None, ip_addr=None,
-                                             ip_netmask=None):
+    def update_device_peer_interfaces_conf(self):
         """
-        Update the IP address, description and shutdown state configuration of GigabitEthernet0/0 interface
-        if no IP address is assigned. There is no dedicated OOB Management interface so we take
-        first one. If should be connected to "External Connection" object and common management subnet
-
-        :param node_parsed_config: The parsed node configuration
-        :type node_parsed_config: CiscoConfParse
-        :param iface_name: Name of the interface to be updated
-        :type iface_name: str
-        :param ip_addr: The IP address that will be assigned to te interface of the device and subnet mask
-        :type ip_addr: str
-        :param ip_netmask: The subnet mask in dot notation
-        :type ip_netmask: str
-        """
-        # Don't update the interface configuration if IP address is already set
-        if self._iface_ip_addr_defined(node_parsed_config.find_children(r'^interface\s' + iface_name)):
-            return
+        Updates the addresses on interfaces if directly connected devices.
 
-        node_parsed_config.replace_children(r'^interface\s' + iface_name, r'no ipv4 address',
-                                            r'ipv4 address ' + ip_addr + ' ' + ip_netmask)
-        node_parsed_config.replace_children(r'^interface\s' + iface_name, r'shutdown', r'no shutdown',
-                                            excludespec=r'no shutdown')
+        Each link is addressed from the subnet of the peer subnet pool with the same index as the link, the lowest
+        free subnet with the packed allocation strategy, or with the index derived from the link ends with the stable
+        allocation strategy. A link with one end already addressed from the pool gets no new subnet, the other end
+        gets the other address of the same subnet. Subnets are calculated when needed, so the size of peer subnet
+        does not matter.
+
+        :raises IndexError: if peer subnet pool has less subnets than links in the lab
+        """
+        import netaddr
+        from CMLNetKit.AutoNetKit.CMLNetKitAddressTable import CMLNetKitAddressTable
+        from CMLNetKit.AutoNetKit.CMLNetKitAllocator import CMLNetKitSubnetPool
+
+        subnets = CMLNetKitSubnetPool(self._cmlnetkitconfig.peer_subnet, self._cmlnetkitconfig.peer_prefixlen)
+        peer_subnet = netaddr.IPNetwork(self._cmlnetkitconfig.peer_subnet)
+        address_table = self._get_address_table()
+        # Subnets with any address already configured in the lab are not assigned
+        allocator = self._get_allocator('peer-subnet', '%s %d' % (self._cmlnetkitconfig.peer_subnet,
+                                                                  self._cmlnetkitconfig.peer_prefixlen),
+                                        len(subnets),
+                                        lambda: [self._get_link_key(link) for link in self.lab_conf["links"]],
+                                        [subnets.subnet_index(address)
+                                         for address in address_table.addresses_in(peer_subnet.first,
+                                                                                   peer_subnet.last)])
+
+        for linknum, link in self._get_allocation_order(self.lab_conf["links"], self._get_link_key):
+            node_a_index = self._get_node_index_by_id(link["n1"])
+            node_b_index = self._get_node_index_by_id(link["n2"])
+            node_a_type = self._get_node_type(node_a_index)
+            node_b_type = self._get_node_type(node_b_index)
+            iface_a_name = self.topology.interface_label(link["n1"], link["i1"])
+            iface_b_name = self.topology.interface_label(link["n2"], link["i2"])
+
+            # We need to ignore connections to 'external_connector' and 'iosvl2' objects
+            if node_a_type in self._node_types_ignored or node_b_type in self._node_types_ignored:
+                continue
+
+            # In incremental mode only the ends on changed nodes are updated, a new link always changes both nodes
+            if not self._node_changed(node_a_index) and not self._node_changed(node_b_index):
+                continue
+
+            # Ends with the address already configured keep it, the link is addressed if any end needs the address.
+            # Ends that are missing or do not take the address are not updated.
+            address_a = address_table.interface_address(node_a_index, iface_a_name)
+            address_b = address_table.interface_address(node_b_index, iface_b_name)
+            update_a = node_a_type in self._node_types_supported and self._node_changed(node_a_index) and \
+                address_table.needs_address(node_a_index, iface_a_name)
+            update_b = node_b_type in self._node_types_supported and self._node_changed(node_b_index) and \
+                address_table.needs_address(node_b_index, iface_b_name)
+            if not update_a and not update_b:
+                for address in [address_a, address_b]:
+                    if address is not None and subnets.subnet_index(address) is not None:
+                        allocator.adopt(self._get_link_key(link), subnets.subnet_index(address))
+                        break
+                continue
+
+            # The end without the address gets the other address of the subnet already configured on the other end
+            address = address_b if update_a else address_a
+            subnet_index = None if (update_a and update_b) or address is None else subnets.subnet_index(address)
+            if subnet_index is not None:
+                allocator.adopt(self._get_link_key(link), subnet_index)
+                ip_addr_a, ip_addr_b = subnets.peer_addresses(subnet_index)
+                if (ip_addr_a if update_a else ip_addr_b) == CMLNetKitAddressTable.int_to_address(address):
+                    ip_addr_a, ip_addr_b = ip_addr_b, ip_addr_a
+            else:
+                ip_addr_a, ip_addr_b = subnets.peer_addresses(allocator.allocate(self._get_link_key(link), linknum))
+
+            if update_a:
+                self._get_node_edits(node_a_index).append((CMLNetKitPlatform.get(node_a_type).peer, iface_a_name,
+                                                           {'ip_addr': ip_addr_a, 'ip_netmask': subnets.netmask}))
+
+            if update_b:
+                self._get_node_edits(node_b_index).append((CMLNetKitPlatform.get(node_b_type).peer, iface_b_name,
+                                                           {'ip_addr': ip_addr_b, 'ip_netmask': subnets.netmask}))
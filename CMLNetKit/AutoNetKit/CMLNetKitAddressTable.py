@@ -0,0 +1,265 @@
+# -*- coding: utf-8 -*-
+# (c) 2020-2023 Piotr Wojciechowski <piotr@it-playground.pl>
+# GNU General Public License v3.0+ (see COPYING or https://www.gnu.org/licenses/gpl-3.0.txt)
+
+import array
+import bisect
+import re
+
+
+class CMLNetKitAddressTable(object):
+    """
+    Initializes a CMLNetKitAddressTable instance. This class is the table of IPv4 addresses configured on the
+    interfaces of lab nodes and planned to be assigned in this run. The table is stored in columns of integer arrays:
+    the address, the prefix length, the node index, the interface and the flag if the address is planned. Interface
+    names are stored once and referenced by their index.
+
+    The addresses are read from node configurations with one scan of the configuration lines, without parsing. The
+    same scan records the interfaces with "no ip address" or "no ipv4 address", the only interfaces the address is
+    written to by CMLNetKitInterfaceEdit, so the addresses are assigned only to interfaces that take them. The
+    duplicated addresses and the overlapping subnets are found by sorting the rows once and comparing the neighbours,
+    so the check of a lab with thousands of interfaces takes milliseconds.
+    """
+
+    # Interface address line, "ip address 10.0.0.1 255.255.255.0" on IOS and ASA, "ip address 10.0.0.1/24" on NX-OS
+    # and "ipv4 address 10.0.0.1 255.255.255.0" on IOS XR
+    _address_line = re.compile(r'^\s+(?:ip|ipv4) address (\d+\.\d+\.\d+\.\d+)(?: |/)(\d+\.\d+\.\d+\.\d+|\d+)\b')
+
+    def __init__(self):
+        self.addresses = array.array('L')
+        self.prefixlens = array.array('B')
+        self.nodes = array.array('l')
+        self.interfaces = array.array('l')
+        self.planned = array.array('B')
+        self.interface_names = []
+        self._interface_indexes = {}
+        # Dictionary of node indexes and interface names and the first row with the interface address
+        self._rows = {}
+        # Node indexes and interface names of the interfaces without address
+        self._unaddressed = set()
+        # Rows and addresses sorted by the address, built when needed
+        self._sorted_rows = None
+        self._sorted_addresses = None
+
+    def __len__(self):
+        return len(self.addresses)
+
+    @staticmethod
+    def address_to_int(address):
+        """
+        Return the IPv4 address as an integer
+
+        :param address: IPv4 address in dotted notation
+        :type address: str
+        :rtype: int
+        :raises ValueError: if the address is not valid
+        """
+        octets = [int(octet) for octet in address.split('.')]
+        if len(octets) != 4 or max(octets) > 255:
+            raise ValueError("Invalid IPv4 address %s" % address)
+        return (octets[0] << 24) | (octets[1] << 16) | (octets[2] << 8) | octets[3]
+
+    @staticmethod
+    def int_to_address(value):
+        """
+        Return the IPv4 address in dotted notation
+
+        :param value: IPv4 address as an integer
+        :type value: int
+        :rtype: str
+        """
+        return '%d.%d.%d.%d' % (value >> 24, (value >> 16) & 255, (value >> 8) & 255, value & 255)
+
+    @classmethod
+    def netmask_to_prefixlen(cls, netmask):
+        """
+        Return the prefix length of the netmask
+
+        :param netmask: Netmask in dotted notation or prefix length
+        :type netmask: str
+        :rtype: int
+        :raises ValueError: if the netmask is not valid
+        """
+        if '.' not in netmask:
+            prefixlen = int(netmask)
+        else:
+            mask = cls.address_to_int(netmask)
+            prefixlen = bin(mask).count('1')
+            if mask != (0xffffffff << (32 - prefixlen)) & 0xffffffff:
+                raise ValueError("Invalid netmask %s" % netmask)
+        if not 0 <= prefixlen <= 32:
+            raise ValueError("Invalid prefix length %s" % netmask)
+        return prefixlen
+
+    def add(self, node_index, interface, address, prefixlen, planned=False):
+        """
+        Add the interface address to the table
+
+        :param node_index: Node index in the configuration list
+        :type node_index: int
+        :param interface: Interface name
+        :type interface: str
+        :param address: IPv4 address as an integer
+        :type address: int
+        :param prefixlen: Prefix length
+        :type prefixlen: int
+        :param planned: Flag if the address is planned to be assigned in this run
+        :type planned: bool
+        """
+        interface_index = self._interface_indexes.get(interface)
+        if interface_index is None:
+            interface_index = self._interface_indexes[interface] = len(self.interface_names)
+            self.interface_names.append(interface)
+        self._rows.setdefault((node_index, interface), len(self.addresses))
+        self.addresses.append(address)
+        self.prefixlens.append(prefixlen)
+        self.nodes.append(node_index)
+        self.interfaces.append(interface_index)
+        self.planned.append(1 if planned else 0)
+        self._sorted_rows = None
+
+    def add_config(self, node_index, node_config):
+        """
+        Add the addresses configured on the interfaces of the node, including secondary addresses, and record the
+        interfaces without address
+
+        :param node_index: Node index in the configuration list
+        :type node_index: int
+        :param node_config: Node startup configuration
+        :type node_config: str
+        :return: Number of addresses added
+        :rtype: int
+        """
+        added = 0
+        interface = None
+        for line in node_config.split('\n'):
+            if line.startswith('interface '):
+                interface = line[10:].strip()
+            elif line[:1] not in (' ', '\t'):
+                interface = None
+            elif interface is None:
+                continue
+            elif 'no ip address' in line or 'no ipv4 address' in line:
+                self._unaddressed.add((node_index, interface))
+            elif ' address ' in line:
+                match = self._address_line.match(line)
+                if match is None:
+                    continue
+                try:
+                    self.add(node_index, interface, self.address_to_int(match.group(1)),
+                             self.netmask_to_prefixlen(match.group(2)))
+                except ValueError:
+                    # Invalid address is left to the node to report
+                    continue
+                added += 1
+        return added
+
+    def interface_address(self, node_index, interface):
+        """
+        Return the first address of the interface
+
+        :param node_index: Node index in the configuration list
+        :type node_index: int
+        :param interface: Interface name
+        :type interface: str
+        :return: Address as an integer, or None if the interface has no address in the table
+        :rtype: int
+        """
+        row = self._rows.get((node_index, interface))
+        return None if row is None else self.addresses[row]
+
+    def needs_address(self, node_index, interface):
+        """
+        Check if the address can be assigned to the interface. The interface must be configured with "no ip address"
+        or "no ipv4 address", the same as checked by CMLNetKitInterfaceEdit before the address is written.
+
+        :param node_index: Node index in the configuration list
+        :type node_index: int
+        :param interface: Interface name
+        :type interface: str
+        :return: True if the interface exists, has no address and takes the address
+        :rtype: bool
+        """
+        return (node_index, interface) in self._unaddressed and (node_index, interface) not in self._rows
+
+    def row(self, row):
+        """
+        Return the row of the table
+
+        :param row: Row index
+        :type row: int
+        :return: Dictionary with the node index, interface name, address in format address/prefixlen and the flag
+            if the address is planned
+        :rtype: dict
+        """
+        return {'node_index': self.nodes[row],
+                'interface': self.interface_names[self.interfaces[row]],
+                'address': '%s/%d' % (self.int_to_address(self.addresses[row]), self.prefixlens[row]),
+                'planned': bool(self.planned[row]),
+                }
+
+    def _sort(self):
+        """
+        Sort the rows by the address, once after the table was changed
+        """
+        if self._sorted_rows is None:
+            self._sorted_rows = sorted(range(len(self.addresses)), key=self.addresses.__getitem__)
+            self._sorted_addresses = array.array('L', [self.addresses[row] for row in self._sorted_rows])
+
+    def addresses_in(self, first, last):
+        """
+        Return the addresses of the table within the range, e.g. the addresses already used in the pool
+
+        :param first: First address of the range as an integer
+        :type first: int
+        :param last: Last address of the range as an integer
+        :type last: int
+        :return: Sorted list of addresses as integers
+        :rtype: list
+        """
+        self._sort()
+        return self._sorted_addresses[bisect.bisect_left(self._sorted_addresses, first):
+                                      bisect.bisect_right(self._sorted_addresses, last)].tolist()
+
+    def duplicates(self):
+        """
+        Return the pairs of rows with the same address. Each row is paired with the first row with the address.
+
+        :return: List of tuples with two row indexes
+        :rtype: list
+        """
+        self._sort()
+        pairs = []
+        first_row = None
+        for position in range(1, len(self._sorted_rows)):
+            if self._sorted_addresses[position] != self._sorted_addresses[position - 1]:
+                first_row = None
+                continue
+            if first_row is None:
+                first_row = self._sorted_rows[position - 1]
+            pairs.append((first_row, self._sorted_rows[position]))
+        return pairs
+
+    def overlaps(self):
+        """
+        Return the pairs of rows with subnets that overlap but are not the same, e.g. the subnet inside other subnet.
+        Interfaces with addresses of the same subnet are connected to the same network and are not reported. Each
+        row is paired with the row of the largest subnet before it that covers it.
+
+        :return: List of tuples with two row indexes
+        :rtype: list
+        """
+        masks = [(0xffffffff << (32 - prefixlen)) & 0xffffffff for prefixlen in range(33)]
+        firsts = [address & masks[prefixlen] for address, prefixlen in zip(self.addresses, self.prefixlens)]
+        lasts = [first | (~masks[prefixlen] & 0xffffffff) for first, prefixlen in zip(firsts, self.prefixlens)]
+
+        pairs = []
+        cover = None
+        for row in sorted(range(len(firsts)), key=lambda row: (firsts[row], -lasts[row])):
+            if cover is not None and firsts[row] <= lasts[cover]:
+                if firsts[row] != firsts[cover] or lasts[row] != lasts[cover]:
+                    pairs.append((cover, row))
+                if lasts[row] <= lasts[cover]:
+                    continue
+            cover = row
+        return pairs
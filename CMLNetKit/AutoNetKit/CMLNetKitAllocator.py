@@ -0,0 +1,257 @@
+# -*- coding: utf-8 -*-
+# (c) 2020-2023 Piotr Wojciechowski <piotr@it-playground.pl>
+# GNU General Public License v3.0+ (see COPYING or https://www.gnu.org/licenses/gpl-3.0.txt)
+
+import hashlib
+import re
+
+import netaddr
+
+
+class CMLNetKitSubnetPool(object):
+    """
+    Initializes a CMLNetKitSubnetPool instance. This class splits the subnet into smaller subnets of the same
+    size. The Nth subnet is calculated when requested, so the time and memory used do not depend on the
+    size of the pool.
+
+    :param subnet: Subnet that is split, in format subnet/mask
+    :type subnet: str
+    :param prefixlen: Prefix length of the smaller subnets
+    :type prefixlen: int
+    :param pool_name: Name of the pool used in error messages
+    :type pool_name: str
+    """
+
+    def __init__(self, subnet, prefixlen, pool_name='peer-subnet'):
+        network = netaddr.IPNetwork(subnet, version=4)
+
+        self.prefixlen = prefixlen
+        self.netmask = netaddr.IPNetwork('0.0.0.0/%d' % prefixlen).netmask.__str__()
+        self._pool_name = pool_name
+        self._subnet = network.cidr.__str__()
+        self._first = network.first
+        self._size = 2 ** (32 - prefixlen)
+        if prefixlen < network.prefixlen:
+            self._count = 0
+        else:
+            self._count = 2 ** (prefixlen - network.prefixlen)
+
+    def __len__(self):
+        return self._count
+
+    def subnet(self, subnet_index):
+        """
+        Return the subnet with given index in the pool
+
+        :param subnet_index: Index of the subnet
+        :type subnet_index: int
+        :return: Subnet
+        :rtype: netaddr.IPNetwork
+        :raises IndexError: if pool has less subnets than requested
+        """
+        return netaddr.IPNetwork('%s/%d' % (netaddr.IPAddress(self._subnet_first(subnet_index)), self.prefixlen))
+
+    def peer_addresses(self, subnet_index):
+        """
+        Return the addresses for both ends of the point-to-point link addressed from the subnet with given index.
+        For /31 subnets both addresses are used, for larger subnets the first two host addresses.
+
+        :param subnet_index: Index of the subnet
+        :type subnet_index: int
+        :return: IP addresses of both link ends
+        :rtype: tuple
+        :raises IndexError: if pool has less subnets than requested
+        """
+        first = self._subnet_first(subnet_index)
+        if self.prefixlen == 31:
+            return netaddr.IPAddress(first).__str__(), netaddr.IPAddress(first + 1).__str__()
+        return netaddr.IPAddress(first + 1).__str__(), netaddr.IPAddress(first + 2).__str__()
+
+    def subnet_index(self, address):
+        """
+        Return the index of the subnet of the pool with the address
+
+        :param address: IPv4 address as an integer
+        :type address: int
+        :return: Index of the subnet, or None if the address is not in the pool
+        :rtype: int
+        """
+        subnet_index = (address - self._first) // self._size
+        if address < self._first or subnet_index >= self._count:
+            return None
+        return subnet_index
+
+    def _subnet_first(self, subnet_index):
+        """
+        Return the first address of the subnet with given index as an integer
+
+        :param subnet_index: Index of the subnet
+        :type subnet_index: int
+        :rtype: int
+        :raises IndexError: if pool has less subnets than requested
+        """
+        if not 0 <= subnet_index < self._count:
+            raise IndexError("%s: Address pool exhausted, %s provides %d /%d subnets and subnet %d was requested"
+                             % (self._pool_name, self._subnet, self._count, self.prefixlen, subnet_index + 1))
+        return self._first + subnet_index * self._size
+
+
+class CMLNetKitAddressAllocator(object):
+    """
+    Initializes a CMLNetKitAddressAllocator instance. This class assigns the addresses of the pool to the nodes or
+    links identified by stable keys and keeps the table of assignments, so it can be stored and reused by the next
+    run. Addresses are identified by their offset in the pool.
+
+    Keys found in the table of previous assignments keep their addresses. With the sequential strategy other keys
+    get the preferred offset, which is the index of the node or link in the lab, if it is free, otherwise the lowest
+    free offset of the pool. With the packed strategy keys always get the lowest free offset, so the addresses are
+    assigned without gaps. With the stable strategy the offset is derived from the hash of the key, so it does not
+    depend on the order of nodes and links in the lab. If it is already assigned to other key, the next free offset
+    is taken. Reserved offsets, e.g. of the addresses already configured in the lab, are never assigned.
+
+    Used offsets are marked in the bitmap, one bit per offset, which grows up to the highest used offset. The next
+    free offset is found by skipping the full bytes of the bitmap, and as offsets are never released during the run,
+    the search for the lowest free offset continues where the last one ended.
+
+    :param pool_name: Name of the pool used in error messages
+    :type pool_name: str
+    :param size: Number of addresses in the pool
+    :type size: int
+    :param table: Previous assignments, dictionary of keys and offsets
+    :type table: dict
+    :param keys: Keys present in the lab, previous assignments of other keys are released
+    :type keys: list
+    :param strategy: Allocation strategy, one of the keys of strategies list
+    :type strategy: str
+    :param reserved: Offsets that must not be assigned
+    :type reserved: list
+    """
+
+    strategies = ['sequential', 'packed', 'stable']
+
+    # Byte of the bitmap with any free offset
+    _free_byte = re.compile(b'[^\xff]')
+
+    def __init__(self, pool_name, size, table=None, keys=None, strategy='sequential', reserved=None):
+        if strategy not in self.strategies:
+            raise ValueError("allocation: Unsupported allocation strategy %s" % strategy)
+        self._pool_name = pool_name
+        self._size = size
+        self._strategy = strategy
+        self._next_free = 0
+        self._bitmap = bytearray()
+        self._used = 0
+
+        self.table = {}
+        if table:
+            keys = set(keys) if keys is not None else set(table)
+            for key, offset in table.items():
+                if key in keys and 0 <= offset < size:
+                    self.table[key] = offset
+                    self._mark(offset)
+        for offset in reserved or []:
+            if 0 <= offset < size:
+                self._mark(offset)
+
+    def __contains__(self, offset):
+        return 0 <= offset >> 3 < len(self._bitmap) and self._bitmap[offset >> 3] & (1 << (offset & 7)) != 0
+
+    def _mark(self, offset):
+        """
+        Mark the offset as used
+
+        :param offset: Offset of the address in the pool
+        :type offset: int
+        """
+        byte_index = offset >> 3
+        if byte_index >= len(self._bitmap):
+            self._bitmap.extend(bytes(max(byte_index + 1 - len(self._bitmap), len(self._bitmap))))
+        bit = 1 << (offset & 7)
+        if not self._bitmap[byte_index] & bit:
+            self._bitmap[byte_index] |= bit
+            self._used += 1
+
+    def _find_free(self, start):
+        """
+        Return the lowest free offset not lower than start
+
+        :param start: Offset where the search starts
+        :type start: int
+        :return: Free offset, or None if all offsets from start to the end of the pool are used
+        :rtype: int
+        """
+        byte_index = start >> 3
+        if byte_index >= len(self._bitmap):
+            return start if start < self._size else None
+        # Offsets below start in its byte are skipped as if they were used
+        byte = self._bitmap[byte_index] | ((1 << (start & 7)) - 1)
+        if byte == 0xff:
+            match = self._free_byte.search(self._bitmap, byte_index + 1)
+            if match is None:
+                offset = len(self._bitmap) << 3
+                return offset if offset < self._size else None
+            byte_index = match.start()
+            byte = self._bitmap[byte_index]
+        offset = (byte_index << 3) + (~byte & (byte + 1)).bit_length() - 1
+        return offset if offset < self._size else None
+
+    def allocate(self, key, preferred):
+        """
+        Return the offset assigned to the key, assigning it if the key has no address yet
+
+        :param key: Stable key of the node or link
+        :type key: str
+        :param preferred: Offset assigned if it is free, used by the sequential strategy
+        :type preferred: int
+        :return: Offset of the address in the pool
+        :rtype: int
+        :raises IndexError: if all addresses of the pool are assigned
+        """
+        offset = self.table.get(key)
+        if offset is not None:
+            return offset
+
+        if self._used >= self._size:
+            raise IndexError("%s: Address pool exhausted, all %d addresses are assigned"
+                             % (self._pool_name, self._size))
+
+        if self._strategy == 'stable':
+            # Collisions are resolved by taking the following free offset, the pool is not full so one is free
+            offset = self._find_free(self.stable_offset(key, self._size))
+            if offset is None:
+                offset = self._find_free(0)
+        elif self._strategy == 'sequential' and 0 <= preferred < self._size and preferred not in self:
+            offset = preferred
+        else:
+            # Addresses are never released during the run, so the lowest free offset only grows
+            offset = self._next_free = self._find_free(self._next_free)
+
+        self.table[key] = offset
+        self._mark(offset)
+        return offset
+
+    def adopt(self, key, offset):
+        """
+        Assign the offset to the key, e.g. of the address already configured on the interface, so the key keeps it.
+
+        :param key: Stable key of the node or link
+        :type key: str
+        :param offset: Offset of the address in the pool
+        :type offset: int
+        """
+        # The offset assigned to the key before is not released until the next run, as other interface may use it
+        self.table[key] = offset
+        self._mark(offset)
+
+    @staticmethod
+    def stable_offset(key, size):
+        """
+        Return the offset derived from the hash of the key. It is the same in each run and on each host.
+
+        :param key: Stable key of the node or link
+        :type key: str
+        :param size: Number of addresses in the pool
+        :type size: int
+        :rtype: int
+        """
+        return int(hashlib.sha256(key.encode('utf-8')).hexdigest()[:16], 16) % size
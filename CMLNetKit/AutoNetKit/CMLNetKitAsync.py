@@ -0,0 +1,187 @@
+# -*- coding: utf-8 -*-
+# (c) 2020-2023 Piotr Wojciechowski <piotr@it-playground.pl>
+# GNU General Public License v3.0+ (see COPYING or https://www.gnu.org/licenses/gpl-3.0.txt)
+
+import asyncio
+
+
+class CMLNetKitAsyncClient(object):
+    """
+    Initializes a CMLNetKitAsyncClient instance. This class talks to the CML2 REST API using asyncio, so many labs
+    can be listed, downloaded and imported concurrently. The number of requests sent at the same time is limited
+    and requests rejected by the server as too many (HTTP 429) or when the service is unavailable (HTTP 503) are
+    retried with exponential backoff.
+
+    The client must be used as an asynchronous context manager, it authenticates when entering the context.
+
+    :param cml_options: Configuration stored in CMLNetKitConfig class.
+    :type cml_options: CMLNetKitConfig class
+    :param concurrency: Maximum number of requests sent at the same time
+    :type concurrency: int
+    :param base_url: URL of CML2 API, by default built from the host stored in CMLNetKitConfig class
+    :type base_url: str
+    :param retries: Number of times the request is retried when server responds with HTTP 429 or 503
+    :type retries: int
+    :param backoff: Delay in seconds before the first retry, doubled on each next retry
+    :type backoff: float
+    """
+
+    _retry_status_codes = [429, 503]
+    _backoff_max = 30
+
+    def __init__(self, cml_options, concurrency=4, base_url=None, retries=5, backoff=0.5):
+        self._cmlnetkitconfig = cml_options
+        self._base_url = base_url if base_url is not None else "https://" + cml_options.host + "/api/v0/"
+        self._concurrency = concurrency
+        self._retries = retries
+        self._backoff = backoff
+        self._semaphore = None
+        self._http_client = None
+
+    async def __aenter__(self):
+        try:
+            import httpx
+        except ImportError:
+            raise ImportError("The httpx library is required to use the asyncio API client. "
+                              "Install it with 'pip install httpx'")
+
+        self._semaphore = asyncio.Semaphore(self._concurrency)
+        self._http_client = httpx.AsyncClient(base_url=self._base_url, verify=self._cmlnetkitconfig.ssl_verify,
+                                              limits=httpx.Limits(max_connections=self._concurrency),
+                                              timeout=httpx.Timeout(60.0))
+        try:
+            await self.authenticate()
+        except BaseException:
+            await self._http_client.aclose()
+            raise
+        return self
+
+    async def __aexit__(self, exc_type, exc_value, traceback):
+        await self._http_client.aclose()
+
+    async def _request(self, method, url, **kwargs):
+        """
+        Send the request to CML2 API. The request waits for a free slot if the concurrency limit is reached and
+        is retried with exponential backoff if server responds with HTTP 429 or 503.
+
+        :param method: HTTP method
+        :type method: str
+        :param url: URL relative to API base URL
+        :type url: str
+        :return: HTTP response
+        :rtype: httpx.Response
+        :raises httpx.HTTPStatusError: if server responds with error
+        """
+        for attempt in range(self._retries + 1):
+            async with self._semaphore:
+                response = await self._http_client.request(method, url, **kwargs)
+            if response.status_code not in self._retry_status_codes or attempt == self._retries:
+                break
+            await asyncio.sleep(self._retry_delay(response, attempt))
+
+        response.raise_for_status()
+        return response
+
+    def _retry_delay(self, response, attempt):
+        """
+        Return the delay before retrying the request. The Retry-After header sent by server is respected,
+        otherwise the delay is doubled on each attempt.
+
+        :param response: HTTP response
+        :type response: httpx.Response
+        :param attempt: Number of attempts done so far, counted from 0
+        :type attempt: int
+        :return: Delay in seconds
+        :rtype: float
+        """
+        try:
+            return min(float(response.headers['Retry-After']), self._backoff_max)
+        except (KeyError, ValueError):
+            return min(self._backoff * 2 ** attempt, self._backoff_max)
+
+    async def authenticate(self):
+        """
+        Authenticate to CML2 API, the received token is sent with all next requests
+
+        :raises httpx.HTTPStatusError: if authentication failed
+        """
+        response = await self._request('POST', 'authenticate', json={'username': self._cmlnetkitconfig.username,
+                                                                     'password': self._cmlnetkitconfig.password})
+        self._http_client.headers['Authorization'] = 'Bearer ' + response.json()
+
+    async def lab_details(self, lab_id):
+        """
+        Return details of the lab
+
+        :param lab_id: Lab ID
+        :type lab_id: str
+        :return: Lab details as returned by CML2 API
+        :rtype: dict
+        """
+        response = await self._request('GET', 'labs/' + lab_id)
+        return response.json()
+
+    async def lab_tiles(self):
+        """
+        Return details of all labs with one request
+
+        :return: Response of CML2 API populate_lab_tiles endpoint
+        :rtype: dict
+        """
+        response = await self._request('GET', 'populate_lab_tiles')
+        return response.json()
+
+    async def download_lab(self, lab_id):
+        """
+        Download the lab topology
+
+        :param lab_id: Lab ID
+        :type lab_id: str
+        :return: Lab topology in YAML format
+        :rtype: str
+        """
+        response = await self._request('GET', 'labs/' + lab_id + '/download')
+        return response.text
+
+    async def lab_nodes(self, lab_id):
+        """
+        Return IDs of the lab nodes
+
+        :param lab_id: Lab ID
+        :type lab_id: str
+        :return: Dictionary of node labels and IDs
+        :rtype: dict
+        """
+        response = await self._request('GET', 'labs/' + lab_id + '/nodes', params={'data': 'true'})
+        return dict((node.get('label') or node.get('data', {}).get('label'), node['id']) for node in response.json())
+
+    async def update_node_config(self, lab_id, node_id, config):
+        """
+        Update the startup configuration of the node
+
+        :param lab_id: Lab ID
+        :type lab_id: str
+        :param node_id: Node ID
+        :type node_id: str
+        :param config: Node configuration
+        :type config: str
+        """
+        await self._request('PATCH', 'labs/' + lab_id + '/nodes/' + node_id, json={'configuration': config})
+
+    async def import_lab(self, topology, title):
+        """
+        Import the topology as a new lab
+
+        :param topology: Lab topology in YAML format
+        :type topology: str
+        :param title: Title of the new lab
+        :type title: str
+        :return: ID of the new lab
+        :rtype: str
+        :raises ValueError: if server did not return the ID of the new lab
+        """
+        response = await self._request('POST', 'import', params={'title': title}, content=topology)
+        lab_id = response.json().get('id')
+        if lab_id is None:
+            raise ValueError("No lab ID returned")
+        return lab_id
@@ -0,0 +1,292 @@
+# -*- coding: utf-8 -*-
+# (c) 2020-2023 Piotr Wojciechowski <piotr@it-playground.pl>
+# GNU General Public License v3.0+ (see COPYING or https://www.gnu.org/licenses/gpl-3.0.txt)
+
+import asyncio
+import sys
+from concurrent.futures import ThreadPoolExecutor
+
+from prettytable import PrettyTable
+
+from CMLNetKit.AutoNetKit.CMLNetKit import CMLNetKit
+from CMLNetKit.AutoNetKit.CMLNetKitAsync import CMLNetKitAsyncClient
+from CMLNetKit.AutoNetKit.CMLNetKitOutput import CMLNetKitOutput
+
+
+class CMLNetKitBatch(object):
+    """
+    Initializes a CMLNetKitBatch instance. This class is used to process many labs in one run. Labs are processed
+    concurrently by a bounded pool of worker threads which share one client connected to CML2 server, or by
+    asyncio tasks when the asyncio API client is selected.
+
+    :param cml_options: Configuration stored in CMLNetKitConfig class.
+    :type cml_options: CMLNetKitConfig class
+    :param profiler: Profiler recording the phases of processing all labs
+    :type profiler: CMLNetKitProfiler
+    """
+
+    _cmlnetkitconfig = None
+    _cmlnetkit = None
+    profiler = None
+
+    def __init__(self, cml_options, profiler=None):
+        super(CMLNetKitBatch, self).__init__()
+
+        self._cmlnetkitconfig = cml_options
+        self._cmlnetkit = CMLNetKit(cml_options, profiler=profiler)
+        self.profiler = self._cmlnetkit.profiler
+
+    def run(self):
+        """
+        Process all selected labs and print the result of each of them on console
+        """
+        if self._cmlnetkitconfig.use_async:
+            results = asyncio.run(self._run_async())
+        else:
+            results = self._run_threads()
+
+        if results is None:
+            return
+        if not results:
+            print("No labs selected")
+            return
+
+        TOutput = PrettyTable()
+        TOutput.field_names = ['Lab ID', 'Result']
+        TOutput.align['Result'] = 'l'
+        for r in results:
+            TOutput.add_row(r)
+        print("\nBatch processing summary")
+        print(TOutput)
+
+    def _run_threads(self):
+        """
+        Process all selected labs using the pool of worker threads
+
+        :return: List of lab IDs and results of processing them, None if only IP addresses were printed
+        :rtype: list
+        """
+        lab_ids = self.get_lab_ids()
+        if not lab_ids:
+            return []
+
+        # Connect to CML2 server before starting the workers, so they all share the same session
+        cml_client = self._cmlnetkit._get_cml_client()
+
+        if self._cmlnetkitconfig.list_ips:
+            self._run_list_ips(lab_ids, cml_client)
+            return None
+
+        results = []
+        with ThreadPoolExecutor(max_workers=self._cmlnetkitconfig.workers) as executor:
+            futures = [(lab_id, executor.submit(self._process_lab, lab_id, cml_client)) for lab_id in lab_ids]
+            for lab_id, future in futures:
+                try:
+                    results.append([lab_id, future.result()])
+                except Exception as e:
+                    results.append([lab_id, "Failed: %s: %s" % (type(e).__name__, e)])
+        return results
+
+    async def _run_async(self):
+        """
+        Process all selected labs using the asyncio API client. Labs are downloaded and imported concurrently,
+        the number of requests sent at the same time is limited by the number of workers.
+
+        :return: List of lab IDs and results of processing them, None if only IP addresses were printed
+        :rtype: list
+        """
+        async with CMLNetKitAsyncClient(self._cmlnetkitconfig, concurrency=self._cmlnetkitconfig.workers) as client:
+            lab_ids = list(self._cmlnetkitconfig.lab_ids)
+            if self._cmlnetkitconfig.lab_title is not None:
+                with self.profiler.phase('catalog'):
+                    lab_tiles = await client.lab_tiles()
+                labs = self._cmlnetkit._get_lab_catalog().refresh(lambda: lab_tiles)
+                lab_ids += [lab['id'] for lab in self._cmlnetkit.select_labs(labs)]
+            lab_ids = list(dict.fromkeys(lab_ids))
+            if not lab_ids:
+                return []
+
+            if self._cmlnetkitconfig.list_ips:
+                cmlnetkits = await asyncio.gather(*[self._download_lab_async(lab_id, client) for lab_id in lab_ids],
+                                                  return_exceptions=True)
+                output = self._get_ip_addresses_output()
+                for lab_id, cmlnetkit in zip(lab_ids, cmlnetkits):
+                    self._print_lab_ip_addresses(lab_id, lambda: self._get_downloaded_lab(cmlnetkit), output)
+                return None
+
+            results = await asyncio.gather(*[self._process_lab_async(lab_id, client) for lab_id in lab_ids],
+                                           return_exceptions=True)
+
+        return [[lab_id, "Failed: %s: %s" % (type(r).__name__, r) if isinstance(r, Exception) else r]
+                for lab_id, r in zip(lab_ids, results)]
+
+    def _run_list_ips(self, lab_ids, cml_client):
+        """
+        Download all selected labs concurrently and print the IP addresses of each lab in the requested order
+
+        :param lab_ids: List of lab IDs
+        :type lab_ids: list
+        :param cml_client: Client connected to CML2 server
+        :type cml_client: virl2_client.ClientLibrary
+        """
+        output = self._get_ip_addresses_output()
+        with ThreadPoolExecutor(max_workers=self._cmlnetkitconfig.workers) as executor:
+            futures = [(lab_id, executor.submit(self._download_lab, lab_id, cml_client)) for lab_id in lab_ids]
+            for lab_id, future in futures:
+                self._print_lab_ip_addresses(lab_id, future.result, output)
+
+    def _get_ip_addresses_output(self):
+        """
+        Return the writer of machine-readable output shared by all labs, so CSV header is written only once
+
+        :return: Writer of machine-readable output, None if IP addresses are printed as tables
+        :rtype: CMLNetKitOutput
+        """
+        if self._cmlnetkitconfig.output_format == 'table':
+            return None
+        return CMLNetKitOutput(self._cmlnetkitconfig.output_format, CMLNetKit._ip_addresses_fields)
+
+    def _print_lab_ip_addresses(self, lab_id, get_cmlnetkit, output):
+        """
+        Print the IP addresses of a single lab. If the lab cannot be read the error is printed and the next labs
+        are processed. In machine-readable output formats the error is printed on standard error.
+
+        :param lab_id: Lab ID
+        :type lab_id: str
+        :param get_cmlnetkit: Function returning CMLNetKit instance with loaded lab
+        :type get_cmlnetkit: function
+        :param output: Writer of machine-readable output, None if IP addresses are printed as tables
+        :type output: CMLNetKitOutput
+        """
+        if output is None:
+            print("\nLab " + lab_id)
+        try:
+            get_cmlnetkit().print_lab_ip_addresses(output)
+        except Exception as e:
+            if output is None:
+                print("Failed: %s: %s" % (type(e).__name__, e))
+            else:
+                print("Lab %s failed: %s: %s" % (lab_id, type(e).__name__, e), file=sys.stderr)
+
+    @staticmethod
+    def _get_downloaded_lab(cmlnetkit):
+        """
+        Return CMLNetKit instance with the lab downloaded by asyncio API client
+
+        :param cmlnetkit: CMLNetKit instance with loaded lab, or the exception raised when downloading it
+        :type cmlnetkit: CMLNetKit or Exception
+        :return: CMLNetKit instance with loaded lab
+        :rtype: CMLNetKit
+        """
+        if isinstance(cmlnetkit, Exception):
+            raise cmlnetkit
+        return cmlnetkit
+
+    async def _download_lab_async(self, lab_id, client):
+        """
+        Download a single lab using the asyncio API client. If the topology cache is enabled, the lab details are
+        downloaded first and the topology is downloaded only if the cached one is not up to date.
+
+        :param lab_id: Lab ID
+        :type lab_id: str
+        :param client: asyncio client connected to CML2 server
+        :type client: CMLNetKitAsyncClient
+        :return: CMLNetKit instance with loaded lab
+        :rtype: CMLNetKit
+        """
+        cmlnetkit = CMLNetKit(self._cmlnetkitconfig, lab_id=lab_id, profiler=self.profiler)
+        lab_details = None
+        if cmlnetkit._get_topology_cache() is not None:
+            with self.profiler.phase('revalidate'):
+                lab_details = await client.lab_details(lab_id)
+            if cmlnetkit.lab_load_cached(lab_details):
+                return cmlnetkit
+        with self.profiler.phase('download'):
+            topology = await client.download_lab(lab_id)
+        cmlnetkit.lab_load(topology, lab_details)
+        return cmlnetkit
+
+    def _process_lab(self, lab_id, cml_client):
+        """
+        Process a single lab, this method is run by worker threads
+
+        :param lab_id: Lab ID
+        :type lab_id: str
+        :param cml_client: Client connected to CML2 server
+        :type cml_client: virl2_client.ClientLibrary
+        :return: Result of processing the lab
+        :rtype: str
+        """
+        cmlnetkit = CMLNetKit(self._cmlnetkitconfig, cml_client=cml_client, lab_id=lab_id, profiler=self.profiler)
+        return cmlnetkit.process_lab()
+
+    async def _process_lab_async(self, lab_id, client):
+        """
+        Process a single lab using the asyncio API client
+
+        :param lab_id: Lab ID
+        :type lab_id: str
+        :param client: asyncio client connected to CML2 server
+        :type client: CMLNetKitAsyncClient
+        :return: Result of processing the lab
+        :rtype: str
+        """
+        cmlnetkit = await self._download_lab_async(lab_id, client)
+
+        # Updating the configurations does not wait for the server, it is run in a thread so the event loop
+        # keeps downloading and importing other labs in the meantime
+        await asyncio.get_running_loop().run_in_executor(None, cmlnetkit.update_devices_confs)
+
+        if not cmlnetkit.lab_conf_changed:
+            cmlnetkit.save_state()
+            return "Lab configuration unchanged"
+        if self._cmlnetkitconfig.dry_run:
+            return "Dry Run mode: No changes applied to CML2 server"
+
+        if self._cmlnetkitconfig.in_place:
+            changed_node_configs = cmlnetkit.get_changed_node_configs()
+            with self.profiler.phase('patch'):
+                node_ids = await client.lab_nodes(lab_id)
+                await asyncio.gather(*[client.update_node_config(lab_id, node_ids[node_label], node_config)
+                                       for node_label, node_config in changed_node_configs])
+            self.profiler.count('node_config_patches', len(changed_node_configs))
+            cmlnetkit.save_state()
+            return "Lab %s updated, %d node configurations changed" % (lab_id, len(changed_node_configs))
+
+        topology = cmlnetkit.lab_dump()
+        with self.profiler.phase('upload'):
+            lab_uploaded_id = await client.import_lab(topology, cmlnetkit.lab_conf["lab"]["title"])
+        cmlnetkit.save_state()
+        return "Lab uploaded as " + lab_uploaded_id
+
+    def _download_lab(self, lab_id, cml_client):
+        """
+        Download a single lab, this method is run by worker threads
+
+        :param lab_id: Lab ID
+        :type lab_id: str
+        :param cml_client: Client connected to CML2 server
+        :type cml_client: virl2_client.ClientLibrary
+        :return: CMLNetKit instance with downloaded lab
+        :rtype: CMLNetKit
+        """
+        cmlnetkit = CMLNetKit(self._cmlnetkitconfig, cml_client=cml_client, lab_id=lab_id, profiler=self.profiler)
+        cmlnetkit.lab_download()
+        return cmlnetkit
+
+    def get_lab_ids(self):
+        """
+        Return the IDs of labs selected in options by ID, from the file, and by title pattern. Each lab is
+        returned once, in the order it was selected.
+
+        :return: List of lab IDs
+        :rtype: list
+        :raises requests.exceptions.HTTPError: if there was a transport error
+        """
+        lab_ids = list(self._cmlnetkitconfig.lab_ids)
+
+        # Labs are selected from the catalog fetched from CML2 server, the stored catalog may be out of date
+        if self._cmlnetkitconfig.lab_title is not None:
+            lab_ids += [lab['id'] for lab in self._cmlnetkit.get_labs(refresh=True)]
+
+        return list(dict.fromkeys(lab_ids))
@@ -0,0 +1,281 @@
+# -*- coding: utf-8 -*-
+# (c) 2020-2023 Piotr Wojciechowski <piotr@it-playground.pl>
+# GNU General Public License v3.0+ (see COPYING or https://www.gnu.org/licenses/gpl-3.0.txt)
+
+import copy
+import re
+
+
+class CMLNetKitConfParse(object):
+    """
+    Initializes a CMLNetKitConfParse instance. This class is a lightweight parser of the node startup configuration
+    that can be used instead of CiscoConfParse. The configuration is parsed in one linear pass, the interface
+    stanzas are indexed by name and the lines are edited in place.
+
+    Parsing follows the rules of CiscoConfParse with the default 'ios' syntax, so the serialized configuration is
+    the same as produced by CiscoConfParse: trailing whitespaces are removed, blank lines are dropped except in
+    banners and macros, and a line is a child of the closest preceding configuration line with a lower indent.
+
+    :param node_config: Node startup configuration
+    :type node_config: str
+    """
+
+    _comment_delimiter = '!'
+    _banner_re = re.compile(r'|'.join([r'^(set\s+)*banner\s+' + banner_type for banner_type in
+                                       ['login', 'motd', 'incoming', 'exec', 'telnet', 'lcd']] +
+                                      [r'aaa authentication fail-message']))
+    _banner_delimiter_re = re.compile(r'^(?:(?P<btype>(?:set\s+)*banner\s\w+\s+)(?P<bchar>\S))')
+
+    def __init__(self, node_config):
+        self.changed = False
+
+        self._text = [line.rstrip() for line in node_config.split('\n')]
+        self._children = [[] for _ in self._text]
+        self._deleted = [False] * len(self._text)
+        self._interfaces = []
+        self._interfaces_by_name = {}
+
+        self._parse()
+
+    def _is_comment(self, text):
+        """
+        Checks if the configuration line is a comment
+
+        :param text: Configuration line
+        :type text: str
+        :rtype: bool
+        """
+        stripped_text = text.lstrip()
+        return len(stripped_text) > 0 and stripped_text[0] == self._comment_delimiter
+
+    def _parse(self):
+        """
+        Build the parent and children relations between configuration lines, mark the banners and macros and
+        index the interface stanzas
+        """
+        text = self._text
+        indent = [len(line) - len(line.lstrip()) for line in text]
+        is_comment = [self._is_comment(line) for line in text]
+        is_config_line = [len(line.strip()) > 0 and not is_comment[idx] for idx, line in enumerate(text)]
+        keep_blank_line = [False] * len(text)
+
+        max_indent = 0
+        parents_cache = {}
+        for idx in range(len(text)):
+            if indent[idx] < max_indent and is_config_line[idx]:
+                parent = None
+                for parent_indent in [i for i in parents_cache if i >= indent[idx]]:
+                    del parents_cache[parent_indent]
+            else:
+                parent = parents_cache.get(indent[idx])
+
+            if indent[idx] > 0 and parent is None:
+                candidate = idx - 1
+                while candidate >= 0:
+                    if indent[candidate] < indent[idx] and is_config_line[candidate]:
+                        parent = candidate
+                        parents_cache[indent[idx]] = parent
+                        break
+                    candidate -= 1
+
+            # Comment is not a child when the line right above it has higher indent
+            if indent[idx] > 0 and parent is not None and not (is_comment[idx] and indent[idx - 1] > indent[idx]):
+                self._children[parent].append(idx)
+
+            if indent[idx] == 0 and is_config_line[idx]:
+                max_indent = 0
+            elif indent[idx] > max_indent:
+                max_indent = indent[idx]
+
+        # Banner body lines are the children of banner line, blank lines inside the banner are kept
+        for idx, line in enumerate(text):
+            if not self._banner_re.search(line):
+                continue
+            keep_blank_line[idx] = True
+            match = self._banner_delimiter_re.search(line)
+            if match is None or len(line.split(match.group('bchar'))) > 2:
+                continue
+            for child in range(idx + 1, len(text)):
+                self._children[idx].append(child)
+                if match.group('bchar') in text[child].strip():
+                    break
+                keep_blank_line[child] = True
+
+        # Macro body lines are the children of macro line up to the '@' line, blank lines inside the macro are kept
+        for idx, line in enumerate(text):
+            if line[0:11] != 'macro name ':
+                continue
+            keep_blank_line[idx] = True
+            for child in range(idx + 1, len(text)):
+                keep_blank_line[child] = True
+                self._children[idx].append(child)
+                if text[child] == '@':
+                    break
+
+        for idx, line in enumerate(text):
+            if line.strip() == '' and not keep_blank_line[idx]:
+                self._deleted[idx] = True
+            elif line.startswith('interface'):
+                self._interfaces.append(idx)
+                self._interfaces_by_name.setdefault(line[len('interface'):].strip(), idx)
+
+    def _find_parents(self, linespec):
+        """
+        Return indexes of configuration lines matching the linespec. Only interface lines are searched when
+        the linespec is anchored to the 'interface' keyword.
+
+        :param linespec: Regular expression for the parent line
+        :type linespec: str or re.Pattern
+        :rtype: list
+        """
+        linespec_re = re.compile(linespec)
+        if linespec_re.pattern.startswith('^interface'):
+            candidates = self._interfaces
+        else:
+            candidates = range(len(self._text))
+        return [idx for idx in candidates if not self._deleted[idx] and linespec_re.search(self._text[idx])]
+
+    def find_children(self, linespec):
+        """
+        Returns the lines matching the linespec and their immediate children
+
+        :param linespec: Regular expression for the parent line
+        :type linespec: str
+        :return: List of configuration lines
+        :rtype: list
+        """
+        return self._parents_with_children(self._find_parents(linespec))
+
+    def _parents_with_children(self, parents):
+        """
+        Returns the parent lines and their immediate children
+
+        :param parents: Indexes of parent lines
+        :type parents: list
+        :return: List of configuration lines
+        :rtype: list
+        """
+        lines = set()
+        for parent in parents:
+            lines.add(parent)
+            lines.update(child for child in self._children[parent] if not self._deleted[child])
+        return [self._text[idx] for idx in sorted(lines)]
+
+    def replace_children(self, parentspec, childspec, replacestr, excludespec=None):
+        """
+        Replace the text matching childspec within the immediate children of lines matching parentspec
+
+        :param parentspec: Regular expression for the parent line
+        :type parentspec: str
+        :param childspec: Regular expression for the child line
+        :type childspec: str
+        :param replacestr: Text that replaces the text matching childspec
+        :type replacestr: str
+        :param excludespec: Regular expression for the lines that must be skipped
+        :type excludespec: str
+        :return: List of changed configuration lines
+        :rtype: list
+        """
+        retval = []
+        childspec_re = re.compile(childspec)
+        excludespec_re = re.compile(excludespec) if excludespec else None
+        for parent in self._find_parents(parentspec):
+            if excludespec_re is not None and excludespec_re.search(self._text[parent]):
+                continue
+            for child in self._children[parent]:
+                if self._deleted[child]:
+                    continue
+                if excludespec_re is not None and excludespec_re.search(self._text[child]):
+                    continue
+                if childspec_re.search(self._text[child]):
+                    new_text = childspec_re.sub(replacestr, self._text[child])
+                    # Lines replaced with nothing are removed from configuration
+                    if new_text.strip() == '':
+                        self._deleted[child] = True
+                        new_text = None
+                    else:
+                        self._text[child] = new_text
+                    retval.append(new_text)
+
+        if retval:
+            self.changed = True
+        return retval
+
+    def edit_children(self, parentspec, edits, guard=None):
+        """
+        Apply the changes to the immediate children of lines matching parentspec in one traversal. The result is
+        the same as of replace_children() called for each change in order, as the change of the line depends only
+        on the line itself.
+
+        :param parentspec: Regular expression for the parent line
+        :type parentspec: str or re.Pattern
+        :param edits: List of tuples with compiled childspec, replacement text and compiled excludespec or None
+        :type edits: list
+        :param guard: Function called with the lines matching parentspec and their immediate children, changes are
+                      not applied if it returns True
+        :type guard: function
+        :return: List of changed configuration lines
+        :rtype: list
+        """
+        parents = self._find_parents(parentspec)
+        if guard is not None and guard(self._parents_with_children(parents)):
+            return []
+
+        retval = []
+        for parent in parents:
+            parent_edits = [edit for edit in edits if edit[2] is None or not edit[2].search(self._text[parent])]
+            for child in self._children[parent]:
+                for childspec_re, replacestr, excludespec_re in parent_edits:
+                    if self._deleted[child]:
+                        break
+                    if excludespec_re is not None and excludespec_re.search(self._text[child]):
+                        continue
+                    if childspec_re.search(self._text[child]):
+                        new_text = childspec_re.sub(replacestr, self._text[child])
+                        # Lines replaced with nothing are removed from configuration
+                        if new_text.strip() == '':
+                            self._deleted[child] = True
+                            new_text = None
+                        else:
+                            self._text[child] = new_text
+                        retval.append(new_text)
+
+        if retval:
+            self.changed = True
+        return retval
+
+    def copy(self):
+        """
+        Return the copy of the parsed configuration that can be changed without changing this one. The edits change
+        only the text of the lines and remove lines, so the relations between lines are shared by the copies.
+
+        :rtype: CMLNetKitConfParse
+        """
+        parsed_config = copy.copy(self)
+        parsed_config.changed = False
+        parsed_config._text = list(self._text)
+        parsed_config._deleted = list(self._deleted)
+        return parsed_config
+
+    def interface_children(self, iface_name):
+        """
+        Returns the interface line and its immediate children for the interface with exactly given name
+
+        :param iface_name: Interface name
+        :type iface_name: str
+        :return: List of configuration lines or None if interface is not configured
+        :rtype: list
+        """
+        idx = self._interfaces_by_name.get(iface_name)
+        if idx is None:
+            return None
+        return [self._text[idx]] + [self._text[child] for child in self._children[idx] if not self._deleted[child]]
+
+    def dumps(self):
+        """
+        Serialize the parsed configuration back to the text
+
+        :return: Node startup configuration
+        :rtype: str
+        """
+        return '\n'.join(line for idx, line in enumerate(self._text) if not self._deleted[idx])
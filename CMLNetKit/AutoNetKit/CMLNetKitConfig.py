@@ -3,7 +3,6 @@
 # GNU General Public License v3.0+ (see COPYING or https://www.gnu.org/licenses/gpl-3.0.txt)
 
 import argparse
-import netaddr
 
 
 class CMLNetKitConfig:
@@ -18,13 +17,63 @@ class CMLNetKitConfig:
     # Connection definition
     host = None
     lab_id = None
+    lab_ids = []
+    lab_title = None
+    lab_owner = None
+    lab_state = None
     list_labs = False
     list_ips = False
+    # Format of the labs list and IP addresses list
+    output_format = 'table'
     port = None
     username = None
     password = None
     ssl_verify = True
     dry_run = False
+    # Update only the changed node configurations in the existing lab instead of importing a new lab
+    in_place = False
+    verbose = False
+
+    # Profiling of the run phases, the summary is printed and the trace is written when requested
+    profile = False
+    profile_json = None
+    profile_memory = False
+    cprofile_file = None
+
+    # Offline mode reads the lab topology from the file and writes the result to the file instead of CML2 server
+    input_file = None
+    output_file = '-'
+
+    # Batch mode processes many labs concurrently by given number of workers
+    batch = False
+    workers = 4
+    # Use the asyncio API client, the number of workers limits the number of concurrent requests
+    use_async = False
+
+    # Parser used to read and update node configurations
+    config_engine = 'ciscoconfparse'
+    # Number of processes rewriting node configurations
+    jobs = 1
+    # Incremental mode keeps the state of each lab in this directory and updates only nodes changed since last run
+    state_dir = None
+    # Addresses are assigned by the index of the node or link in the lab, the lowest free ones, or by the hash of its
+    # label
+    allocation = 'sequential'
+    # Duplicated addresses and overlapping subnets stop the update of the lab
+    check_conflicts = False
+    # Downloaded lab topologies are kept in this directory and used again if the lab was not modified
+    cache_dir = None
+    cache_max_size = 256 * 1024 * 1024
+    cache_max_age = 24 * 3600
+    # Catalog of labs stored in the cache directory is used for this time in seconds, with background refresh the
+    # server uses the older catalog while it is fetched again
+    catalog_ttl = 300
+    background_refresh = False
+
+    # Server mode answers the requests over HTTP on the TCP address or the Unix socket
+    serve = False
+    listen = ('127.0.0.1', 8741)
+    socket_path = None
 
     # Flag if requested to change "External Connection" objects
     update_bridge = False
@@ -34,6 +83,7 @@ class CMLNetKitConfig:
     # Flag if requested to change interface configuration for directly connected devices
     update_peer = False
     peer_subnet = None
+    peer_prefixlen = 30
     # Flags for management interfaces addressing
     update_mgmt = False  # Will change to True when all management network parameters are correctly set
     mgmt_range = None
@@ -47,8 +97,41 @@ class CMLNetKitConfig:
         self.port = args.port
         self.ssl_verify = args.ssl_verify
 
-        if args.lab_id is not None:
-            self.lab_id = args.lab_id
+        if args.input_file:
+            self.input_file = args.input_file
+            self.output_file = args.output_file
+
+        # Labs can be selected by IDs, from the file with one ID per line, and by title pattern. More than
+        # one lab selected switches to the batch mode
+        self.lab_ids = list(args.lab_id or [])
+        if args.lab_file:
+            try:
+                with open(args.lab_file) as lab_file:
+                    for line in lab_file:
+                        if line.strip() and not line.strip().startswith('#'):
+                            self.lab_ids.append(line.strip())
+            except OSError as e:
+                raise ValueError('lab-file: %s' % e)
+
+        if args.lab_title:
+            self.lab_title = args.lab_title
+        self.lab_owner = args.lab_owner
+        self.lab_state = args.lab_state
+
+        if len(self.lab_ids) == 1 and self.lab_title is None:
+            self.lab_id = self.lab_ids[0]
+        elif self.lab_ids or self.lab_title is not None:
+            self.batch = True
+
+        if args.workers < 1:
+            raise ValueError('workers: argument value must be greater than 0')
+        self.workers = args.workers
+
+        # The asyncio API client is used by the batch mode, so a single lab is processed as a batch of one
+        if args.use_async is True:
+            self.use_async = True
+            if self.lab_ids:
+                self.batch = True
 
         if args.list_labs:
             self.list_labs = True
@@ -56,6 +139,9 @@ class CMLNetKitConfig:
         if args.list_ips:
             self.list_ips = True
 
+        if args.output_format:
+            self.output_format = args.output_format
+
         if args.update_bridge is True:
             self.update_bridge = True
 
@@ -65,6 +151,69 @@ class CMLNetKitConfig:
         if args.dry_run is True:
             self.dry_run = True
 
+        if args.in_place is True:
+            if args.input_file is not None:
+                raise ValueError('in-place: Cannot be used with --input, the lab is not read from CML2 server')
+            self.in_place = True
+
+        if args.verbose is True:
+            self.verbose = True
+
+        self.state_dir = args.state_dir
+        if args.allocation:
+            self.allocation = args.allocation
+        if args.check_conflicts is True:
+            self.check_conflicts = True
+
+        self.cache_dir = args.cache_dir
+        if args.cache_max_size < 1:
+            raise ValueError('cache-max-size: argument value must be greater than 0')
+        self.cache_max_size = args.cache_max_size * 1024 * 1024
+        if args.cache_max_age < 1:
+            raise ValueError('cache-max-age: argument value must be greater than 0')
+        self.cache_max_age = args.cache_max_age * 3600
+        if args.catalog_ttl < 0:
+            raise ValueError('catalog-ttl: argument value cannot be negative')
+        self.catalog_ttl = args.catalog_ttl
+
+        if args.serve is True:
+            if self.host is None:
+                raise ValueError('serve: CML2 host address must be provided with -H')
+            if self.input_file is not None:
+                raise ValueError('serve: Cannot be used with --input, the labs are read from CML2 server')
+            self.serve = True
+        # The single run would wait for the catalog fetched in the background before it exits, so the stale catalog
+        # is fetched again at once unless the server keeps running
+        if args.background_refresh is True:
+            if self.serve is not True:
+                raise ValueError('background-refresh: Can be used only with --serve')
+            self.background_refresh = True
+        host, _, port = args.listen.rpartition(':')
+        if not host or not port.isdigit() or int(port) > 65535:
+            raise ValueError('listen: Address must be provided in format HOST:PORT')
+        self.listen = (host, int(port))
+        self.socket_path = args.socket_path
+
+        if args.profile is True:
+            self.profile = True
+        if args.profile_memory is True:
+            self.profile_memory = True
+        self.profile_json = args.profile_json
+        self.cprofile_file = args.cprofile_file
+
+        if args.config_engine:
+            self.config_engine = args.config_engine
+
+        if args.jobs < 1:
+            raise ValueError('jobs: argument value must be greater than 0')
+        self.jobs = args.jobs
+
+        # Addresses are not used when only the labs are listed, so they are not checked and netaddr is not loaded
+        if self.list_labs:
+            return
+        import netaddr
+        from netaddr.ip import IPV4_MULTICAST, IPV4_RESERVED
+
         # Initialize the variable that stores subnet for addressing Loopback interfaces.
         # We need to check if /32 mask was not provided, the subnet is IPv4, unicast and provided
         # in correct CIDR format. In case any requirement is violated the program cannot continue
@@ -99,13 +248,15 @@ class CMLNetKitConfig:
                 raise ValueError('mgmt-range: %s' % e)
 
             # Check if the provided range of addresses does not overlap with any of the IPv4 reserved subnets and
-            # each address is the unicast address.
-            for ip_addr in self.mgmt_range:
-                if ip_addr.is_reserved():
-                    raise ValueError('mgmt-range: Provided IP addresses overlaps with IPv4 reserved subnets')
-                if ip_addr.is_unicast() is not True:
-                    raise ValueError('mgmt-range: Provided IP addresses range is not within the IPv4 '
-                                     'unicast space')
+            # each address is the unicast address. Only the range boundaries are compared with reserved and
+            # multicast blocks, so the check does not depend on the size of the range.
+            reserved_ip_addr = self._first_overlapping_address(self.mgmt_range, IPV4_RESERVED)
+            multicast_ip_addr = self._first_overlapping_address(self.mgmt_range, [IPV4_MULTICAST])
+            if reserved_ip_addr is not None and (multicast_ip_addr is None or reserved_ip_addr <= multicast_ip_addr):
+                raise ValueError('mgmt-range: Provided IP addresses overlaps with IPv4 reserved subnets')
+            if multicast_ip_addr is not None:
+                raise ValueError('mgmt-range: Provided IP addresses range is not within the IPv4 '
+                                 'unicast space')
 
             # If we receive the netmask from commandline argument then we need to check if the netmask
             # is in correct format, then convert it to prefixlen and store both values in class variables
@@ -162,4 +313,30 @@ class CMLNetKitConfig:
                 if prefix.prefixlen == 32:
                     raise ValueError("peer_subnet: Host address provided")
                 self.peer_subnet = args.peer_subnet
+
+            # Peer subnet is split into smaller subnets, one for each link, so they cannot be larger than
+            # the peer subnet itself
+            if args.peer_prefixlen not in range(prefix.prefixlen, 32):
+                raise ValueError("peer-prefixlen: argument value must be between %d and 31" % prefix.prefixlen)
+            self.peer_prefixlen = args.peer_prefixlen
             self.update_peer = True
+
+    @staticmethod
+    def _first_overlapping_address(ip_range, ip_blocks):
+        """
+        Return the lowest address of the range that belongs to any of provided blocks of addresses
+
+        :param ip_range: Range of IP addresses
+        :type ip_range: netaddr.IPRange
+        :param ip_blocks: List of IP subnets or ranges
+        :type ip_blocks: list
+        :return: Lowest overlapping address as integer or None if range does not overlap with any block
+        :rtype: int
+        """
+        first_overlapping = None
+        for ip_block in ip_blocks:
+            if ip_range.first <= ip_block.last and ip_block.first <= ip_range.last:
+                overlapping = max(ip_range.first, ip_block.first)
+                if first_overlapping is None or overlapping < first_overlapping:
+                    first_overlapping = overlapping
+        return first_overlapping
@@ -0,0 +1,226 @@
+# -*- coding: utf-8 -*-
+# (c) 2020-2023 Piotr Wojciechowski <piotr@it-playground.pl>
+# GNU General Public License v3.0+ (see COPYING or https://www.gnu.org/licenses/gpl-3.0.txt)
+
+import threading
+
+from CMLNetKit.AutoNetKit.CMLNetKitConfParse import CMLNetKitConfParse
+from CMLNetKit.AutoNetKit.CMLNetKitProfiler import CMLNetKitProfiler
+
+
+class CMLNetKitParsedConfig(object):
+    """
+    Initializes a CMLNetKitParsedConfig instance. This class wraps the parsed node configuration and keeps track
+    if any of the configuration lines was replaced since the configuration was parsed.
+
+    :param node_config: Node startup configuration
+    :type node_config: str
+    """
+
+    def __init__(self, node_config):
+        # CiscoConfParse is imported only when this engine is selected, it takes a while to load
+        from ciscoconfparse import CiscoConfParse
+
+        self._parsed_config = CiscoConfParse(node_config.split('\n'))
+        self.changed = False
+
+    def find_children(self, linespec):
+        """
+        Returns the lines matching the linespec and their immediate children
+
+        :param linespec: Regular expression for the parent line
+        :type linespec: str
+        :return: List of configuration lines
+        :rtype: list
+        """
+        return self._parsed_config.find_children(linespec)
+
+    def replace_children(self, parentspec, childspec, replacestr, excludespec=None):
+        """
+        Replace the text matching childspec within the immediate children of lines matching parentspec
+
+        :param parentspec: Regular expression for the parent line
+        :type parentspec: str
+        :param childspec: Regular expression for the child line
+        :type childspec: str
+        :param replacestr: Text that replaces the text matching childspec
+        :type replacestr: str
+        :param excludespec: Regular expression for the lines that must be skipped
+        :type excludespec: str
+        :return: List of changed configuration lines
+        :rtype: list
+        """
+        retval = self._parsed_config.replace_children(parentspec, childspec, replacestr, excludespec=excludespec)
+        if retval:
+            self.changed = True
+        return retval
+
+    def edit_children(self, parentspec, edits, guard=None):
+        """
+        Apply the changes to the immediate children of lines matching parentspec in one traversal. The result is
+        the same as of replace_children() called for each change in order, as the change of the line depends only
+        on the line itself.
+
+        :param parentspec: Regular expression for the parent line
+        :type parentspec: str or re.Pattern
+        :param edits: List of tuples with compiled childspec, replacement text and compiled excludespec or None
+        :type edits: list
+        :param guard: Function called with the lines matching parentspec and their immediate children, changes are
+                      not applied if it returns True
+        :type guard: function
+        :return: List of changed configuration lines
+        :rtype: list
+        """
+        parents = self._parsed_config.find_objects(getattr(parentspec, 'pattern', parentspec))
+        if guard is not None and guard([line.text for parent in parents for line in [parent] + parent.children]):
+            return []
+
+        retval = []
+        for parent in parents:
+            parent_edits = [edit for edit in edits if edit[2] is None or not edit[2].search(parent.text)]
+            for child in list(parent.children):
+                for childspec_re, replacestr, excludespec_re in parent_edits:
+                    if excludespec_re is not None and excludespec_re.search(child.text):
+                        continue
+                    if childspec_re.search(child.text):
+                        new_text = child.re_sub(childspec_re, replacestr)
+                        retval.append(new_text)
+                        # Lines replaced with nothing are removed from configuration
+                        if new_text is None:
+                            break
+
+        if retval:
+            self.changed = True
+        return retval
+
+    def dumps(self):
+        """
+        Serialize the parsed configuration back to the text
+
+        :return: Node startup configuration
+        :rtype: str
+        """
+        return '\n'.join(self._parsed_config.ioscfg)
+
+
+class CMLNetKitConfigCache(object):
+    """
+    Initializes a CMLNetKitConfigCache instance. This class keeps one parsed configuration per node, so all the
+    update passes share it. Node configurations are parsed on first use and written back to the lab configuration
+    only once, when the changes are committed.
+
+    :param lab_conf: Lab configuration YAML object
+    :type lab_conf: dict
+    :param engine: Name of the configuration parser, one of the keys of engines dictionary
+    :type engine: str
+    :param profiler: Profiler recording the parsing of node configurations
+    :type profiler: CMLNetKitProfiler
+    :param templates: Parsed configurations of the lab as loaded, kept by the long-running server. Each node gets
+                      the copy of its template, so the configuration is parsed only once while the lab is not
+                      modified. Used only if the engine can copy the parsed configuration.
+    :type templates: dict
+    """
+
+    # Configuration parsers that can be selected to parse node configurations. Each of them provides the
+    # find_children(), replace_children() and edit_children() methods used by the update passes, the changed flag
+    # and dumps()
+    engines = {'ciscoconfparse': CMLNetKitParsedConfig,
+               'native': CMLNetKitConfParse,
+               }
+
+    def __init__(self, lab_conf, engine='ciscoconfparse', profiler=None, templates=None):
+        self._lab_conf = lab_conf
+        self._parsed_configs = {}
+        self._engine = self.engines[engine]
+        self._profiler = profiler if profiler is not None else CMLNetKitProfiler()
+        self._templates = templates if hasattr(self._engine, 'copy') else None
+
+    def get(self, node_index):
+        """
+        Return the parsed configuration of the node, parsing it on first use
+
+        :param node_index: Node index in the configuration list
+        :type node_index: int
+        :return: Parsed node configuration
+        :rtype: CMLNetKitParsedConfig or CMLNetKitConfParse
+        :raises KeyError: if node has no configuration
+        """
+        parsed_config = self._parsed_configs.get(node_index)
+        if parsed_config is not None:
+            return parsed_config
+
+        node_config = self._lab_conf["nodes"][node_index]["configuration"]
+        template = self._templates.get(node_index) if self._templates is not None else None
+        # The template is used only for the configuration it was parsed from
+        if template is not None and template[0] == node_config:
+            self._profiler.count('node_config_copies')
+            with self._profiler.phase('parse'):
+                parsed_config = template[1].copy()
+        else:
+            self._profiler.count('node_config_parses')
+            with self._profiler.phase('parse'):
+                parsed_config = self._engine(node_config)
+                if self._templates is not None:
+                    # The template is kept unchanged, the node gets the copy
+                    self._templates[node_index] = (node_config, parsed_config)
+                    parsed_config = parsed_config.copy()
+        self._parsed_configs[node_index] = parsed_config
+        return parsed_config
+
+    def commit(self):
+        """
+        Write configurations of changed nodes back to the lab configuration
+
+        :return: True if any node configuration was changed
+        :rtype: bool
+        """
+        changed = False
+        for node_index, parsed_config in self._parsed_configs.items():
+            if parsed_config.changed:
+                self._lab_conf["nodes"][node_index]["configuration"] = parsed_config.dumps()
+                parsed_config.changed = False
+                changed = True
+        return changed
+
+
+class CMLNetKitConfigTemplates(object):
+    """
+    Initializes a CMLNetKitConfigTemplates instance. This class keeps the parsed node configurations of the labs
+    for the long-running server. The configurations are kept for the lab ID and the validator of the lab details,
+    the same as used by the topology cache, so they are parsed again only when the lab was modified. The
+    configurations of the least recently used labs are removed when more labs are kept than the maximum.
+
+    :param max_labs: Maximum number of labs with kept configurations
+    :type max_labs: int
+    """
+
+    def __init__(self, max_labs=32):
+        self.max_labs = max_labs
+        # Dictionary of lab IDs and tuples of the validator, the engine and the dictionary of node indexes and parsed
+        # configurations, the least recently used lab is first
+        self._labs = {}
+        self._lock = threading.Lock()
+
+    def get(self, lab_id, validator, engine):
+        """
+        Return the parsed configurations of the lab. Configurations kept for other validator or other engine are
+        removed, as the lab was modified since they were parsed.
+
+        :param lab_id: Lab ID
+        :type lab_id: str
+        :param validator: Values of lab details when the lab was downloaded
+        :type validator: list
+        :param engine: Name of the configuration parser
+        :type engine: str
+        :return: Dictionary of node indexes and tuples of the node configuration and the parsed configuration,
+            filled by CMLNetKitConfigCache
+        :rtype: dict
+        """
+        with self._lock:
+            entry = self._labs.pop(lab_id, None)
+            if entry is None or entry[0] != validator or entry[1] != engine:
+                entry = (validator, engine, {})
+            self._labs[lab_id] = entry
+            while len(self._labs) > self.max_labs:
+                del self._labs[next(iter(self._labs))]
+            return entry[2]
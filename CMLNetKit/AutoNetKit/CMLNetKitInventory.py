@@ -0,0 +1,60 @@
+# -*- coding: utf-8 -*-
+# (c) 2020-2023 Piotr Wojciechowski <piotr@it-playground.pl>
+# GNU General Public License v3.0+ (see COPYING or https://www.gnu.org/licenses/gpl-3.0.txt)
+
+
+class CMLNetKitInventory(object):
+    """
+    Initializes a CMLNetKitInventory instance. This class is the table of IP addresses configured on the interfaces
+    of lab nodes. It is filled in one pass over the nodes configurations and all the IP addresses reports are
+    rendered from it, so no node configuration is parsed more than once.
+    """
+
+    def __init__(self):
+        self.rows = []
+        self._addresses = {}
+
+    def __len__(self):
+        return len(self.rows)
+
+    def __iter__(self):
+        return iter(self.rows)
+
+    def add(self, node_index, device, node_type, interface, address):
+        """
+        Add the interface to the table
+
+        :param node_index: Node index in the configuration list
+        :type node_index: int
+        :param device: Node label
+        :type device: str
+        :param node_type: Node type
+        :type node_type: str
+        :param interface: Interface name
+        :type interface: str
+        :param address: IP address and netmask of interface or None if no IP address is defined
+        :type address: netaddr.IPNetwork
+        """
+        if (node_index, interface) in self._addresses:
+            return
+        self.rows.append({'node_index': node_index,
+                          'device': device,
+                          'node_type': node_type,
+                          'interface': interface,
+                          'address': address,
+                          })
+        self._addresses[(node_index, interface)] = address
+
+    def address(self, node_index, interface):
+        """
+        Return the IP address of the interface
+
+        :param node_index: Node index in the configuration list
+        :type node_index: int
+        :param interface: Interface name
+        :type interface: str
+        :return: IP address and netmask of interface or None if no IP address is defined
+        :rtype: netaddr.IPNetwork
+        :raises KeyError: if interface is not in the table
+        """
+        return self._addresses[(node_index, interface)]
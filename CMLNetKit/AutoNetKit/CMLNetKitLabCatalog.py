@@ -0,0 +1,198 @@
+# -*- coding: utf-8 -*-
+# (c) 2020-2023 Piotr Wojciechowski <piotr@it-playground.pl>
+# GNU General Public License v3.0+ (see COPYING or https://www.gnu.org/licenses/gpl-3.0.txt)
+
+import fnmatch
+import hashlib
+import json
+import os
+import sys
+import threading
+import time
+
+
+class CMLNetKitLabCatalog(object):
+    """
+    Initializes a CMLNetKitLabCatalog instance. This class keeps the catalog of labs on CML2 server: the ID, title,
+    owner, state and size of each lab. The catalog is fetched in bulk, with one request for all labs, and stored in
+    the cache directory in one file per server and user, as users see different labs. The stored catalog is used
+    until it is older than the time to live, so repeated listing does not connect to the server at all.
+
+    With background refresh, used by the long-running server, the catalog older than the time to live is returned
+    at once and fetched again in a separate thread, so it is up to date for the next request. The last catalog is
+    also kept in memory, so the server reads the file only once.
+
+    :param cache_dir: Directory where the catalog is stored, or None to keep it only in memory
+    :type cache_dir: str
+    :param key: Server address and user name identifying the catalog
+    :type key: str
+    :param ttl: Time to live of the stored catalog in seconds
+    :type ttl: int
+    """
+
+    version = 1
+
+    # Fields of each lab in the catalog
+    fields = ['id', 'lab_title', 'owner', 'state', 'node_count', 'link_count', 'modified']
+
+    def __init__(self, cache_dir, key, ttl):
+        self.path = None
+        if cache_dir is not None:
+            self.path = os.path.join(cache_dir, 'catalog-' + hashlib.sha256(key.encode('utf-8')).hexdigest()[:16] +
+                                     '.json')
+        self.key = key
+        self.ttl = ttl
+        self._refresh_thread = None
+        # Time the last catalog was fetched and the catalog
+        self._memory = None
+
+    @classmethod
+    def from_lab_tiles(cls, response):
+        """
+        Return the catalog built from the response of CML2 API populate_lab_tiles endpoint, which returns details
+        of all labs at once
+
+        :param response: Response of the populate_lab_tiles endpoint
+        :type response: dict
+        :return: List of labs, each as dictionary with the catalog fields
+        :rtype: list
+        """
+        # CML2 before version 2.1 returned the lab details without the "lab_tiles" key
+        lab_tiles = response.get('lab_tiles')
+        if lab_tiles is None:
+            lab_tiles = response
+        labs = []
+        for lab_id, tile in lab_tiles.items():
+            labs.append({'id': tile.get('id') or lab_id,
+                         'lab_title': tile.get('lab_title'),
+                         'owner': tile.get('owner_username') or tile.get('owner'),
+                         'state': tile.get('state'),
+                         'node_count': tile.get('node_count'),
+                         'link_count': tile.get('link_count'),
+                         'modified': tile.get('modified'),
+                         })
+        return labs
+
+    @staticmethod
+    def select(labs, title=None, owner=None, state=None):
+        """
+        Return the labs matching all provided filters
+
+        :param labs: List of labs
+        :type labs: list
+        :param title: Pattern of the lab title, shell-style wildcards are supported
+        :type title: str
+        :param owner: Name of the lab owner
+        :type owner: str
+        :param state: Lab state, e.g. STARTED or STOPPED, case insensitive
+        :type state: str
+        :rtype: list
+        """
+        return [lab for lab in labs
+                if (title is None or fnmatch.fnmatchcase(lab['lab_title'] or '', title)) and
+                (owner is None or lab['owner'] == owner) and
+                (state is None or (lab['state'] or '').upper() == state.upper())]
+
+    def load(self, max_age=None):
+        """
+        Return the stored catalog
+
+        :param max_age: Maximum age of the catalog in seconds, time to live by default
+        :type max_age: float
+        :return: List of labs, or None if the catalog is not stored, other version or too old
+        :rtype: list
+        """
+        if self._memory is None and self.path is not None:
+            try:
+                with open(self.path) as f:
+                    catalog = json.load(f)
+            except (OSError, ValueError):
+                catalog = None
+            if isinstance(catalog, dict) and catalog.get('version') == self.version and \
+                    catalog.get('key') == self.key:
+                self._memory = (catalog.get('time', 0), catalog.get('labs'))
+        if self._memory is None or time.time() - self._memory[0] > (self.ttl if max_age is None else max_age):
+            return None
+        return self._memory[1]
+
+    def store(self, labs):
+        """
+        Store the catalog. The file is replaced at once, so it is never left half written.
+
+        :param labs: List of labs
+        :type labs: list
+        :return: Stored list of labs
+        :rtype: list
+        :raises OSError: if the catalog file cannot be written
+        """
+        fetched = time.time()
+        self._memory = (fetched, labs)
+        if self.path is None:
+            return labs
+        os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+        tmp_path = '%s.%d.%d.tmp' % (self.path, os.getpid(), threading.get_ident())
+        with open(tmp_path, 'w') as f:
+            json.dump({'version': self.version, 'key': self.key, 'time': fetched, 'labs': labs}, f)
+        os.replace(tmp_path, self.path)
+        return labs
+
+    def refresh(self, fetch):
+        """
+        Fetch the catalog from CML2 server and store it
+
+        :param fetch: Function returning the response of CML2 API populate_lab_tiles endpoint
+        :type fetch: function
+        :return: List of labs
+        :rtype: list
+        """
+        return self.store(self.from_lab_tiles(fetch()))
+
+    def labs(self, fetch, background=False):
+        """
+        Return the catalog. The stored catalog is used if it is not older than the time to live, otherwise it is
+        fetched from CML2 server. With background refresh the older stored catalog is returned and the new one is
+        fetched in a separate thread.
+
+        :param fetch: Function returning the response of CML2 API populate_lab_tiles endpoint
+        :type fetch: function
+        :param background: Flag if the older catalog is returned and refreshed in the background
+        :type background: bool
+        :return: List of labs
+        :rtype: list
+        """
+        labs = self.load()
+        if labs is not None:
+            return labs
+        if background:
+            labs = self.load(max_age=float('inf'))
+            if labs is not None:
+                self.refresh_in_background(fetch)
+                return labs
+        return self.refresh(fetch)
+
+    def refresh_in_background(self, fetch):
+        """
+        Start fetching the catalog in a separate thread, unless it is already being fetched. The thread does not
+        keep the server running when it is stopped, the catalog file is replaced at once, so it is never left half
+        written.
+
+        :param fetch: Function returning the response of CML2 API populate_lab_tiles endpoint
+        :type fetch: function
+        """
+        if self._refresh_thread is not None and self._refresh_thread.is_alive():
+            return
+        self._refresh_thread = threading.Thread(target=self._refresh_quietly, args=(fetch,),
+                                                name='cmlnetkit-catalog-refresh', daemon=True)
+        self._refresh_thread.start()
+
+    def _refresh_quietly(self, fetch):
+        """
+        Fetch and store the catalog, errors are printed on standard error as nobody waits for the result
+
+        :param fetch: Function returning the response of CML2 API populate_lab_tiles endpoint
+        :type fetch: function
+        """
+        try:
+            self.refresh(fetch)
+        except Exception as e:
+            print("Lab catalog refresh failed: %s: %s" % (type(e).__name__, e), file=sys.stderr)
@@ -0,0 +1,50 @@
+# -*- coding: utf-8 -*-
+# (c) 2020-2023 Piotr Wojciechowski <piotr@it-playground.pl>
+# GNU General Public License v3.0+ (see COPYING or https://www.gnu.org/licenses/gpl-3.0.txt)
+
+import csv
+import json
+import sys
+
+
+class CMLNetKitOutput(object):
+    """
+    Initializes a CMLNetKitOutput instance. This class writes the report rows in machine-readable format as soon as
+    they are produced, so the output can be consumed incrementally by other tools. Each row is written as JSON
+    object on a separate line (JSON Lines) or as a CSV line. The CSV header is written before the first row.
+
+    :param output_format: Output format, one of the keys of formats list
+    :type output_format: str
+    :param fields: Names of the row fields, in the order they are written
+    :type fields: list
+    :param stream: Stream the rows are written to, standard output by default
+    :type stream: file object
+    """
+
+    formats = ['jsonl', 'csv']
+
+    def __init__(self, output_format, fields, stream=None):
+        if output_format not in self.formats:
+            raise ValueError("format: Unsupported output format %s" % output_format)
+        self.output_format = output_format
+        self.fields = fields
+        self._stream = stream if stream is not None else sys.stdout
+        self._csv_writer = None
+
+        if output_format == 'csv':
+            self._csv_writer = csv.DictWriter(self._stream, fieldnames=fields, lineterminator='\n')
+            self._csv_writer.writeheader()
+            self._stream.flush()
+
+    def write(self, row):
+        """
+        Write the row and flush the stream
+
+        :param row: Values of the row fields, missing fields are written empty
+        :type row: dict
+        """
+        if self.output_format == 'csv':
+            self._csv_writer.writerow({field: '' if row.get(field) is None else row[field] for field in self.fields})
+        else:
+            self._stream.write(json.dumps({field: row.get(field) for field in self.fields}) + '\n')
+        self._stream.flush()
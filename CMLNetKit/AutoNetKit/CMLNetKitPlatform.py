@@ -0,0 +1,206 @@
+# -*- coding: utf-8 -*-
+# (c) 2020-2023 Piotr Wojciechowski <piotr@it-playground.pl>
+# GNU General Public License v3.0+ (see COPYING or https://www.gnu.org/licenses/gpl-3.0.txt)
+
+import re
+
+
+class CMLNetKitInterfaceEdit(object):
+    """
+    Initializes a CMLNetKitInterfaceEdit instance. This class is the ordered plan of changes of the interface
+    configuration lines. The patterns are compiled once, when the plan is defined, and all the changes are applied
+    in one traversal of the interface configuration. The interface is not changed if the IP address is already set.
+
+    Each change is the tuple with the pattern of the line, the replacement text and optional pattern of the lines
+    that must be skipped. The replacement text can refer to the values given when the plan is applied, e.g.
+    'ip address {ip_addr} {ip_netmask}'.
+
+    :param edits: List of changes
+    :type edits: list
+    """
+
+    # Patterns of interface lines, shared by all plans as the same interfaces are changed on many nodes
+    _parentspecs = {}
+
+    def __init__(self, edits):
+        self._edits = [(re.compile(childspec), replacestr, re.compile(excludespec) if excludespec else None)
+                       for childspec, replacestr, excludespec in edits]
+
+    @classmethod
+    def parentspec(cls, iface_name):
+        """
+        Return the compiled pattern of the interface line. The pattern matches only the interface with exactly
+        the given name, so the change of GigabitEthernet1 does not change GigabitEthernet10 and the dot in
+        subinterface names is not a wildcard.
+
+        :param iface_name: Interface name
+        :type iface_name: str
+        :rtype: re.Pattern
+        """
+        parentspec = cls._parentspecs.get(iface_name)
+        if parentspec is None:
+            parentspec = re.compile(r'^interface\s+' + re.escape(iface_name) + r'\s*$')
+            cls._parentspecs[iface_name] = parentspec
+        return parentspec
+
+    @staticmethod
+    def ip_addr_defined(iface_conf=None):
+        """
+        Checks if IP address is defined in the provided interface configuration
+
+        :param iface_conf: List of interface configuration lines
+        :type iface_conf: list
+        :return: False if IP address is not defined, otherwise return True
+        :rtype: bool
+        """
+        if iface_conf is None:
+            return False
+        for config_line in iface_conf:
+            if "no ip address" in config_line:
+                return False
+            if "no ipv4 address" in config_line:
+                return False
+        return True
+
+    def apply(self, node_parsed_config, iface_name, values):
+        """
+        Apply the changes to the interface configuration
+
+        :param node_parsed_config: The parsed node configuration
+        :type node_parsed_config: CMLNetKitParsedConfig or CMLNetKitConfParse
+        :param iface_name: Name of the interface to be updated
+        :type iface_name: str
+        :param values: Values used in the replacement texts
+        :type values: dict
+        :return: List of changed configuration lines
+        :rtype: list
+        """
+        return node_parsed_config.edit_children(self.parentspec(iface_name),
+                                                [(childspec_re, replacestr.format(**values), excludespec_re)
+                                                 for childspec_re, replacestr, excludespec_re in self._edits],
+                                                guard=self.ip_addr_defined)
+
+
+class CMLNetKitPlatform(object):
+    """
+    Initializes a CMLNetKitPlatform instance. This class is the profile of the node type: the management interface
+    name and the plans of changes of the Loopback, management and peer interfaces. Node types are identified by
+    node_definition key in the node configuration downloaded from CML2 server and registered in the platforms
+    dictionary.
+
+    :param node_type: Node type
+    :type node_type: str
+    :param management_interface: Name of the management interface or None if not defined
+    :type management_interface: str
+    :param loopback: Plan of changes of the Loopback interface or None if not supported
+    :type loopback: CMLNetKitInterfaceEdit
+    :param management: Plan of changes of the management interface or None if not supported
+    :type management: CMLNetKitInterfaceEdit
+    :param peer: Plan of changes of the interfaces connected to other nodes or None if not supported
+    :type peer: CMLNetKitInterfaceEdit
+    :param links_ignored: Flag if links connected to the node are not addressed at all
+    :type links_ignored: bool
+    """
+
+    # Registered platforms, in the order they were registered
+    platforms = {}
+
+    def __init__(self, node_type, management_interface=None, loopback=None, management=None, peer=None,
+                 links_ignored=False):
+        self.node_type = node_type
+        self.management_interface = management_interface
+        self.loopback = loopback
+        self.management = management
+        self.peer = peer
+        self.links_ignored = links_ignored
+
+    @classmethod
+    def register(cls, platform):
+        """
+        Register the platform
+
+        :param platform: Platform profile
+        :type platform: CMLNetKitPlatform
+        :raises ValueError: if the node type is already registered
+        """
+        if platform.node_type in cls.platforms:
+            raise ValueError("Platform %s is already registered" % platform.node_type)
+        cls.platforms[platform.node_type] = platform
+
+    @classmethod
+    def get(cls, node_type):
+        """
+        Return the profile of the node type
+
+        :param node_type: Node type
+        :type node_type: str
+        :rtype: CMLNetKitPlatform
+        :raises KeyError: if the node type is not registered
+        """
+        return cls.platforms[node_type]
+
+    @classmethod
+    def management_interfaces(cls):
+        """
+        Return the management interface names of node types
+
+        :return: Dictionary of node types and management interface names
+        :rtype: dict
+        """
+        return dict((node_type, platform.management_interface) for node_type, platform in cls.platforms.items()
+                    if platform.management_interface is not None)
+
+    @classmethod
+    def supported(cls):
+        """
+        Return the node types with interfaces addressed on links between nodes
+
+        :rtype: list
+        """
+        return [node_type for node_type, platform in cls.platforms.items() if platform.peer is not None]
+
+    @classmethod
+    def ignored(cls):
+        """
+        Return the node types with links that are not addressed at all
+
+        :rtype: list
+        """
+        return [node_type for node_type, platform in cls.platforms.items() if platform.links_ignored]
+
+
+_loopback_ios = CMLNetKitInterfaceEdit([(r'no ip address', r'ip address {ip_addr} 255.255.255.255', None),
+                                        (r'shutdown', r'no shutdown', r'no shutdown'),
+                                        (r'description to', r'description Loopback interface', None)])
+_loopback_iosxr = CMLNetKitInterfaceEdit([(r'no ipv4 address', r'ipv4 address {ip_addr} 255.255.255.255', None),
+                                          (r'shutdown', r'no shutdown', r'no shutdown'),
+                                          (r'description to', r'description Loopback interface', None)])
+_management_ios = CMLNetKitInterfaceEdit([(r'no ip address', r'ip address {ip_addr} {ip_netmask}', None),
+                                          (r'shutdown', r'no shutdown', r'no shutdown'),
+                                          (r'description to', r'description Management interface', None)])
+_management_iosxr = CMLNetKitInterfaceEdit([(r'no ipv4 address', r'ipv4 address {ip_addr} {ip_netmask}', None),
+                                            (r'shutdown', r'no shutdown', r'no shutdown'),
+                                            (r'description to', r'description Management interface', None)])
+_management_iosvl2 = CMLNetKitInterfaceEdit([(r'no ip address', r'ip address {ip_addr} {ip_netmask}', None),
+                                             (r'shutdown', r'no shutdown', r'no shutdown'),
+                                             (r'switchport', r'no switchport', r'no switchport'),
+                                             (r'description to', r'description Management interface', None)])
+_peer_ios = CMLNetKitInterfaceEdit([(r'no ip address', r'ip address {ip_addr} {ip_netmask}', None),
+                                    (r'shutdown', r'no shutdown', r'no shutdown')])
+_peer_iosxr = CMLNetKitInterfaceEdit([(r'no ipv4 address', r'ipv4 address {ip_addr} {ip_netmask}', None),
+                                      (r'shutdown', r'no shutdown', r'no shutdown')])
+
+for _platform in [CMLNetKitPlatform('iosv', 'GigabitEthernet0/0', _loopback_ios, _management_ios, _peer_ios),
+                  CMLNetKitPlatform('csr1000v', 'GigabitEthernet1', _loopback_ios, _management_ios, _peer_ios),
+                  CMLNetKitPlatform('iosxrv', 'MgmtEth0/0/CPU0/0', _loopback_iosxr, _management_iosxr, _peer_iosxr),
+                  CMLNetKitPlatform('iosxrv9000', 'MgmtEth0/RP0/CPU0/0', _loopback_iosxr, _management_iosxr,
+                                    _peer_iosxr),
+                  CMLNetKitPlatform('nxosv', 'mgmt0', _loopback_ios, _management_ios, _peer_ios),
+                  CMLNetKitPlatform('nxosv9000', 'mgmt0', _loopback_ios, _management_ios, _peer_ios),
+                  CMLNetKitPlatform('asav', 'Management0/0', None, _management_ios, _peer_ios),
+                  CMLNetKitPlatform('cat8000v', 'GigabitEthernet1', _loopback_ios, _management_ios, _peer_ios),
+                  CMLNetKitPlatform('iosvl2', 'GigabitEthernet0/0', _loopback_ios, _management_iosvl2,
+                                    links_ignored=True),
+                  CMLNetKitPlatform('external_connector', links_ignored=True),
+                  ]:
+    CMLNetKitPlatform.register(_platform)
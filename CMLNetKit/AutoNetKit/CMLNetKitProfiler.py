@@ -0,0 +1,221 @@
+# -*- coding: utf-8 -*-
+# (c) 2020-2023 Piotr Wojciechowski <piotr@it-playground.pl>
+# GNU General Public License v3.0+ (see COPYING or https://www.gnu.org/licenses/gpl-3.0.txt)
+
+import json
+import sys
+import threading
+import time
+import tracemalloc
+
+
+class CMLNetKitProfilerPhase(object):
+    """
+    Initializes a CMLNetKitProfilerPhase instance. This class is the context manager measuring a single run of the
+    phase. The wall time is always measured and available as elapsed attribute, it is recorded by the profiler only
+    if profiling is enabled.
+
+    :param profiler: Profiler recording the phase
+    :type profiler: CMLNetKitProfiler
+    :param name: Name of the phase
+    :type name: str
+    """
+
+    def __init__(self, profiler, name):
+        self._profiler = profiler
+        self.name = name
+        self.start = None
+        self.elapsed = None
+        self.peak_memory = 0
+
+    def __enter__(self):
+        if self._profiler.enabled:
+            self._profiler._enter_phase(self)
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.elapsed = time.perf_counter() - self.start
+        if self._profiler.enabled:
+            self._profiler._exit_phase(self)
+
+
+class CMLNetKitProfiler(object):
+    """
+    Initializes a CMLNetKitProfiler instance. This class records the wall time and the number of calls of each
+    phase of the run, the counters of the operations done in the phases and optionally the peak memory traced by
+    tracemalloc while the phase was running. The run can also be profiled with cProfile.
+
+    Phases can be nested, e.g. parsing of node configurations is recorded also as part of the update pass that
+    needed it. In batch mode the phases of all labs are recorded together. The memory is traced for the whole
+    process, so with more than one worker the peak includes the memory used by other labs processed at the same
+    time.
+
+    :param enabled: Flag if the phases and counters are recorded
+    :type enabled: bool
+    :param trace_memory: Flag if the peak memory is traced, it slows the run down
+    :type trace_memory: bool
+    :param cprofile_file: Path to the file where cProfile statistics are written, readable by pstats module
+    :type cprofile_file: str
+    """
+
+    def __init__(self, enabled=False, trace_memory=False, cprofile_file=None):
+        self.enabled = enabled or trace_memory or cprofile_file is not None
+        self.trace_memory = trace_memory
+        self.cprofile_file = cprofile_file
+        self.phases = {}
+        self.counters = {}
+        self.events = []
+
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._start = None
+        self._elapsed = None
+        self._cprofile = None
+
+    def phase(self, name):
+        """
+        Return the context manager measuring the phase
+
+        :param name: Name of the phase
+        :type name: str
+        :rtype: CMLNetKitProfilerPhase
+        """
+        return CMLNetKitProfilerPhase(self, name)
+
+    def count(self, name, value=1):
+        """
+        Increase the counter
+
+        :param name: Name of the counter
+        :type name: str
+        :param value: Value added to the counter
+        :type value: int
+        """
+        if not self.enabled:
+            return
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + value
+
+    def start(self):
+        """
+        Start profiling the run
+        """
+        if not self.enabled:
+            return
+        if self.trace_memory:
+            tracemalloc.start()
+        if self.cprofile_file is not None:
+            import cProfile
+            self._cprofile = cProfile.Profile()
+            self._cprofile.enable()
+        self._start = time.perf_counter()
+
+    def stop(self):
+        """
+        Stop profiling the run and write the cProfile statistics to the file
+        """
+        if not self.enabled or self._start is None:
+            return
+        self._elapsed = time.perf_counter() - self._start
+        if self._cprofile is not None:
+            self._cprofile.disable()
+            self._cprofile.dump_stats(self.cprofile_file)
+        if self.trace_memory:
+            tracemalloc.stop()
+
+    def _enter_phase(self, phase):
+        """
+        Record the start of the phase. The peak memory traced so far is stored in the enclosing phases before it is
+        reset, so each phase gets the highest memory use while it was running.
+
+        :param phase: Phase that starts
+        :type phase: CMLNetKitProfilerPhase
+        """
+        stack = self._local.__dict__.setdefault('stack', [])
+        if self.trace_memory and tracemalloc.is_tracing():
+            peak_memory = tracemalloc.get_traced_memory()[1]
+            for parent in stack:
+                parent.peak_memory = max(parent.peak_memory, peak_memory)
+            tracemalloc.reset_peak()
+        stack.append(phase)
+
+    def _exit_phase(self, phase):
+        """
+        Record the end of the phase
+
+        :param phase: Phase that ended
+        :type phase: CMLNetKitProfilerPhase
+        """
+        stack = self._local.stack
+        stack.remove(phase)
+        if self.trace_memory and tracemalloc.is_tracing():
+            phase.peak_memory = max(phase.peak_memory, tracemalloc.get_traced_memory()[1])
+            for parent in stack:
+                parent.peak_memory = max(parent.peak_memory, phase.peak_memory)
+
+        with self._lock:
+            record = self.phases.setdefault(phase.name, {'calls': 0, 'time': 0.0, 'peak_memory': 0})
+            record['calls'] += 1
+            record['time'] += phase.elapsed
+            record['peak_memory'] = max(record['peak_memory'], phase.peak_memory)
+            self.events.append({'name': phase.name,
+                                'thread': threading.current_thread().name,
+                                'start': phase.start - self._start if self._start is not None else 0.0,
+                                'time': phase.elapsed,
+                                'depth': len(stack),
+                                })
+
+    def report(self):
+        """
+        Return the recorded phases, counters and events
+
+        :rtype: dict
+        """
+        return {'time': self._elapsed,
+                'phases': [dict(name=name, **record) for name, record in self.phases.items()],
+                'counters': dict(self.counters),
+                'events': list(self.events),
+                }
+
+    def print_summary(self):
+        """
+        Print the summary of the recorded phases and counters on standard error, so it is not mixed with the lab
+        topology written to standard output
+        """
+        from prettytable import PrettyTable
+
+        TOutput = PrettyTable()
+        TOutput.field_names = ['Phase', 'Calls', 'Time [s]', 'Peak memory [KiB]']
+        TOutput.align['Phase'] = 'l'
+        TOutput.align['Time [s]'] = 'r'
+        TOutput.align['Peak memory [KiB]'] = 'r'
+        for name, record in self.phases.items():
+            TOutput.add_row([name, record['calls'], '%.4f' % record['time'],
+                             '%d' % (record['peak_memory'] // 1024) if self.trace_memory else '-'])
+        print("\nProfile of the run" + (" (%.3fs)" % self._elapsed if self._elapsed is not None else ""),
+              file=sys.stderr)
+        print(TOutput, file=sys.stderr)
+
+        if self.counters:
+            TOutput = PrettyTable()
+            TOutput.field_names = ['Counter', 'Value']
+            TOutput.align['Counter'] = 'l'
+            TOutput.align['Value'] = 'r'
+            for name, value in self.counters.items():
+                TOutput.add_row([name, value])
+            print(TOutput, file=sys.stderr)
+
+    def write_json(self, json_file):
+        """
+        Write the recorded phases, counters and events to the file in JSON format
+
+        :param json_file: Path to the file, or '-' to write to standard error
+        :type json_file: str
+        """
+        report = json.dumps(self.report(), indent=2)
+        if json_file == '-':
+            print(report, file=sys.stderr)
+        else:
+            with open(json_file, 'w') as f:
+                f.write(report + '\n')
@@ -0,0 +1,418 @@
+# -*- coding: utf-8 -*-
+# (c) 2020-2023 Piotr Wojciechowski <piotr@it-playground.pl>
+# GNU General Public License v3.0+ (see COPYING or https://www.gnu.org/licenses/gpl-3.0.txt)
+
+import collections
+import json
+import os
+import re
+import socketserver
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+from CMLNetKit.AutoNetKit.CMLNetKitConfig import CMLNetKitConfig
+from CMLNetKit.AutoNetKit.CMLNetKitProfiler import CMLNetKitProfiler
+
+
+class CMLNetKitServer(object):
+    """
+    Initializes a CMLNetKitServer instance. This class is the long-running server answering the requests to list
+    the labs, list the IP addresses of the lab and update the lab configuration over HTTP, on TCP port or Unix
+    socket. The client connected to CML2 server, the lab catalog, the downloaded topologies, the parsed node
+    configurations and the states of incremental mode are kept in memory and shared by all requests, so the login,
+    the system readiness check, and the download and parsing of the lab not modified since the last request are done
+    only once. Parsed configurations are kept with the native configuration parser, CiscoConfParse objects cannot be
+    copied quickly.
+
+    Requests are processed concurrently, each in its own thread. Requests for the same lab are processed one by one.
+    The options of each request are the command line options of the server followed by the options sent with the
+    request, so the server options are the defaults of each request.
+
+    Endpoints:
+
+    - GET /labs?title=&owner=&state= returns the labs matching the filters
+    - GET /labs/{lab_id}/ips returns the IP addresses of the lab
+    - POST /labs/{lab_id}/update with JSON body {"args": [...]} updates the lab configuration
+    - GET /metrics returns the number of requests, errors and latency of each endpoint and the profile of the runs
+    - GET /health returns the server status
+
+    :param cml_options: Configuration stored in CMLNetKitConfig class.
+    :type cml_options: CMLNetKitConfig class
+    :param parser: Parser of command line arguments
+    :type parser: argparse.ArgumentParser
+    :param base_args: Command line arguments of the server
+    :type base_args: list
+    """
+
+    # Options that can be sent with the update request, the other options are set when the server is started
+    update_options = ['-b', '--lo-subnet', '--mgmt-range', '--mgmt-netmask', '--mgmt-prefixlen', '--peer-subnet',
+                      '--peer-prefixlen', '--dry-run', '--in-place', '--allocation', '--config-engine', '--jobs',
+                      '--check-conflicts']
+
+    # Number of the last requests of each endpoint used to calculate the latency percentiles
+    latency_samples = 1024
+
+    _lab_path = re.compile(r'^/labs/([^/]+)/(ips|update)$')
+
+    def __init__(self, cml_options, parser, base_args):
+        self._cmlnetkitconfig = cml_options
+        self._parser = parser
+        self._parser.error = self._parser_error
+        self._base_args = list(base_args)
+        self.cml_client = None
+        self._topology_cache = None
+        self._lab_catalog = None
+        self._config_templates = None
+        self._states = {}
+        self._lab_locks = {}
+        self._lock = threading.Lock()
+        self._started = None
+        # Dictionary of endpoints and their metrics, and the phases and counters of all the runs
+        self._endpoints = {}
+        self._phases = {}
+        self._counters = {}
+
+    @staticmethod
+    def _parser_error(message):
+        """
+        Raise the error instead of exiting when the request options are not valid
+
+        :param message: Error message
+        :type message: str
+        :raises ValueError: always
+        """
+        raise ValueError(message)
+
+    def run(self):
+        """
+        Connect to CML2 server and answer the requests until the server is interrupted
+
+        :raises requests.exceptions.HTTPError: if there was a transport error
+        """
+        from CMLNetKit.AutoNetKit.CMLNetKit import CMLNetKit
+        from CMLNetKit.AutoNetKit.CMLNetKitConfigCache import CMLNetKitConfigTemplates
+        from CMLNetKit.AutoNetKit.CMLNetKitLabCatalog import CMLNetKitLabCatalog
+        from CMLNetKit.AutoNetKit.CMLNetKitTopologyCache import CMLNetKitTopologyCache
+
+        options = self._cmlnetkitconfig
+        self.cml_client = CMLNetKit(options)._get_cml_client()
+        self._topology_cache = CMLNetKitTopologyCache(options.cache_dir, '%s:%s' % (options.host, options.port),
+                                                      options.cache_max_size, options.cache_max_age, memory=True)
+        self._lab_catalog = CMLNetKitLabCatalog(options.cache_dir,
+                                                '%s:%s %s' % (options.host, options.port, options.username),
+                                                options.catalog_ttl)
+        self._config_templates = CMLNetKitConfigTemplates()
+
+        if options.socket_path is not None:
+            if os.path.exists(options.socket_path):
+                os.remove(options.socket_path)
+            httpd = _CMLNetKitUnixHTTPServer(options.socket_path, CMLNetKitServerHandler)
+            address = 'unix:' + options.socket_path
+        else:
+            httpd = ThreadingHTTPServer(options.listen, CMLNetKitServerHandler)
+            address = 'http://%s:%d' % httpd.server_address[:2]
+        httpd.cmlnetkit_server = self
+        self._started = time.time()
+        print("Serving on %s" % address, file=sys.stderr)
+        try:
+            httpd.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            httpd.server_close()
+            if options.socket_path is not None and os.path.exists(options.socket_path):
+                os.remove(options.socket_path)
+            print("Server stopped", file=sys.stderr)
+
+    def handle(self, method, url, body=None):
+        """
+        Process the request and record its metrics
+
+        :param method: HTTP method
+        :type method: str
+        :param url: Requested path with the query
+        :type url: str
+        :param body: Request body
+        :type body: bytes
+        :return: HTTP status, endpoint name and the response
+        :rtype: tuple
+        """
+        start = time.perf_counter()
+        profiler = CMLNetKitProfiler(enabled=True)
+        profiler.start()
+        url = urlsplit(url)
+        endpoint, lab_id = self._get_endpoint(method, url.path)
+        try:
+            if endpoint is None:
+                status, response = 404, {'error': 'Not found: %s %s' % (method, url.path)}
+            else:
+                status, response = 200, self._call(endpoint, lab_id, parse_qs(url.query), body, profiler)
+        except (SystemExit, ValueError, IndexError, KeyError, TypeError) as e:
+            status, response = 400, {'error': str(e) or type(e).__name__}
+        except Exception as e:
+            # Errors returned by CML2 server, e.g. the lab is not found, carry its response
+            upstream_status = getattr(getattr(e, 'response', None), 'status_code', None)
+            status = 404 if upstream_status == 404 else 500
+            response = {'error': '%s: %s' % (type(e).__name__, e)}
+        profiler.stop()
+        elapsed = time.perf_counter() - start
+        response['time'] = elapsed
+        self._record(endpoint or 'other', elapsed, status >= 400, profiler.report())
+        return status, endpoint, response
+
+    def _get_endpoint(self, method, path):
+        """
+        Return the endpoint of the request
+
+        :param method: HTTP method
+        :type method: str
+        :param path: Requested path
+        :type path: str
+        :return: Endpoint name and lab ID, the name is None if the endpoint is not found
+        :rtype: tuple
+        """
+        if method == 'GET' and path in ('/health', '/metrics', '/labs'):
+            return path.lstrip('/'), None
+        match = self._lab_path.match(path)
+        if match is not None and (method, match.group(2)) in (('GET', 'ips'), ('POST', 'update')):
+            return match.group(2), match.group(1)
+        return None, None
+
+    def _call(self, endpoint, lab_id, query, body, profiler):
+        """
+        Call the method processing the request
+
+        :return: Response
+        :rtype: dict
+        """
+        if endpoint == 'health':
+            return {'status': 'ok'}
+        if endpoint == 'metrics':
+            return self.metrics()
+        if endpoint == 'labs':
+            return {'labs': self.list_labs(query, profiler)}
+        if endpoint == 'ips':
+            return {'lab_id': lab_id, 'addresses': self.list_ips(lab_id, profiler)}
+
+        request = json.loads(body or b'{}')
+        if not isinstance(request, dict):
+            raise ValueError('Request body must be a JSON object')
+        args = request.get('args', [])
+        if not isinstance(args, list) or not all(isinstance(arg, str) for arg in args):
+            raise ValueError('args: Must be a list of strings')
+        return {'lab_id': lab_id, 'result': self.update_lab(lab_id, args, profiler)}
+
+    def list_labs(self, query, profiler):
+        """
+        Return the labs matching the title, owner and state filters
+
+        :param query: Parsed query of the request
+        :type query: dict
+        :param profiler: Profiler of the request
+        :type profiler: CMLNetKitProfiler
+        :rtype: list
+        """
+        args = ['--list-labs']
+        for name, option in [('title', '--lab-title'), ('owner', '--lab-owner'), ('state', '--lab-state')]:
+            if name in query:
+                args += [option, query[name][-1]]
+        return self._get_cmlnetkit(args, None, profiler).get_labs()
+
+    def list_ips(self, lab_id, profiler):
+        """
+        Return the IP addresses of the lab
+
+        :param lab_id: Lab ID
+        :type lab_id: str
+        :param profiler: Profiler of the request
+        :type profiler: CMLNetKitProfiler
+        :rtype: list
+        """
+        cmlnetkit = self._get_cmlnetkit([], lab_id, profiler)
+        rows = _CMLNetKitRows()
+        with self._get_lab_lock(lab_id):
+            cmlnetkit.lab_download()
+            cmlnetkit.write_lab_ip_addresses(rows)
+        return rows
+
+    def update_lab(self, lab_id, args, profiler):
+        """
+        Update the lab configuration with the options sent with the request
+
+        :param lab_id: Lab ID
+        :type lab_id: str
+        :param args: Options of the request
+        :type args: list
+        :param profiler: Profiler of the request
+        :type profiler: CMLNetKitProfiler
+        :return: Result of processing the lab
+        :rtype: str
+        :raises ValueError: if an option cannot be sent with the request
+        """
+        for arg in args:
+            if arg.startswith('-') and arg.split('=', 1)[0] not in self.update_options:
+                raise ValueError('%s: Option cannot be sent with the request' % arg.lstrip('-'))
+        cmlnetkit = self._get_cmlnetkit(args, lab_id, profiler)
+        with self._get_lab_lock(lab_id):
+            return cmlnetkit.process_lab()
+
+    def metrics(self):
+        """
+        Return the number of requests, errors and latency of each endpoint, and the phases and counters of all
+        the runs
+
+        :rtype: dict
+        """
+        with self._lock:
+            endpoints = {}
+            for name, record in self._endpoints.items():
+                latencies = sorted(record['latencies'])
+                endpoints[name] = {'requests': record['requests'],
+                                   'errors': record['errors'],
+                                   'mean': record['time'] / record['requests'],
+                                   'max': record['max'],
+                                   'p50': self._percentile(latencies, 50),
+                                   'p95': self._percentile(latencies, 95),
+                                   'p99': self._percentile(latencies, 99),
+                                   }
+            return {'uptime': time.time() - self._started if self._started is not None else 0.0,
+                    'endpoints': endpoints,
+                    'phases': dict((name, dict(record)) for name, record in self._phases.items()),
+                    'counters': dict(self._counters),
+                    }
+
+    @staticmethod
+    def _percentile(latencies, percent):
+        """
+        Return the percentile of the sorted latencies
+
+        :param latencies: Sorted list of latencies
+        :type latencies: list
+        :param percent: Percentile between 0 and 100
+        :type percent: int
+        :rtype: float
+        """
+        if not latencies:
+            return None
+        return latencies[min(len(latencies) - 1, len(latencies) * percent // 100)]
+
+    def _record(self, endpoint, elapsed, error, report):
+        """
+        Add the request to the metrics of the endpoint, and the phases and counters of its run to the totals
+
+        :param endpoint: Endpoint name
+        :type endpoint: str
+        :param elapsed: Time of the request in seconds
+        :type elapsed: float
+        :param error: Flag if the request failed
+        :type error: bool
+        :param report: Report of the request profiler
+        :type report: dict
+        """
+        with self._lock:
+            record = self._endpoints.setdefault(endpoint, {'requests': 0, 'errors': 0, 'time': 0.0, 'max': 0.0,
+                                                           'latencies': collections.deque(
+                                                               maxlen=self.latency_samples)})
+            record['requests'] += 1
+            record['errors'] += 1 if error else 0
+            record['time'] += elapsed
+            record['max'] = max(record['max'], elapsed)
+            record['latencies'].append(elapsed)
+            for phase in report['phases']:
+                total = self._phases.setdefault(phase['name'], {'calls': 0, 'time': 0.0})
+                total['calls'] += phase['calls']
+                total['time'] += phase['time']
+            for name, value in report['counters'].items():
+                self._counters[name] = self._counters.get(name, 0) + value
+
+    def _get_cmlnetkit(self, args, lab_id, profiler):
+        """
+        Return the CMLNetKit instance with the options of the request sharing the client, the lab catalog, the
+        topology cache, the parsed configurations and the states with other requests
+
+        :param args: Options of the request
+        :type args: list
+        :param lab_id: Lab ID or None
+        :type lab_id: str
+        :param profiler: Profiler of the request
+        :type profiler: CMLNetKitProfiler
+        :rtype: CMLNetKit
+        :raises ValueError: if the options are not valid
+        """
+        from CMLNetKit.AutoNetKit.CMLNetKit import CMLNetKit
+
+        args = self._base_args + args + (['-l', lab_id] if lab_id is not None else [])
+        cml_options = CMLNetKitConfig(self._parser.parse_args(args))
+        return CMLNetKit(cml_options, cml_client=self.cml_client, lab_id=lab_id, profiler=profiler,
+                         topology_cache=self._topology_cache, lab_catalog=self._lab_catalog, states=self._states,
+                         config_templates=self._config_templates)
+
+    def _get_lab_lock(self, lab_id):
+        """
+        Return the lock of the lab, so the requests for the same lab are processed one by one
+
+        :param lab_id: Lab ID
+        :type lab_id: str
+        :rtype: threading.Lock
+        """
+        with self._lock:
+            return self._lab_locks.setdefault(lab_id, threading.Lock())
+
+
+class CMLNetKitServerHandler(BaseHTTPRequestHandler):
+    """
+    Handler of the HTTP requests, passes each request to CMLNetKitServer and writes the response in JSON format
+    """
+
+    server_version = 'CMLNetKit'
+
+    def do_GET(self):
+        self._respond()
+
+    def do_POST(self):
+        self._respond()
+
+    def _respond(self):
+        """
+        Process the request and write the response, the request is logged on standard error
+        """
+        body = None
+        if self.command == 'POST':
+            body = self.rfile.read(int(self.headers.get('Content-Length') or 0))
+        status, endpoint, response = self.server.cmlnetkit_server.handle(self.command, self.path, body)
+        data = json.dumps(response).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+        print('%s "%s %s" %d %.4fs' % (self.address_string(), self.command, self.path, status, response['time']),
+              file=sys.stderr)
+
+    def address_string(self):
+        # Clients connected to Unix socket have no address
+        return self.client_address[0] if self.client_address else 'unix'
+
+    def log_message(self, format, *args):
+        # Requests are logged with the time of processing in _respond
+        pass
+
+
+class _CMLNetKitUnixHTTPServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    """
+    HTTP server listening on Unix socket, each request is processed in its own thread
+    """
+
+    daemon_threads = True
+
+
+class _CMLNetKitRows(list):
+    """
+    List of rows written by CMLNetKit.write_lab_ip_addresses
+    """
+
+    def write(self, row):
+        self.append(row)
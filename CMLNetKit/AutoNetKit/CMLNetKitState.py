@@ -0,0 +1,145 @@
+# -*- coding: utf-8 -*-
+# (c) 2020-2023 Piotr Wojciechowski <piotr@it-playground.pl>
+# GNU General Public License v3.0+ (see COPYING or https://www.gnu.org/licenses/gpl-3.0.txt)
+
+import copy
+import hashlib
+import json
+import os
+import threading
+
+
+class CMLNetKitState(object):
+    """
+    Initializes a CMLNetKitState instance. This class keeps the state of the lab after the last run: the hash of
+    each node content and the tables of assigned addresses. It is stored in the state directory in one file per
+    lab, identified by the lab title, because the lab ID changes each time the lab is uploaded.
+
+    The hash of the node covers the node type, the startup configuration and the links attached to the node, so
+    a node is processed again when any of them changed since the last run.
+
+    The long-running server keeps the saved states in memory, in the dictionary shared by all requests, so the
+    state file is read only once for each lab.
+
+    :param state_dir: Directory where state files are stored
+    :type state_dir: str
+    :param lab_title: Lab title
+    :type lab_title: str
+    :param store: Dictionary of lab titles and saved states kept in memory
+    :type store: dict
+    :raises ValueError: if the state file cannot be read
+    """
+
+    version = 1
+
+    def __init__(self, state_dir, lab_title, store=None):
+        self.lab_title = lab_title
+        self._store = store
+        self.path = os.path.join(state_dir, hashlib.sha256(lab_title.encode('utf-8')).hexdigest()[:16] + '.json')
+        self.options = None
+        self.nodes = {}
+        self.allocations = {}
+
+        self.load()
+
+    @staticmethod
+    def hash(value):
+        """
+        Return the hash of the value serialized to JSON
+
+        :param value: Value to hash
+        :type value: object
+        :rtype: str
+        """
+        return hashlib.sha256(json.dumps(value, sort_keys=True).encode('utf-8')).hexdigest()
+
+    def load(self):
+        """
+        Load the state from the state file. State of other version or other lab is ignored.
+
+        :raises ValueError: if the state file cannot be read
+        """
+        if self._store is not None and self.lab_title in self._store:
+            state = copy.deepcopy(self._store[self.lab_title])
+        else:
+            try:
+                with open(self.path) as f:
+                    state = json.load(f)
+            except FileNotFoundError:
+                return
+            except (OSError, ValueError) as e:
+                raise ValueError('state-dir: Cannot read the state file %s: %s' % (self.path, e))
+
+        if state.get('version') != self.version or state.get('lab_title') != self.lab_title:
+            return
+        self.options = state.get('options')
+        self.nodes = state.get('nodes') or {}
+        self.allocations = state.get('allocations') or {}
+
+    def save(self):
+        """
+        Save the state to the state file. The file is replaced at once, so it is never left half written.
+
+        :raises OSError: if the state file cannot be written
+        """
+        state = {'version': self.version,
+                 'lab_title': self.lab_title,
+                 'options': self.options,
+                 'nodes': self.nodes,
+                 'allocations': self.allocations,
+                 }
+        os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+        # Each writer has its own temporary file, so concurrent writers of the same lab do not mix their content
+        tmp_path = '%s.%d.%d.tmp' % (self.path, os.getpid(), threading.get_ident())
+        with open(tmp_path, 'w') as f:
+            json.dump(state, f, indent=1, sort_keys=True)
+        os.replace(tmp_path, self.path)
+        if self._store is not None:
+            self._store[self.lab_title] = copy.deepcopy(state)
+
+    def changed_nodes(self, node_hashes, options):
+        """
+        Return the keys of nodes that changed since the last run. All nodes are changed if the options
+        changed.
+
+        :param node_hashes: Dictionary of node keys and hashes of the node content
+        :type node_hashes: dict
+        :param options: Hash of the options that affect the result of the run
+        :type options: str
+        :rtype: set
+        """
+        if options != self.options:
+            return set(node_hashes)
+        return set(key for key, node_hash in node_hashes.items() if self.nodes.get(key) != node_hash)
+
+    def allocation_table(self, pool_name, pool):
+        """
+        Return the table of addresses assigned from the pool in the last run
+
+        :param pool_name: Name of the pool
+        :type pool_name: str
+        :param pool: Definition of the pool, the table is discarded if the pool changed
+        :type pool: str
+        :return: Dictionary of keys and address offsets
+        :rtype: dict
+        """
+        allocation = self.allocations.get(pool_name)
+        if allocation is None or allocation.get('pool') != pool:
+            return {}
+        return allocation.get('table') or {}
+
+    def update(self, node_hashes, options, allocations):
+        """
+        Replace the state with the result of the run
+
+        :param node_hashes: Dictionary of node keys and hashes of the node content
+        :type node_hashes: dict
+        :param options: Hash of the options that affect the result of the run
+        :type options: str
+        :param allocations: Dictionary of pool names and tuples of pool definition and table of assigned addresses
+        :type allocations: dict
+        """
+        self.nodes = dict(node_hashes)
+        self.options = options
+        for pool_name, (pool, table) in allocations.items():
+            self.allocations[pool_name] = {'pool': pool, 'table': dict(table)}
@@ -0,0 +1,92 @@
+# -*- coding: utf-8 -*-
+# (c) 2020-2023 Piotr Wojciechowski <piotr@it-playground.pl>
+# GNU General Public License v3.0+ (see COPYING or https://www.gnu.org/licenses/gpl-3.0.txt)
+
+
+class CMLNetKitTopology(object):
+    """
+    Initializes a CMLNetKitTopology instance. This class builds the lookup indexes for nodes and interfaces of
+    the lab topology once, so every lookup done while processing the lab is a dictionary access instead of
+    a scan over the nodes list.
+
+    :param lab_conf: Lab configuration YAML object downloaded from CML2 server
+    :type lab_conf: dict
+    """
+
+    def __init__(self, lab_conf):
+        self._node_index_by_id = {}
+        self._node_index_by_label = {}
+        self._interface_label_by_id = {}
+
+        # When the same id or label is found more than once the first node wins, the same as it was
+        # when the nodes list was scanned from the beginning.
+        for nodenum, nodedef in enumerate(lab_conf["nodes"]):
+            self._node_index_by_id.setdefault(nodedef.get("id"), nodenum)
+            self._node_index_by_label.setdefault(nodedef.get("label"), nodenum)
+            for ifdef in nodedef.get("interfaces") or []:
+                self._interface_label_by_id.setdefault((nodedef.get("id"), ifdef.get("id")), ifdef.get("label"))
+
+        self._nodes = lab_conf["nodes"]
+
+    def node_index_by_id(self, node_id):
+        """
+        Return the index on the nodes list for the node with given id
+
+        :param node_id: Node id
+        :type node_id: str
+        :returns: Array index for the node or None if not found
+        :rtype: int
+        """
+        return self._node_index_by_id.get(node_id)
+
+    def node_index_by_label(self, node_label):
+        """
+        Return the index on the nodes list for the node with given label
+
+        :param node_label: Node label
+        :type node_label: str
+        :returns: Array index for the node or None if not found
+        :rtype: int
+        """
+        return self._node_index_by_label.get(node_label)
+
+    def node_label_by_id(self, node_id):
+        """
+        Return the label of the node with given id
+
+        :param node_id: Node id
+        :type node_id: str
+        :returns: Node label or None if not found
+        :rtype: str
+        """
+        node_index = self._node_index_by_id.get(node_id)
+        if node_index is None:
+            return None
+        return self._nodes[node_index].get("label")
+
+    def node_type_by_id(self, node_id):
+        """
+        Return the node type stored as node_definition key for the node with given id
+
+        :param node_id: Node id
+        :type node_id: str
+        :returns: Node type or None if not found
+        :rtype: str
+        """
+        node_index = self._node_index_by_id.get(node_id)
+        if node_index is None:
+            return None
+        return self._nodes[node_index].get("node_definition")
+
+    def interface_label(self, node_id, iface_id):
+        """
+        Return the interface name for the interface with given id on the node with given id
+
+        :param node_id: Node id
+        :type node_id: str
+        :param iface_id: Interface id
+        :type iface_id: str
+        :returns: Interface name or None if not found
+        :rtype: str
+        """
+        return self._interface_label_by_id.get((node_id, iface_id))
@@ -0,0 +1,210 @@
+# -*- coding: utf-8 -*-
+# (c) 2020-2023 Piotr Wojciechowski <piotr@it-playground.pl>
+# GNU General Public License v3.0+ (see COPYING or https://www.gnu.org/licenses/gpl-3.0.txt)
+
+import hashlib
+import os
+import pickle
+import threading
+import time
+
+
+class CMLNetKitTopologyCache(object):
+    """
+    Initializes a CMLNetKitTopologyCache instance. This class keeps the topologies downloaded from CML2 server in
+    the cache directory, in one file per lab identified by the server address and the lab ID. The topology is stored
+    already parsed in pickle format, so a lab that was not modified since it was downloaded is read without the
+    download and the YAML parsing.
+
+    The cached topology is used only if the modification time, the number of nodes and the number of links in the
+    lab details returned by CML2 server are the same as when it was downloaded. The details are much smaller than
+    the topology, so the revalidation is cheap. Entries older than the maximum age are not used and the oldest
+    entries are removed when the cache grows over the maximum size.
+
+    The files are read with pickle, so the cache directory must not be writable by other users.
+
+    The long-running server also keeps the cached topologies in memory, pickled, so each request gets its own copy
+    of the topology to update. The memory is limited by the same maximum size as the directory.
+
+    :param cache_dir: Directory where cached topologies are stored, or None to keep them only in memory
+    :type cache_dir: str
+    :param host: CML2 server address
+    :type host: str
+    :param max_size: Maximum size of all cached topologies in bytes
+    :type max_size: int
+    :param max_age: Maximum age of cached topology in seconds
+    :type max_age: int
+    :param memory: Flag if cached topologies are also kept in memory
+    :type memory: bool
+    """
+
+    version = 1
+
+    def __init__(self, cache_dir, host, max_size, max_age, memory=False):
+        self.cache_dir = cache_dir
+        self.host = host
+        self.max_size = max_size
+        self.max_age = max_age
+        # Dictionary of lab IDs and tuples of the time of download, validator and pickled topology, the least
+        # recently used entry is first
+        self._memory = {} if memory else None
+        self._memory_size = 0
+        self._lock = threading.Lock()
+
+    def _path(self, lab_id):
+        """
+        Return the path of the file with the cached topology of the lab
+
+        :param lab_id: Lab ID
+        :type lab_id: str
+        :rtype: str
+        """
+        key = '%s/%s' % (self.host, lab_id)
+        return os.path.join(self.cache_dir, hashlib.sha256(key.encode('utf-8')).hexdigest()[:16] + '.pickle')
+
+    @staticmethod
+    def validator(lab_details):
+        """
+        Return the values of lab details compared to decide if the cached topology is up to date
+
+        :param lab_details: Lab details returned by CML2 server
+        :type lab_details: dict
+        :return: List of values, or None if the lab details do not have the modification time
+        :rtype: list
+        """
+        if not lab_details or lab_details.get('modified') is None:
+            return None
+        return [lab_details.get('modified'), lab_details.get('node_count'), lab_details.get('link_count')]
+
+    def get(self, lab_id, lab_details):
+        """
+        Return the cached topology of the lab if it is up to date
+
+        :param lab_id: Lab ID
+        :type lab_id: str
+        :param lab_details: Lab details returned by CML2 server
+        :type lab_details: dict
+        :return: Parsed lab topology, or None if it is not cached, expired or the lab was modified
+        :rtype: dict
+        """
+        validator = self.validator(lab_details)
+        if validator is None:
+            return None
+        if self._memory is not None:
+            with self._lock:
+                entry = self._memory.pop(lab_id, None)
+                if entry is not None and time.time() - entry[0] <= self.max_age and entry[1] == validator:
+                    self._memory[lab_id] = entry
+                    return pickle.loads(entry[2])
+                if entry is not None:
+                    self._memory_size -= len(entry[2])
+        if self.cache_dir is None:
+            return None
+        path = self._path(lab_id)
+        try:
+            downloaded = os.stat(path).st_mtime
+            if time.time() - downloaded > self.max_age:
+                return None
+            with open(path, 'rb') as f:
+                entry = pickle.load(f)
+        except FileNotFoundError:
+            return None
+        except (OSError, pickle.UnpicklingError, EOFError, AttributeError, ImportError, ValueError):
+            # The entry written by other version or damaged is treated as missing, it is replaced by next download
+            return None
+        if not isinstance(entry, dict) or entry.get('version') != self.version or \
+                entry.get('host') != self.host or entry.get('lab_id') != lab_id or \
+                entry.get('validator') != validator:
+            return None
+        if self._memory is not None:
+            self._put_memory(lab_id, validator, entry.get('topology'), downloaded)
+        return entry.get('topology')
+
+    def put(self, lab_id, lab_details, lab_conf):
+        """
+        Store the parsed topology of the lab and remove the expired and the oldest entries if the cache is too
+        large. The file is replaced at once, so it is never left half written. Nothing is stored if the lab
+        details do not have the modification time.
+
+        :param lab_id: Lab ID
+        :type lab_id: str
+        :param lab_details: Lab details returned by CML2 server when the topology was downloaded
+        :type lab_details: dict
+        :param lab_conf: Parsed lab topology, as downloaded
+        :type lab_conf: dict
+        :raises OSError: if the cache file cannot be written
+        """
+        validator = self.validator(lab_details)
+        if validator is None:
+            return
+        if self._memory is not None:
+            self._put_memory(lab_id, validator, lab_conf, time.time())
+        if self.cache_dir is None:
+            return
+        os.makedirs(self.cache_dir, exist_ok=True)
+        path = self._path(lab_id)
+        # Each writer has its own temporary file, so concurrent writers of the same lab do not mix their content
+        tmp_path = '%s.%d.%d.tmp' % (path, os.getpid(), threading.get_ident())
+        with open(tmp_path, 'wb') as f:
+            pickle.dump({'version': self.version,
+                         'host': self.host,
+                         'lab_id': lab_id,
+                         'validator': validator,
+                         'topology': lab_conf,
+                         }, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, path)
+        self.evict()
+
+    def _put_memory(self, lab_id, validator, lab_conf, downloaded):
+        """
+        Keep the topology in memory and remove the least recently used topologies if the memory used is greater
+        than the maximum size
+
+        :param lab_id: Lab ID
+        :type lab_id: str
+        :param validator: Values of lab details when the topology was downloaded
+        :type validator: list
+        :param lab_conf: Parsed lab topology, as downloaded
+        :type lab_conf: dict
+        :param downloaded: Time of the download
+        :type downloaded: float
+        """
+        topology = pickle.dumps(lab_conf, protocol=pickle.HIGHEST_PROTOCOL)
+        with self._lock:
+            entry = self._memory.pop(lab_id, None)
+            if entry is not None:
+                self._memory_size -= len(entry[2])
+            self._memory[lab_id] = (downloaded, validator, topology)
+            self._memory_size += len(topology)
+            while self._memory_size > self.max_size and self._memory:
+                self._memory_size -= len(self._memory.pop(next(iter(self._memory)))[2])
+
+    def evict(self):
+        """
+        Remove the expired entries, then the oldest entries until the size of the cache is not greater than the
+        maximum size. Entries removed by other process at the same time are skipped.
+        """
+        entries = []
+        now = time.time()
+        for name in os.listdir(self.cache_dir):
+            if not name.endswith('.pickle'):
+                continue
+            path = os.path.join(self.cache_dir, name)
+            try:
+                stat = os.stat(path)
+                if now - stat.st_mtime > self.max_age:
+                    os.remove(path)
+                    continue
+            except FileNotFoundError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, path))
+
+        size = sum(entry_size for _, entry_size, _ in entries)
+        for _, entry_size, path in sorted(entries):
+            if size <= self.max_size:
+                break
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            size -= entry_size
@@ -0,0 +1,76 @@
+# -*- coding: utf-8 -*-
+# (c) 2020-2023 Piotr Wojciechowski <piotr@it-playground.pl>
+# GNU General Public License v3.0+ (see COPYING or https://www.gnu.org/licenses/gpl-3.0.txt)
+
+from concurrent.futures import ProcessPoolExecutor
+
+from CMLNetKit.AutoNetKit.CMLNetKitConfigCache import CMLNetKitConfigCache
+
+# CMLNetKit instance of the worker process, created once when the process starts
+_worker_cmlnetkit = None
+
+
+def _init_worker(cml_options):
+    """
+    Create the CMLNetKit instance applying the edits in the worker process
+
+    :param cml_options: Configuration stored in CMLNetKitConfig class.
+    :type cml_options: CMLNetKitConfig class
+    """
+    global _worker_cmlnetkit
+    from CMLNetKit.AutoNetKit.CMLNetKit import CMLNetKit
+
+    _worker_cmlnetkit = CMLNetKit(cml_options)
+
+
+def _transform_node_config(task):
+    """
+    Parse the node configuration, apply the edits and return the changed configuration
+
+    :param task: Tuple with node configuration and list of edits
+    :type task: tuple
+    :return: Changed node configuration or None if nothing was changed
+    :rtype: str
+    """
+    node_config, node_edits = task
+    node_parsed_config = CMLNetKitConfigCache.engines[_worker_cmlnetkit._cmlnetkitconfig.config_engine](node_config)
+    _worker_cmlnetkit.apply_node_edits(node_parsed_config, node_edits)
+    return node_parsed_config.dumps() if node_parsed_config.changed else None
+
+
+class CMLNetKitTransform(object):
+    """
+    Initializes a CMLNetKitTransform instance. This class applies the edits planned by the update passes to node
+    configurations in a pool of worker processes, so parsing and rewriting of configurations uses all CPU cores.
+    The addresses are assigned before, so the edits of each node do not depend on other nodes. The results are
+    returned in the order of the tasks, so the lab is the same as updated by a single process.
+
+    :param cml_options: Configuration stored in CMLNetKitConfig class.
+    :type cml_options: CMLNetKitConfig class
+    :param jobs: Number of worker processes
+    :type jobs: int
+    """
+
+    # Labs with less nodes to change are updated in a single process, starting workers would take longer
+    min_nodes = 64
+
+    def __init__(self, cml_options, jobs):
+        self._cmlnetkitconfig = cml_options
+        self.jobs = jobs
+
+    def run(self, tasks):
+        """
+        Apply the edits to node configurations
+
+        :param tasks: List of tuples with node configuration and list of edits
+        :type tasks: list
+        :return: List of changed node configurations, None for nodes where nothing was changed
+        :rtype: list
+        """
+        # The parser is loaded before workers are started, so forked workers do not load it again
+        CMLNetKitConfigCache.engines[self._cmlnetkitconfig.config_engine]('')
+        # Nodes are sent in chunks to limit the number of messages between processes
+        chunksize = max(1, len(tasks) // (self.jobs * 4))
+        with ProcessPoolExecutor(max_workers=self.jobs, initializer=_init_worker,
+                                 initargs=(self._cmlnetkitconfig,)) as executor:
+            return list(executor.map(_transform_node_config, tasks, chunksize=chunksize))
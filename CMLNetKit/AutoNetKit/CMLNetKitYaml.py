@@ -0,0 +1,68 @@
+# -*- coding: utf-8 -*-
+# (c) 2020-2023 Piotr Wojciechowski <piotr@it-playground.pl>
+# GNU General Public License v3.0+ (see COPYING or https://www.gnu.org/licenses/gpl-3.0.txt)
+
+import yaml
+
+# The C implementation of loader and dumper from libyaml is much faster, it is used when PyYAML was built with it
+try:
+    from yaml import CSafeLoader as SafeLoader
+    from yaml import CSafeDumper as SafeDumper
+except ImportError:
+    from yaml import SafeLoader
+    from yaml import SafeDumper
+
+
+class CMLNetKitYamlDumper(SafeDumper):
+    """
+    YAML dumper that writes multi-line strings, like the node startup configurations, as block literals. The
+    configuration is then written line by line, the same as in the topology exported from CML2 server.
+    """
+
+    def represent_str(self, data):
+        """
+        Represent the string as a block literal if it has more than one line
+
+        :param data: String to represent
+        :type data: str
+        :rtype: yaml.ScalarNode
+        """
+        if '\n' in data:
+            return self.represent_scalar('tag:yaml.org,2002:str', data, style='|')
+        return self.represent_scalar('tag:yaml.org,2002:str', data)
+
+
+CMLNetKitYamlDumper.add_representer(str, CMLNetKitYamlDumper.represent_str)
+
+
+class CMLNetKitYaml(object):
+    """
+    This class loads and dumps the lab topology in YAML format. The libyaml based loader and dumper are used when
+    available, otherwise the pure Python ones.
+    """
+
+    libyaml = SafeLoader.__name__.startswith('C')
+
+    @staticmethod
+    def load(topology):
+        """
+        Parse the lab topology in YAML format
+
+        :param topology: Lab topology in YAML format
+        :type topology: str
+        :return: Lab configuration YAML object
+        :rtype: dict
+        """
+        return yaml.load(topology, Loader=SafeLoader)
+
+    @staticmethod
+    def dump(lab_conf):
+        """
+        Serialize the lab configuration to YAML format
+
+        :param lab_conf: Lab configuration YAML object
+        :type lab_conf: dict
+        :return: Lab topology in YAML format
+        :rtype: str
+        """
+        return yaml.dump(lab_conf, Dumper=CMLNetKitYamlDumper)
@@ -0,0 +1,231 @@
+# -*- coding: utf-8 -*-
+# (c) 2020-2023 Piotr Wojciechowski <piotr@it-playground.pl>
+# GNU General Public License v3.0+ (see COPYING or https://www.gnu.org/licenses/gpl-3.0.txt)
+import contextlib
+import datetime
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+import tracemalloc
+from argparse import ArgumentParser
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from prettytable import PrettyTable
+
+import cmlnetkit
+from CMLNetKit.AutoNetKit.CMLNetKit import CMLNetKit
+from CMLNetKit.AutoNetKit.CMLNetKitConfig import CMLNetKitConfig
+from CMLNetKit.AutoNetKit.CMLNetKitYaml import CMLNetKitYaml
+from topology_generator import CMLNetKitTopologyGenerator
+
+
+class CMLNetKitBenchmark(object):
+    """
+    Initializes a CMLNetKitBenchmark instance. This class runs all phases of the lab update on a synthetic topology
+    and measures the time and the peak memory of each phase separately. The time is the best of the given number of
+    runs, the peak memory is measured in one more run with tracemalloc, as tracing slows the run down.
+
+    :param nodes: Number of nodes in the lab
+    :type nodes: int
+    :param link_density: Average number of links per node
+    :type link_density: float
+    :param config_size: Number of additional configuration lines in each node startup configuration
+    :type config_size: int
+    :param config_engine: Parser used to read and update node configurations
+    :type config_engine: str
+    :param repeat: Number of timed runs
+    :type repeat: int
+    :param seed: Seed of the topology generator
+    :type seed: int
+    :param jobs: Number of processes rewriting node configurations
+    :type jobs: int
+    """
+
+    phases = ['yaml_load', 'parse', 'loopback', 'management', 'peer', 'transform', 'commit', 'yaml_dump',
+              'inventory', 'print_peer', 'print_loopback', 'print_management']
+
+    # Address pools large enough for labs with tens of thousands of nodes
+    _cml_arguments = ['-i', '-', '--lo-subnet', '10.0.0.0/16', '--mgmt-range', '172.16.0.1', '172.16.255.254',
+                      '--mgmt-prefixlen', '16', '--peer-subnet', '10.128.0.0/9']
+
+    def __init__(self, nodes, link_density=1.5, config_size=50, config_engine='ciscoconfparse', repeat=3, seed=1,
+                 jobs=1):
+        self.nodes = nodes
+        self.link_density = link_density
+        self.config_size = config_size
+        self.config_engine = config_engine
+        self.repeat = repeat
+        self.seed = seed
+        self.jobs = jobs
+
+    def run(self):
+        """
+        Run the benchmark
+
+        :return: List of results, one for each phase
+        :rtype: list
+        """
+        lab_conf = CMLNetKitTopologyGenerator(self.nodes, self.link_density, self.config_size, self.seed).generate()
+        topology = CMLNetKitYaml.dump(lab_conf)
+        cml_options = CMLNetKitConfig(cmlnetkit.get_parser().parse_args(
+            self._cml_arguments + ['--config-engine', self.config_engine, '--jobs', str(self.jobs)]))
+
+        times = {}
+        for _ in range(self.repeat):
+            for phase, phase_time in self._run_phases(cml_options, topology, self._measure_time).items():
+                times[phase] = min(phase_time, times.get(phase, phase_time))
+
+        tracemalloc.start()
+        try:
+            memory_peaks = self._run_phases(cml_options, topology, self._measure_memory)
+        finally:
+            tracemalloc.stop()
+
+        return [{'nodes': self.nodes,
+                 'links': len(lab_conf['links']),
+                 'config_size': self.config_size,
+                 'config_engine': self.config_engine,
+                 'jobs': self.jobs,
+                 'phase': phase,
+                 'time': times[phase],
+                 'peak_memory': memory_peaks[phase],
+                 } for phase in self.phases]
+
+    def _run_phases(self, cml_options, topology, measure):
+        """
+        Run all phases of the lab update in the same order as CMLNetKit does
+
+        :param cml_options: Configuration stored in CMLNetKitConfig class.
+        :type cml_options: CMLNetKitConfig class
+        :param topology: Lab topology in YAML format
+        :type topology: str
+        :param measure: Method measuring the phase, called with the phase name and the function running the phase
+        :type measure: function
+        :return: Dictionary of phase names and the measured values
+        :rtype: dict
+        """
+        cml = CMLNetKit(cml_options)
+        results = {}
+
+        def parse_all():
+            for node_index in range(len(cml.lab_conf['nodes'])):
+                try:
+                    cml._get_node_parsed_config(node_index)
+                except KeyError:
+                    continue
+
+        results['yaml_load'] = measure(lambda: cml.lab_load(topology))
+        # With more than one job the configurations are parsed by worker processes in the transform phase
+        results['parse'] = measure(parse_all if self.jobs == 1 else lambda: None)
+        results['loopback'] = measure(cml.update_device_loopback_conf)
+        results['management'] = measure(cml.update_device_management_conf)
+        results['peer'] = measure(cml.update_device_peer_interfaces_conf)
+        results['transform'] = measure(cml._transform_node_configs)
+        results['commit'] = measure(cml._commit_node_configs)
+        results['yaml_dump'] = measure(cml.lab_dump)
+        inventory = []
+        results['inventory'] = measure(lambda: inventory.append(cml.build_ip_inventory()))
+        with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+            results['print_peer'] = measure(lambda: cml.print_lab_ip_peer_addresses(inventory[0]))
+            results['print_loopback'] = measure(lambda: cml.print_lab_ip_loopback_addresses(inventory[0]))
+            results['print_management'] = measure(lambda: cml.print_lab_ip_management_addresses(inventory[0]))
+        return results
+
+    @staticmethod
+    def _measure_time(fn):
+        """
+        Return the time of running the function in seconds
+
+        :param fn: Function to run
+        :type fn: function
+        :rtype: float
+        """
+        start = time.perf_counter()
+        fn()
+        return time.perf_counter() - start
+
+    @staticmethod
+    def _measure_memory(fn):
+        """
+        Return the peak memory allocated while running the function in bytes
+
+        :param fn: Function to run
+        :type fn: function
+        :rtype: int
+        """
+        tracemalloc.reset_peak()
+        start = tracemalloc.get_traced_memory()[0]
+        fn()
+        return tracemalloc.get_traced_memory()[1] - start
+
+
+def get_metadata():
+    """
+    Return the information about the environment the benchmark was run in
+
+    :rtype: dict
+    """
+    try:
+        revision = subprocess.run(['git', 'rev-parse', 'HEAD'], capture_output=True, text=True,
+                                  cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip() or None
+    except OSError:
+        revision = None
+    return {'date': datetime.datetime.now(datetime.timezone.utc).isoformat(),
+            'revision': revision,
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'libyaml': CMLNetKitYaml.libyaml,
+            }
+
+
+def main():
+    parser = ArgumentParser(description='Measure the time and memory of each phase of the CMLNetKit lab update on '
+                                        'synthetic topologies')
+    parser.add_argument('-n', '--nodes', type=int, nargs='+', default=[10, 100, 1000],
+                        help='Number of nodes, more than one value runs the benchmark for each (default 10 100 1000)')
+    parser.add_argument('--link-density', type=float, default=1.5,
+                        help='Average number of links per node (default 1.5)')
+    parser.add_argument('--config-size', type=int, default=50,
+                        help='Number of additional lines in each node startup configuration (default 50)')
+    parser.add_argument('--config-engine', choices=['ciscoconfparse', 'native'], nargs='+',
+                        default=['ciscoconfparse', 'native'],
+                        help='Parsers to benchmark (default ciscoconfparse native)')
+    parser.add_argument('--repeat', type=int, default=3, help='Number of timed runs, best is reported (default 3)')
+    parser.add_argument('--seed', type=int, default=1, help='Seed of the topology generator (default 1)')
+    parser.add_argument('--jobs', type=int, default=1,
+                        help='Number of processes rewriting node configurations (default 1)')
+    parser.add_argument('--json', type=str, dest='json_file',
+                        help='Write the results in JSON format to the file, use "-" for standard output')
+    p = parser.parse_args()
+
+    results = []
+    for config_engine in p.config_engine:
+        for nodes in p.nodes:
+            results += CMLNetKitBenchmark(nodes, p.link_density, p.config_size, config_engine, p.repeat,
+                                          p.seed, p.jobs).run()
+
+    if p.json_file is not None:
+        report = json.dumps({'metadata': get_metadata(), 'results': results}, indent=2)
+        if p.json_file == '-':
+            print(report)
+            return
+        with open(p.json_file, 'w') as f:
+            f.write(report + '\n')
+
+    TOutput = PrettyTable()
+    TOutput.field_names = ['Engine', 'Nodes', 'Links', 'Phase', 'Time [s]', 'Peak memory [KiB]']
+    TOutput.align['Phase'] = 'l'
+    TOutput.align['Time [s]'] = 'r'
+    TOutput.align['Peak memory [KiB]'] = 'r'
+    for r in results:
+        TOutput.add_row([r['config_engine'], r['nodes'], r['links'], r['phase'], '%.4f' % r['time'],
+                         '%d' % (r['peak_memory'] // 1024)])
+    print(TOutput)
+
+
+if __name__ == '__main__':
+    main()
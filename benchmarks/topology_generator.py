@@ -0,0 +1,168 @@
+# -*- coding: utf-8 -*-
+# (c) 2020-2023 Piotr Wojciechowski <piotr@it-playground.pl>
+# GNU General Public License v3.0+ (see COPYING or https://www.gnu.org/licenses/gpl-3.0.txt)
+import os
+import random
+import sys
+from argparse import ArgumentParser
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from CMLNetKit.AutoNetKit.CMLNetKit import CMLNetKit
+from CMLNetKit.AutoNetKit.CMLNetKitYaml import CMLNetKitYaml
+
+
+class CMLNetKitTopologyGenerator(object):
+    """
+    Initializes a CMLNetKitTopologyGenerator instance. This class generates synthetic lab topologies in the format
+    exported from CML2 server. Nodes of all supported types are created in turn, each with a startup configuration
+    that has the Loopback0, management and data interfaces configured the way CML2 node definitions do. Some data
+    interfaces have an address already configured, each in its own subnet, so the generated lab has no address
+    conflicts.
+
+    :param nodes: Number of nodes in the lab
+    :type nodes: int
+    :param link_density: Average number of links per node
+    :type link_density: float
+    :param config_size: Number of additional configuration lines in each node startup configuration
+    :type config_size: int
+    :param seed: Seed of the random generator, the same seed always generates the same topology
+    :type seed: int
+    :param node_types: Node types created in turn, all supported node types if not given
+    :type node_types: list
+    """
+
+    # Name of the Nth data interface for each node type, management interface names are taken from CMLNetKit
+    _data_interface_name = {'iosv': 'GigabitEthernet0/%d',
+                            'csr1000v': 'GigabitEthernet%d',
+                            'iosxrv': 'GigabitEthernet0/0/0/%d',
+                            'iosxrv9000': 'GigabitEthernet0/0/0/%d',
+                            'nxosv': 'Ethernet2/%d',
+                            'nxosv9000': 'Ethernet1/%d',
+                            'asav': 'GigabitEthernet0/%d',
+                            'cat8000v': 'GigabitEthernet%d',
+                            }
+    _data_interface_first = {'iosv': 1, 'csr1000v': 2, 'iosxrv': 0, 'iosxrv9000': 0, 'nxosv': 1, 'nxosv9000': 1,
+                             'asav': 0, 'cat8000v': 2}
+    _node_types_ipv4 = ['iosxrv', 'iosxrv9000']
+
+    def __init__(self, nodes, link_density=1.5, config_size=50, seed=1, node_types=None):
+        self.nodes = nodes
+        self.link_density = link_density
+        self.config_size = config_size
+        self.seed = seed
+        self.node_types = node_types if node_types else CMLNetKit._node_types_supported
+
+    def generate(self):
+        """
+        Generate the lab topology
+
+        :return: Lab configuration YAML object
+        :rtype: dict
+        """
+        rnd = random.Random(self.seed)
+        node_types = self.node_types
+        used_subnets = set()
+
+        links = []
+        links_per_node = [0] * self.nodes
+        link_count = int(round(self.nodes * self.link_density)) if self.nodes > 1 else 0
+        for _ in range(link_count):
+            node_a, node_b = rnd.sample(range(self.nodes), 2)
+            links_per_node[node_a] += 1
+            links_per_node[node_b] += 1
+            links.append((node_a, links_per_node[node_a], node_b, links_per_node[node_b]))
+
+        lab_nodes = []
+        for node_num in range(self.nodes):
+            node_type = node_types[node_num % len(node_types)]
+            label = '%s-%d' % (node_type, node_num)
+            interfaces = [CMLNetKit._node_management_interface_name[node_type]]
+            # One spare data interface is left unconnected on each node
+            for iface_num in range(links_per_node[node_num] + 1):
+                interfaces.append(self._data_interface_name[node_type] %
+                                  (self._data_interface_first[node_type] + iface_num))
+            lab_nodes.append({'id': 'n%d' % node_num,
+                              'label': label,
+                              'node_definition': node_type,
+                              'x': (node_num % 50) * 100,
+                              'y': (node_num // 50) * 100,
+                              'configuration': self._node_config(rnd, node_type, label, interfaces, used_subnets),
+                              'interfaces': [{'id': 'i%d' % iface_num, 'label': iface_name, 'slot': iface_num,
+                                              'type': 'physical'}
+                                             for iface_num, iface_name in enumerate(interfaces)],
+                              })
+
+        return {'lab': {'title': 'benchmark-%d' % self.nodes, 'description': '', 'notes': '', 'version': '0.1.0'},
+                'nodes': lab_nodes,
+                'links': [{'id': 'l%d' % link_num, 'n1': 'n%d' % node_a, 'i1': 'i%d' % iface_a,
+                           'n2': 'n%d' % node_b, 'i2': 'i%d' % iface_b}
+                          for link_num, (node_a, iface_a, node_b, iface_b) in enumerate(links)],
+                }
+
+    def _node_config(self, rnd, node_type, label, interfaces, used_subnets):
+        """
+        Generate the node startup configuration
+
+        :param rnd: Random generator
+        :type rnd: random.Random
+        :param node_type: Node type
+        :type node_type: str
+        :param label: Node label
+        :type label: str
+        :param interfaces: Names of the node interfaces, management interface first
+        :type interfaces: list
+        :param used_subnets: Third octets of the subnets already configured in the lab, updated with the new ones
+        :type used_subnets: set
+        :return: Node startup configuration
+        :rtype: str
+        """
+        ip_keyword = 'ipv4 address' if node_type in self._node_types_ipv4 else 'ip address'
+
+        lines = ['hostname %s' % label, '!', 'banner motd ^C', 'Lab node %s' % label, '', 'Authorized access only',
+                 '^C', '!', 'interface Loopback0', ' description to nowhere', ' no %s' % ip_keyword, ' shutdown', '!']
+        for iface_num, iface_name in enumerate(interfaces):
+            lines += ['interface %s' % iface_name, ' description to port %d' % iface_num]
+            # Some interfaces have the address already configured and are left unchanged
+            subnet = rnd.randint(0, 255) if rnd.random() < 0.1 else None
+            if subnet is not None and subnet not in used_subnets:
+                used_subnets.add(subnet)
+                lines.append(' %s 192.168.%d.%d 255.255.255.0' % (ip_keyword, subnet, rnd.randint(1, 254)))
+            else:
+                lines.append(' no %s' % ip_keyword)
+            lines += [' shutdown', '!']
+        for line_num in range(self.config_size):
+            if line_num % 10 == 0:
+                lines.append('ip access-list extended ACL-%d' % (line_num // 10))
+            lines.append(' %d permit tcp 10.%d.%d.0 0.0.0.255 any eq %d' % ((line_num % 10 + 1) * 10,
+                                                                           rnd.randint(0, 255), rnd.randint(0, 255),
+                                                                           rnd.randint(1, 65535)))
+        lines += ['!', 'line vty 0 4', ' login local', ' transport input ssh', '!', 'end']
+        return '\n'.join(lines)
+
+
+def main():
+    parser = ArgumentParser(description='Generate a synthetic CML2 lab topology in YAML format')
+    parser.add_argument('-n', '--nodes', type=int, default=100, help='Number of nodes (default 100)')
+    parser.add_argument('--link-density', type=float, default=1.5,
+                        help='Average number of links per node (default 1.5)')
+    parser.add_argument('--config-size', type=int, default=50,
+                        help='Number of additional lines in each node startup configuration (default 50)')
+    parser.add_argument('--seed', type=int, default=1, help='Seed of the random generator (default 1)')
+    parser.add_argument('--node-types', type=str, nargs='+', choices=CMLNetKit._node_types_supported,
+                        help='Node types created in turn (default all supported node types)')
+    parser.add_argument('-o', '--output', type=str, default='-',
+                        help='Output file (default standard output)')
+    p = parser.parse_args()
+
+    topology = CMLNetKitYaml.dump(CMLNetKitTopologyGenerator(p.nodes, p.link_density, p.config_size,
+                                                             p.seed, p.node_types).generate())
+    if p.output == '-':
+        sys.stdout.write(topology)
+    else:
+        with open(p.output, 'w') as f:
+            f.write(topology)
+
+
+if __name__ == '__main__':
+    main()
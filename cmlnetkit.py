@@ -1,29 +1,63 @@
 # -*- coding: utf-8 -*-
 # (c) 2020-2023 Piotr Wojciechowski <piotr@it-playground.pl>
 # GNU General Public License v3.0+ (see COPYING or https://www.gnu.org/licenses/gpl-3.0.txt)
+import os
 import sys
 from argparse import ArgumentParser
 
-from CMLNetKit.AutoNetKit import CMLNetKit
+# CMLNetKit and CMLNetKitBatch are imported when the lab is processed, so the help is printed without loading the
+# libraries used to talk to CML2 server and to update the configurations
 from CMLNetKit.AutoNetKit import CMLNetKitConfig
+from CMLNetKit.AutoNetKit import CMLNetKitProfiler
 
 
-def main():
+def get_parser():
+    """
+    Build the parser of command line arguments
+
+    :return: Parser of command line arguments
+    :rtype: argparse.ArgumentParser
+    """
     parser = ArgumentParser(epilog="Usage example: cmlnetkit.py -H cml.server.address -l abc123 --no-ssl-verification "
                                    "--lo-subnet 10.0.0.0/24 --mgmt-range 172.16.16.2 172.16.16.25 "
                                    "--mgmt-prefixlen 24 --peer-subnet 10.100.0.0/22")
 
     group_connection = parser.add_argument_group("Connection options")
+    group_file = parser.add_argument_group("File options")
+    group_processing = parser.add_argument_group("Processing options")
+    group_profile = parser.add_argument_group("Profiling options")
+    group_server = parser.add_argument_group("Server options")
     group_changes = parser.add_argument_group("Configuration changes")
 
     group_connection.add_argument('-H', '--host', type=str, dest='host', help='CML2.0 host address')
-    group_connection.add_argument('-l', '--lab', type=str, dest='lab_id',
-                                  help='Lab ID')
+    group_connection.add_argument('-l', '--lab', type=str, dest='lab_id', nargs='+',
+                                  help='Lab ID. Provide more than one to process the labs in batch mode')
+    group_connection.add_argument('--lab-file', type=str, dest='lab_file',
+                                  help='File with lab IDs to process in batch mode, one ID per line')
+    group_connection.add_argument('--lab-title', type=str, dest='lab_title',
+                                  help='Process in batch mode all labs with title matching the pattern. Shell-style '
+                                       'wildcards are supported, e.g. "Training *"')
+    group_connection.add_argument('--lab-owner', type=str, dest='lab_owner',
+                                  help='List only labs owned by the user. In batch mode applies to labs selected by '
+                                       '--lab-title')
+    group_connection.add_argument('--lab-state', type=str, dest='lab_state',
+                                  help='List only labs in the state, e.g. STOPPED. In batch mode applies to labs '
+                                       'selected by --lab-title')
+    group_connection.add_argument('--workers', type=int, dest='workers', default=4,
+                                  help='Number of labs processed concurrently in batch mode (default 4)')
+    group_connection.add_argument('--async', dest='use_async',
+                                  help='Use the asyncio API client. Labs are downloaded and uploaded concurrently, '
+                                       'the number of concurrent requests is limited by --workers (requires httpx)',
+                                  default=False, action="store_true")
     group_connection.add_argument('--list-labs', dest='list_labs',
                                   help='List the ID of existing labs', default=False, action="store_true")
     group_connection.add_argument('--list-ips', dest='list_ips',
                                   help='List the IP addresses configured on L3 links', default=False,
                                   action="store_true")
+    group_connection.add_argument('--format', dest='output_format', choices=['table', 'jsonl', 'csv'],
+                                  default='table',
+                                  help='Format of the labs list and IP addresses list. In "jsonl" and "csv" formats '
+                                       'the rows are written as soon as they are read (default "table")')
     group_connection.add_argument('-P', '--port', type=int, help='CML 2.0 API port (default 443)', dest='port',
                                   default=443)
     group_connection.add_argument('-u', '--username', type=str, help='CML 2.0 API username (default "virl2")',
@@ -38,6 +72,67 @@ def main():
     group_connection.add_argument('--dry-run', help="Don't apply any changes to CML2 server.",
                                   dest='dry_run',
                                   default=False, action="store_true")
+    group_connection.add_argument('--in-place', help='Update the changed node configurations in the existing lab '
+                                                     'instead of importing the whole topology as a new lab. Nodes '
+                                                     'must not be started',
+                                  dest='in_place', default=False, action="store_true")
+    group_connection.add_argument('--cache-dir', help='Keep the downloaded lab topologies in the directory. The cached '
+                                                      'topology is used if the lab was not modified since it was '
+                                                      'downloaded',
+                                  dest='cache_dir', metavar='DIR')
+    group_connection.add_argument('--cache-max-size', help='Maximum size of the topology cache in MiB, the oldest '
+                                                           'topologies are removed first (default 256)',
+                                  dest='cache_max_size', type=int, default=256, metavar='MIB')
+    group_connection.add_argument('--cache-max-age', help='Maximum age of the cached topology in hours (default 24)',
+                                  dest='cache_max_age', type=int, default=24, metavar='HOURS')
+    group_connection.add_argument('--catalog-ttl', help='Time in seconds the catalog of labs stored in --cache-dir '
+                                                        'is used before it is fetched again (default 300)',
+                                  dest='catalog_ttl', type=int, default=300, metavar='SECONDS')
+    group_connection.add_argument('-v', '--verbose', help='Print the time spent on parsing and dumping the lab '
+                                                          'topology on standard error',
+                                  dest='verbose', default=False, action="store_true")
+    group_file.add_argument('-i', '--input', type=str, dest='input_file',
+                            help='Read the lab topology from the YAML file instead of CML2 server, use "-" to read '
+                                 'from standard input')
+    group_file.add_argument('-o', '--output', type=str, dest='output_file', default='-',
+                            help='Write the updated lab topology to the YAML file when --input is used (default '
+                                 'standard output)')
+    group_processing.add_argument('--config-engine', help='Parser used to read and update node configurations '
+                                                          '(default "ciscoconfparse")',
+                                  dest='config_engine', choices=['ciscoconfparse', 'native'],
+                                  default='ciscoconfparse')
+    group_processing.add_argument('--jobs', help='Number of processes parsing and rewriting node configurations. '
+                                                 'Use the number of CPU cores for labs with hundreds of nodes '
+                                                 '(default 1)',
+                                  dest='jobs', type=int, default=1)
+    group_processing.add_argument('--state-dir', help='Incremental mode: keep the state of each lab in the directory '
+                                                      'and update only the nodes changed since the last run, '
+                                                      'reusing the addresses assigned then',
+                                  dest='state_dir', metavar='DIR')
+    group_profile.add_argument('--profile', dest='profile', default=False, action="store_true",
+                               help='Print the time and the number of calls of each phase of the run and the '
+                                    'counters of parsed configurations and topology lookups on standard error')
+    group_profile.add_argument('--profile-json', type=str, dest='profile_json',
+                               help='Write the phases, counters and the trace of each phase call to the file in JSON '
+                                    'format, use "-" for standard error')
+    group_profile.add_argument('--profile-memory', dest='profile_memory', default=False, action="store_true",
+                               help='Trace the peak memory of each phase, the run is slower')
+    group_profile.add_argument('--cprofile', type=str, dest='cprofile_file',
+                               help='Profile the run with cProfile and write the statistics to the file, they can '
+                                    'be read with the pstats module')
+    group_server.add_argument('--serve', dest='serve', default=False, action="store_true",
+                              help='Run as a server answering the requests to list the labs, list the IP addresses '
+                                   'and update the lab over HTTP. The connection to CML2 server and the downloaded '
+                                   'labs are kept between the requests, the other options are the defaults of each '
+                                   'request')
+    group_server.add_argument('--listen', type=str, dest='listen', default='127.0.0.1:8741', metavar='HOST:PORT',
+                              help='Address and TCP port the server listens on (default 127.0.0.1:8741)')
+    group_server.add_argument('--socket', type=str, dest='socket_path', metavar='PATH',
+                              help='Unix socket the server listens on instead of the TCP port')
+    group_server.add_argument('--background-refresh', help='In server mode list the labs from the stored catalog '
+                                                           'even if it is older than --catalog-ttl and fetch it '
+                                                           'again in the background',
+                              dest='background_refresh', default=False, action="store_true")
     group_changes.add_argument('-b',
                                help='Changing all "External Connection" objects configuration to "Bridge"',
                                dest="update_bridge", default=False, action="store_true")
@@ -56,6 +151,23 @@ def main():
                                     'must be provided in format as subnet/mask. If mask not provided the /24 is used.'
                                     'Direct connections betweend devices are addressed with /30 mask',
                                dest="peer_subnet")
+    group_changes.add_argument('--peer-prefixlen',
+                               help='Prefix length of the subnets assigned to direct connections between devices. '
+                                    'Must be between the --peer-subnet prefix length and 31. For /31 subnets both '
+                                    'addresses are assigned to the interfaces (default 30)',
+                               dest="peer_prefixlen", type=int, default=30)
+    group_changes.add_argument('--allocation', help='Address allocation strategy. "sequential" assigns the '
+                                                    'addresses by the position of the node or link in the lab, '
+                                                    '"packed" the lowest free addresses without gaps, "stable" by '
+                                                    'the hash of the node label or link ends, so they do not '
+                                                    'change when other nodes are added or removed (default '
+                                                    '"sequential")',
+                               dest='allocation', choices=['sequential', 'packed', 'stable'], default='sequential')
+    group_changes.add_argument('--check-conflicts', help='Check that the addresses already configured in the lab '
+                                                         'and assigned in this run are not duplicated and their '
+                                                         'subnets do not overlap. Conflicts are printed on standard '
+                                                         'error and the lab is not updated',
+                               dest='check_conflicts', default=False, action="store_true")
     group_changes_mask_prefixlen = group_changes.add_mutually_exclusive_group()
     group_changes_mask_prefixlen.add_argument('--mgmt-netmask',
                                               help='Subnet mask that needs to be assigned to management interfaces IP '
@@ -70,6 +182,11 @@ def main():
                                                    'between 0 and 32. If neither -mgmt-netmask nor -mgmt-prefixlen is '
                                                    'provided then /24 prefixlen (mask of 255.255.255.0) is assigned.',
                                               dest="mgmt_prefixlen", type=int)
+    return parser
+
+
+def main():
+    parser = get_parser()
     if len(sys.argv) < 2:
         parser.print_help()
         sys.exit(0)
@@ -79,7 +196,35 @@ def main():
         parser.error("Missing the --mgmt-range parameter required when providing either --mgmt-netmask or "
                      "--mgmt-prefixlen")
 
-    CMLNetKit.CMLNetKit(CMLNetKitConfig.CMLNetKitConfig(p))
+    cml_options = CMLNetKitConfig.CMLNetKitConfig(p)
+    profiler = CMLNetKitProfiler.CMLNetKitProfiler(enabled=cml_options.profile or cml_options.profile_json is not None,
+                                                   trace_memory=cml_options.profile_memory,
+                                                   cprofile_file=cml_options.cprofile_file)
+    profiler.start()
+    try:
+        if cml_options.serve:
+            from CMLNetKit.AutoNetKit import CMLNetKitServer
+
+            CMLNetKitServer.CMLNetKitServer(cml_options, parser, sys.argv[1:]).run()
+        elif cml_options.batch and not cml_options.list_labs and cml_options.input_file is None:
+            from CMLNetKit.AutoNetKit import CMLNetKitBatch
+
+            CMLNetKitBatch.CMLNetKitBatch(cml_options, profiler=profiler).run()
+        else:
+            from CMLNetKit.AutoNetKit import CMLNetKit
+
+            CMLNetKit.CMLNetKit(cml_options, profiler=profiler).run()
+    except BrokenPipeError:
+        # The output is piped to the command that exited before reading all rows, e.g. head. Standard output is
+        # redirected so Python does not fail again when flushing it at exit
+        os.dup2(os.open(os.devnull, os.O_WRONLY), sys.stdout.fileno())
+        sys.exit(1)
+    finally:
+        profiler.stop()
+        if cml_options.profile or cml_options.profile_memory or cml_options.cprofile_file is not None:
+            profiler.print_summary()
+        if cml_options.profile_json is not None:
+            profiler.write_json(cml_options.profile_json)
 
 
 if __name__ == '__main__':
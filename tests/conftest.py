@@ -0,0 +1,109 @@
+# -*- coding: utf-8 -*-
+# (c) 2020-2023 Piotr Wojciechowski <piotr@it-playground.pl>
+# GNU General Public License v3.0+ (see COPYING or https://www.gnu.org/licenses/gpl-3.0.txt)
+import json
+import os
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+# Tests import the package and cmlnetkit.py from the repository, as the benchmarks do
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import cmlnetkit
+from CMLNetKit.AutoNetKit.CMLNetKitConfig import CMLNetKitConfig
+from CMLNetKit.AutoNetKit.CMLNetKitYaml import CMLNetKitYaml
+from benchmarks.topology_generator import CMLNetKitTopologyGenerator
+
+
+@pytest.fixture
+def addressing_args():
+    """
+    Options addressing the Loopback, management and peer interfaces of the synthetic labs
+    """
+    return ['--lo-subnet', '10.0.0.0/22', '--mgmt-range', '172.16.0.1', '172.16.3.250', '--mgmt-prefixlen', '22',
+            '--peer-subnet', '10.100.0.0/16']
+
+
+@pytest.fixture
+def make_options():
+    """
+    Function returning the options parsed from the command line arguments
+    """
+    def make_options(*args):
+        return CMLNetKitConfig(cmlnetkit.get_parser().parse_args(list(args)))
+
+    return make_options
+
+
+@pytest.fixture
+def lab_file(tmp_path):
+    """
+    Function writing the synthetic lab topology to the file and returning its path
+    """
+    def lab_file(nodes=12, link_density=1.5, seed=1, name='lab.yaml', node_types=None):
+        path = tmp_path / name
+        path.write_text(CMLNetKitYaml.dump(CMLNetKitTopologyGenerator(nodes, link_density, seed=seed,
+                                                                      node_types=node_types).generate()))
+        return str(path)
+
+    return lab_file
+
+
+class MockCMLHandler(BaseHTTPRequestHandler):
+    """
+    Handler of the mock CML2 API. Responses of each path are taken in turn from the script of the server, the last
+    one is repeated. Requests being processed at the same time are counted.
+    """
+
+    def _respond(self):
+        server = self.server
+        with server.lock:
+            server.in_flight += 1
+            server.max_in_flight = max(server.max_in_flight, server.in_flight)
+            server.requests.append((self.command, self.path))
+            script = server.script.get(self.path, [(200, {}, b'"ok"')])
+            attempt = server.attempts.get(self.path, 0)
+            server.attempts[self.path] = attempt + 1
+        status, headers, body = script[min(attempt, len(script) - 1)]
+        # Requests are held for a while, so the concurrent requests overlap
+        time.sleep(server.delay)
+        self.send_response(status)
+        for name, value in headers.items():
+            self.send_header(name, value)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+        with server.lock:
+            server.in_flight -= 1
+
+    def do_GET(self):
+        self._respond()
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers.get('Content-Length', 0)))
+        self._respond()
+
+    def log_message(self, format, *args):
+        pass
+
+
+@pytest.fixture
+def cml_server():
+    server = ThreadingHTTPServer(('127.0.0.1', 0), MockCMLHandler)
+    server.lock = threading.Lock()
+    server.in_flight = 0
+    server.max_in_flight = 0
+    server.requests = []
+    server.attempts = {}
+    server.delay = 0.0
+    server.script = {'/api/v0/authenticate': [(200, {}, json.dumps('token').encode())]}
+    thread = threading.Thread(target=server.serve_forever, kwargs={'poll_interval': 0.01}, daemon=True)
+    thread.start()
+    server.base_url = 'http://127.0.0.1:%d/api/v0/' % server.server_address[1]
+    yield server
+    server.shutdown()
+    server.server_close()
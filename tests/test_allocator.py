@@ -0,0 +1,165 @@
+# -*- coding: utf-8 -*-
+# (c) 2020-2023 Piotr Wojciechowski <piotr@it-playground.pl>
+# GNU General Public License v3.0+ (see COPYING or https://www.gnu.org/licenses/gpl-3.0.txt)
+import itertools
+
+import pytest
+
+from CMLNetKit.AutoNetKit.CMLNetKit import CMLNetKit
+from CMLNetKit.AutoNetKit.CMLNetKitAllocator import CMLNetKitAddressAllocator
+from CMLNetKit.AutoNetKit.CMLNetKitState import CMLNetKitState
+from CMLNetKit.AutoNetKit.CMLNetKitYaml import CMLNetKitYaml
+
+
+def _allocate(allocator, keys):
+    return [allocator.allocate(key, preferred) for preferred, key in enumerate(keys)]
+
+
+def test_packed_has_no_gaps():
+    allocator = CMLNetKitAddressAllocator('lo-subnet', 64, strategy='packed', reserved=[1, 3, 8])
+    keys = ['r%d' % node_num for node_num in range(20)]
+
+    offsets = _allocate(allocator, keys)
+
+    assert offsets == sorted(set(range(23)) - {1, 3, 8})
+    # The key keeps its offset when allocated again
+    assert allocator.allocate('r5', 50) == offsets[5]
+
+
+def test_sequential_takes_preferred_offset_if_free():
+    allocator = CMLNetKitAddressAllocator('lo-subnet', 16, reserved=[1])
+
+    assert _allocate(allocator, ['r0', 'r1', 'r2']) == [0, 2, 3]
+    assert allocator.allocate('r9', 9) == 9
+
+
+def test_adopt_and_reserved_offsets_are_not_assigned():
+    allocator = CMLNetKitAddressAllocator('lo-subnet', 8, strategy='packed', reserved=[0, 2])
+    allocator.adopt('r7', 1)
+
+    assert _allocate(allocator, ['r0', 'r1', 'r2']) == [3, 4, 5]
+    assert allocator.allocate('r7', 0) == 1
+    assert allocator.table == {'r7': 1, 'r0': 3, 'r1': 4, 'r2': 5}
+
+
+def test_reserved_offsets_outside_pool_are_ignored():
+    allocator = CMLNetKitAddressAllocator('lo-subnet', 4, strategy='packed', reserved=[-1, 4, 100])
+
+    assert _allocate(allocator, ['r0', 'r1', 'r2', 'r3']) == [0, 1, 2, 3]
+
+
+def test_previous_table_is_reused_and_released():
+    allocator = CMLNetKitAddressAllocator('lo-subnet', 8, table={'r0': 5, 'gone': 0, 'r1': 20}, keys=['r0', 'r1'],
+                                          strategy='packed')
+
+    assert allocator.allocate('r0', 0) == 5
+    # Offset of the key no longer in the lab is released, offset outside the pool is assigned again
+    assert allocator.allocate('r1', 1) == 0
+
+
+def test_stable_offset_does_not_depend_on_order():
+    keys = ['r%d' % node_num for node_num in range(30)]
+    forward = CMLNetKitAddressAllocator('lo-subnet', 1024, strategy='stable')
+    backward = CMLNetKitAddressAllocator('lo-subnet', 1024, strategy='stable')
+
+    assert dict(zip(keys, _allocate(forward, keys))) == dict(zip(keys[::-1], _allocate(backward, keys[::-1])))
+
+
+def test_stable_collision_takes_next_free_offset():
+    size = 8
+    # Two keys with the same hash, the first one in the lab keeps the offset of its hash
+    key_a, key_b = next((key_a, key_b) for key_a, key_b in itertools.combinations(['r%d' % node_num
+                                                                                    for node_num in range(100)], 2)
+                        if CMLNetKitAddressAllocator.stable_offset(key_a, size) ==
+                        CMLNetKitAddressAllocator.stable_offset(key_b, size))
+    offset = CMLNetKitAddressAllocator.stable_offset(key_a, size)
+    allocator = CMLNetKitAddressAllocator('lo-subnet', size, strategy='stable', reserved=[(offset + 1) % size])
+
+    assert allocator.allocate(key_a, 0) == offset
+    assert allocator.allocate(key_b, 0) == (offset + 2) % size
+
+
+def test_stable_collision_wraps_to_start_of_pool():
+    size = 8
+    key = next('r%d' % node_num for node_num in range(100)
+               if CMLNetKitAddressAllocator.stable_offset('r%d' % node_num, size) == size - 1)
+    allocator = CMLNetKitAddressAllocator('lo-subnet', size, strategy='stable', reserved=[size - 1, 0])
+
+    assert allocator.allocate(key, 0) == 1
+
+
+@pytest.mark.parametrize('strategy', CMLNetKitAddressAllocator.strategies)
+def test_exhausted_pool(strategy):
+    allocator = CMLNetKitAddressAllocator('lo-subnet', 4, strategy=strategy, reserved=[2])
+    _allocate(allocator, ['r0', 'r1', 'r2'])
+
+    with pytest.raises(IndexError, match='lo-subnet: Address pool exhausted'):
+        allocator.allocate('r3', 3)
+    # The keys with offsets still get them
+    assert allocator.allocate('r1', 1) in allocator
+
+
+def test_unsupported_strategy():
+    with pytest.raises(ValueError, match='allocation: Unsupported allocation strategy'):
+        CMLNetKitAddressAllocator('lo-subnet', 4, strategy='random')
+
+
+def _node(node_num, interfaces):
+    """
+    Node iosv with the startup configuration of given interfaces, dictionary of interface names and address lines
+    """
+    lines = ['hostname r%d' % node_num, '!']
+    for iface_name, address_line in interfaces.items():
+        lines += ['interface %s' % iface_name, address_line, ' shutdown', '!']
+    lines.append('end')
+    return {'id': 'n%d' % node_num, 'label': 'r%d' % node_num, 'node_definition': 'iosv', 'x': 0, 'y': 0,
+            'configuration': '\n'.join(lines),
+            'interfaces': [{'id': 'i%d' % iface_num, 'label': 'GigabitEthernet0/%d' % iface_num, 'slot': iface_num,
+                            'type': 'physical'} for iface_num in range(3)]}
+
+
+def _link(link_num, node_a, iface_a, node_b, iface_b):
+    return {'id': 'l%d' % link_num, 'n1': 'n%d' % node_a, 'i1': 'i%d' % iface_a, 'n2': 'n%d' % node_b,
+            'i2': 'i%d' % iface_b}
+
+
+def test_partially_addressed_lab(tmp_path, make_options):
+    unaddressed = ' no ip address'
+    # r0 has no Loopback0 and no GigabitEthernet0/2, r2 has the address outside the pools on GigabitEthernet0/1.
+    # The link between them takes no address at either end.
+    lab = {'lab': {'title': 'partial', 'description': '', 'notes': '', 'version': '0.1.0'},
+           'nodes': [_node(0, {'GigabitEthernet0/0': unaddressed}),
+                     _node(1, {'Loopback0': unaddressed, 'GigabitEthernet0/0': unaddressed,
+                               'GigabitEthernet0/1': unaddressed}),
+                     _node(2, {'Loopback0': unaddressed, 'GigabitEthernet0/0': ' ip address 192.168.0.1 255.255.255.0',
+                               'GigabitEthernet0/1': ' ip address 192.168.1.1 255.255.255.0',
+                               'GigabitEthernet0/2': unaddressed}),
+                     ],
+           'links': [_link(0, 0, 2, 2, 1), _link(1, 1, 1, 2, 2)]}
+    input_file = str(tmp_path / 'lab.yaml')
+    with open(input_file, 'w') as f:
+        f.write(CMLNetKitYaml.dump(lab))
+    state_dir = str(tmp_path / 'state')
+
+    cmlnetkit = CMLNetKit(make_options('-i', input_file, '-o', str(tmp_path / 'updated.yaml'), '--state-dir',
+                                       state_dir, '--allocation', 'packed', '--lo-subnet', '10.9.9.0/24',
+                                       '--mgmt-range', '172.16.0.1', '172.16.0.250', '--peer-subnet',
+                                       '10.100.0.0/16', '--peer-prefixlen', '30'))
+    cmlnetkit.run()
+
+    configs = [nodedef['configuration'] for nodedef in cmlnetkit.lab_conf['nodes']]
+    assert '10.9.9.' not in configs[0]
+    assert 'ip address 10.9.9.1 255.255.255.255' in configs[1]
+    assert 'ip address 10.9.9.2 255.255.255.255' in configs[2]
+    assert 'ip address 172.16.0.1 ' in configs[0]
+    assert 'ip address 172.16.0.2 ' in configs[1]
+    assert '172.16.' not in configs[2]
+    # The only link that takes the addresses gets the first subnet
+    assert 'ip address 10.100.0.1 255.255.255.252' in configs[1]
+    assert 'ip address 10.100.0.2 255.255.255.252' in configs[2]
+    assert '10.100.' not in configs[0]
+
+    allocations = CMLNetKitState(state_dir, 'partial').allocations
+    assert allocations['lo-subnet']['table'] == {'r1': 0, 'r2': 1}
+    assert allocations['mgmt-range']['table'] == {'r0': 0, 'r1': 1}
+    assert list(allocations['peer-subnet']['table'].values()) == [0]
@@ -0,0 +1,101 @@
+# -*- coding: utf-8 -*-
+# (c) 2020-2023 Piotr Wojciechowski <piotr@it-playground.pl>
+# GNU General Public License v3.0+ (see COPYING or https://www.gnu.org/licenses/gpl-3.0.txt)
+import asyncio
+import types
+
+import pytest
+
+httpx = pytest.importorskip('httpx')
+
+from CMLNetKit.AutoNetKit import CMLNetKitAsync
+from CMLNetKit.AutoNetKit.CMLNetKitAsync import CMLNetKitAsyncClient
+
+
+@pytest.fixture
+def sleeps(monkeypatch):
+    """
+    Delays of the retries, recorded instead of waiting
+    """
+    delays = []
+    real_sleep = asyncio.sleep
+
+    async def sleep(delay):
+        delays.append(delay)
+        await real_sleep(0)
+
+    monkeypatch.setattr(CMLNetKitAsync, 'asyncio', types.SimpleNamespace(Semaphore=asyncio.Semaphore, sleep=sleep))
+    return delays
+
+
+def _cml_options():
+    return types.SimpleNamespace(host='127.0.0.1', username='admin', password='secret', ssl_verify=False)
+
+
+async def _download_labs(base_url, lab_ids, concurrency=4, retries=5, backoff=0.5):
+    async with CMLNetKitAsyncClient(_cml_options(), concurrency=concurrency, base_url=base_url, retries=retries,
+                                    backoff=backoff) as client:
+        return await asyncio.gather(*[client.download_lab(lab_id) for lab_id in lab_ids])
+
+
+def test_retry_after_is_respected(cml_server, sleeps):
+    cml_server.script['/api/v0/labs/a/download'] = [(429, {'Retry-After': '2'}, b''),
+                                                    (503, {'Retry-After': '1.5'}, b''),
+                                                    (200, {}, b'lab: a')]
+
+    assert asyncio.run(_download_labs(cml_server.base_url, ['a'])) == ['lab: a']
+    assert cml_server.attempts['/api/v0/labs/a/download'] == 3
+    assert sleeps == [2.0, 1.5]
+
+
+def test_exponential_backoff_without_retry_after(cml_server, sleeps):
+    cml_server.script['/api/v0/labs/a/download'] = [(503, {}, b''), (503, {}, b''), (429, {}, b''),
+                                                    (200, {}, b'lab: a')]
+
+    assert asyncio.run(_download_labs(cml_server.base_url, ['a'], backoff=0.25)) == ['lab: a']
+    assert cml_server.attempts['/api/v0/labs/a/download'] == 4
+    assert sleeps == [0.25, 0.5, 1.0]
+
+
+def test_retry_delay_is_capped(cml_server, sleeps):
+    cml_server.script['/api/v0/labs/a/download'] = [(429, {'Retry-After': '3600'}, b''), (200, {}, b'lab: a')]
+
+    asyncio.run(_download_labs(cml_server.base_url, ['a']))
+    assert sleeps == [CMLNetKitAsyncClient._backoff_max]
+
+
+def test_retries_exhausted(cml_server, sleeps):
+    cml_server.script['/api/v0/labs/a/download'] = [(429, {'Retry-After': '1'}, b'')]
+
+    with pytest.raises(httpx.HTTPStatusError) as e:
+        asyncio.run(_download_labs(cml_server.base_url, ['a'], retries=3))
+    assert e.value.response.status_code == 429
+    assert cml_server.attempts['/api/v0/labs/a/download'] == 4
+    assert sleeps == [1.0, 1.0, 1.0]
+
+
+def test_other_errors_are_not_retried(cml_server, sleeps):
+    cml_server.script['/api/v0/labs/a/download'] = [(404, {}, b'')]
+
+    with pytest.raises(httpx.HTTPStatusError):
+        asyncio.run(_download_labs(cml_server.base_url, ['a']))
+    assert cml_server.attempts['/api/v0/labs/a/download'] == 1
+    assert sleeps == []
+
+
+@pytest.mark.parametrize('concurrency', [1, 3])
+def test_concurrency_limit(cml_server, sleeps, concurrency):
+    cml_server.delay = 0.02
+    lab_ids = ['lab%d' % lab_num for lab_num in range(12)]
+    # Every other lab is rejected once, the retries must not exceed the limit either
+    for lab_id in lab_ids[::2]:
+        cml_server.script['/api/v0/labs/%s/download' % lab_id] = [(503, {'Retry-After': '0'}, b''),
+                                                                  (200, {}, lab_id.encode())]
+
+    results = asyncio.run(_download_labs(cml_server.base_url, lab_ids, concurrency=concurrency))
+
+    assert results[1::2] == ['"ok"'] * 6
+    assert results[::2] == lab_ids[::2]
+    assert len(cml_server.requests) == 1 + len(lab_ids) + len(lab_ids[::2])
+    # The requests are sent concurrently, never more than the limit
+    assert cml_server.max_in_flight == concurrency
@@ -0,0 +1,72 @@
+# -*- coding: utf-8 -*-
+# (c) 2020-2023 Piotr Wojciechowski <piotr@it-playground.pl>
+# GNU General Public License v3.0+ (see COPYING or https://www.gnu.org/licenses/gpl-3.0.txt)
+import os
+import threading
+
+from CMLNetKit.AutoNetKit.CMLNetKitState import CMLNetKitState
+from CMLNetKit.AutoNetKit.CMLNetKitTopologyCache import CMLNetKitTopologyCache
+
+LAB_DETAILS = {'modified': '2023-03-06T10:00:00+00:00', 'node_count': 1000, 'link_count': 0}
+WRITERS = 8
+WRITES = 20
+
+
+def _run_writers(write):
+    """
+    Run the writers in threads at the same time
+
+    :param write: Function writing the file, called with the writer number
+    :return: List of exceptions raised by the writers
+    """
+    errors = []
+    barrier = threading.Barrier(WRITERS)
+
+    def writer(writer_num):
+        barrier.wait()
+        try:
+            for _ in range(WRITES):
+                write(writer_num)
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=writer, args=(writer_num,)) for writer_num in range(WRITERS)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return errors
+
+
+def _topology(writer_num):
+    return {'lab': {'title': 'writer-%d' % writer_num},
+            'nodes': [{'id': 'n%d' % node_num, 'configuration': 'hostname writer-%d\n' % writer_num * 20}
+                      for node_num in range(1000)]}
+
+
+def test_topology_cache_concurrent_writers(tmp_path):
+    cache_dir = str(tmp_path / 'cache')
+    topology_cache = CMLNetKitTopologyCache(cache_dir, 'cml.example.com:443', 1 << 30, 3600)
+
+    errors = _run_writers(lambda writer_num: topology_cache.put('abc123', LAB_DETAILS, _topology(writer_num)))
+
+    assert errors == []
+    assert os.listdir(cache_dir) == [os.path.basename(topology_cache._path('abc123'))]
+    assert topology_cache.get('abc123', LAB_DETAILS) in [_topology(writer_num) for writer_num in range(WRITERS)]
+
+
+def test_state_concurrent_writers(tmp_path):
+    state_dir = str(tmp_path / 'state')
+
+    def write(writer_num):
+        state = CMLNetKitState(state_dir, 'Lab')
+        state.update(dict(('n%d' % node_num, 'writer-%d' % writer_num * 10) for node_num in range(1000)),
+                     'options', {})
+        state.save()
+
+    errors = _run_writers(write)
+
+    assert errors == []
+    state = CMLNetKitState(state_dir, 'Lab')
+    assert os.listdir(state_dir) == [os.path.basename(state.path)]
+    assert len(set(state.nodes.values())) == 1
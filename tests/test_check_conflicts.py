@@ -0,0 +1,51 @@
+# -*- coding: utf-8 -*-
+# (c) 2020-2023 Piotr Wojciechowski <piotr@it-playground.pl>
+# GNU General Public License v3.0+ (see COPYING or https://www.gnu.org/licenses/gpl-3.0.txt)
+import pytest
+
+from CMLNetKit.AutoNetKit.CMLNetKit import CMLNetKit
+from CMLNetKit.AutoNetKit.CMLNetKitConfParse import CMLNetKitConfParse
+from CMLNetKit.AutoNetKit.CMLNetKitYaml import CMLNetKitYaml
+
+# Node types with management interface GigabitEthernet1, its name is the prefix of GigabitEthernet10 and above
+GIGABITETHERNET1_NODE_TYPES = ['csr1000v', 'cat8000v']
+
+
+def _lab_file(lab_file, node_types):
+    # Dense lab, so the nodes have GigabitEthernet10 and above connected
+    return lab_file(nodes=16, link_density=6, node_types=node_types)
+
+
+@pytest.mark.parametrize('config_engine', ['native', 'ciscoconfparse'])
+@pytest.mark.parametrize('node_types', [GIGABITETHERNET1_NODE_TYPES, None])
+def test_generated_lab_has_no_conflicts(tmp_path, lab_file, make_options, addressing_args, config_engine,
+                                        node_types):
+    if config_engine == 'ciscoconfparse':
+        pytest.importorskip('ciscoconfparse')
+    output_file = str(tmp_path / 'updated.yaml')
+
+    CMLNetKit(make_options('-i', _lab_file(lab_file, node_types), '-o', output_file, '--check-conflicts',
+                           '--config-engine', config_engine, *addressing_args)).run()
+
+    with open(output_file) as f:
+        assert len(CMLNetKitYaml.load(f.read())['nodes']) == 16
+
+
+def test_management_address_only_on_management_interface(tmp_path, lab_file, make_options, addressing_args):
+    output_file = str(tmp_path / 'updated.yaml')
+    CMLNetKit(make_options('-i', _lab_file(lab_file, GIGABITETHERNET1_NODE_TYPES), '-o', output_file,
+                           *addressing_args)).run()
+
+    with open(output_file) as f:
+        lab = CMLNetKitYaml.load(f.read())
+    checked = 0
+    for node in lab['nodes']:
+        parsed_config = CMLNetKitConfParse(node['configuration'])
+        management = parsed_config.interface_children('GigabitEthernet1')
+        assert any(line.startswith(' ip address 172.16.') for line in management)
+        for iface_name in ['GigabitEthernet10', 'GigabitEthernet11']:
+            children = parsed_config.interface_children(iface_name)
+            if children is not None:
+                checked += 1
+                assert not any(line.startswith(' ip address 172.16.') for line in children)
+    assert checked > len(lab['nodes'])
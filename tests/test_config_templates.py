@@ -0,0 +1,79 @@
+# -*- coding: utf-8 -*-
+# (c) 2020-2023 Piotr Wojciechowski <piotr@it-playground.pl>
+# GNU General Public License v3.0+ (see COPYING or https://www.gnu.org/licenses/gpl-3.0.txt)
+import pytest
+
+from CMLNetKit.AutoNetKit.CMLNetKit import CMLNetKit
+from CMLNetKit.AutoNetKit.CMLNetKitConfigCache import CMLNetKitConfigTemplates
+from CMLNetKit.AutoNetKit.CMLNetKitTopologyCache import CMLNetKitTopologyCache
+
+from test_lab_patch import FakeClient, FakeLab, _read
+
+LAB_DETAILS = {'id': 'abc123', 'lab_title': 'Lab', 'modified': '2023-03-06T10:00:00+00:00', 'node_count': 12,
+               'link_count': 18}
+
+
+class FakeDetailsLab(FakeLab):
+    def __init__(self, topology):
+        super(FakeDetailsLab, self).__init__(topology)
+        self.lab_details = dict(LAB_DETAILS)
+
+    def details(self):
+        return self.lab_details
+
+
+@pytest.fixture
+def server_run(make_options, addressing_args):
+    """
+    Runs the in-place update of the lab the way the long-running server does, sharing the topology cache and the
+    parsed configurations between the runs
+    """
+    topology_cache = CMLNetKitTopologyCache(None, 'cml.example.com:443', 1 << 24, 3600, memory=True)
+    config_templates = CMLNetKitConfigTemplates()
+
+    def run(fake_lab, config_engine='native'):
+        del fake_lab.patches[:]
+        cmlnetkit = CMLNetKit(make_options('-H', 'cml.example.com', '-l', 'abc123', '--in-place', '--config-engine',
+                                           config_engine, *addressing_args),
+                              cml_client=FakeClient(fake_lab), topology_cache=topology_cache,
+                              config_templates=config_templates)
+        cmlnetkit.profiler.enabled = True
+        cmlnetkit.process_lab()
+        return cmlnetkit.profiler.counters, list(fake_lab.patches)
+    return run
+
+
+def test_configurations_parsed_once(lab_file, server_run):
+    fake_lab = FakeDetailsLab(_read(lab_file()))
+
+    first_counters, first_patches = server_run(fake_lab)
+    second_counters, second_patches = server_run(fake_lab)
+
+    assert first_counters['node_config_parses'] == 12
+    assert second_counters.get('node_config_parses', 0) == 0
+    assert second_counters['node_config_copies'] == 12
+    # The templates are not changed by the updates of the first run
+    assert len(first_patches) == 12
+    assert second_patches == first_patches
+
+
+def test_modified_lab_parsed_again(lab_file, server_run):
+    fake_lab = FakeDetailsLab(_read(lab_file()))
+    server_run(fake_lab)
+
+    fake_lab.lab_details['modified'] = '2023-03-06T11:00:00+00:00'
+    counters, _ = server_run(fake_lab)
+
+    assert counters['node_config_parses'] == 12
+    assert counters.get('node_config_copies', 0) == 0
+
+
+def test_ciscoconfparse_not_kept(lab_file, server_run):
+    pytest.importorskip('ciscoconfparse')
+    fake_lab = FakeDetailsLab(_read(lab_file()))
+    server_run(fake_lab, 'ciscoconfparse')
+
+    counters, _ = server_run(fake_lab, 'ciscoconfparse')
+
+    assert counters['node_config_parses'] == 12
+    assert counters.get('node_config_copies', 0) == 0
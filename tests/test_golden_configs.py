@@ -0,0 +1,64 @@
+# -*- coding: utf-8 -*-
+# (c) 2020-2023 Piotr Wojciechowski <piotr@it-playground.pl>
+# GNU General Public License v3.0+ (see COPYING or https://www.gnu.org/licenses/gpl-3.0.txt)
+import os
+
+import pytest
+
+from CMLNetKit.AutoNetKit.CMLNetKit import CMLNetKit
+from CMLNetKit.AutoNetKit.CMLNetKitConfigCache import CMLNetKitConfigCache
+from CMLNetKit.AutoNetKit.CMLNetKitPlatform import CMLNetKitPlatform
+
+GOLDEN_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'golden')
+
+# Node type of each golden configuration and the edits applied to it: the plan of the platform, the interface and
+# the address and netmask. Interfaces with the address already set and interfaces with names starting with the name
+# of the edited one (GigabitEthernet10, Ethernet1/10) must stay unchanged.
+GOLDEN_EDITS = {
+    'ios': ('csr1000v', [('loopback', 'Loopback0', '10.0.0.1', None),
+                         ('management', 'GigabitEthernet1', '192.168.255.11', '255.255.255.0'),
+                         ('peer', 'GigabitEthernet2', '10.100.0.1', '255.255.255.252'),
+                         ('peer', 'GigabitEthernet3', '10.100.0.5', '255.255.255.252'),
+                         ('peer', 'GigabitEthernet2.100', '10.100.0.9', '255.255.255.252')]),
+    'iosxr': ('iosxrv', [('loopback', 'Loopback0', '10.0.0.2', None),
+                         ('management', 'MgmtEth0/0/CPU0/0', '192.168.255.12', '255.255.255.0'),
+                         ('peer', 'GigabitEthernet0/0/0/0', '10.100.0.2', '255.255.255.252'),
+                         ('peer', 'GigabitEthernet0/0/0/1', '10.100.0.6', '255.255.255.252')]),
+    'nxos': ('nxosv9000', [('loopback', 'Loopback0', '10.0.0.3', None),
+                           ('management', 'mgmt0', '192.168.255.13', '255.255.255.0'),
+                           ('peer', 'Ethernet1/1', '10.100.0.13', '255.255.255.252'),
+                           ('peer', 'Ethernet1/2', '10.100.0.17', '255.255.255.252')]),
+    'asa': ('asav', [('management', 'Management0/0', '192.168.255.14', '255.255.255.0'),
+                     ('peer', 'GigabitEthernet0/0', '10.100.0.14', '255.255.255.252'),
+                     ('peer', 'GigabitEthernet0/1', '10.100.0.18', '255.255.255.252'),
+                     ('peer', 'GigabitEthernet0/1.20', '10.100.0.21', '255.255.255.252')]),
+}
+
+
+def _read_golden(name, extension):
+    with open(os.path.join(GOLDEN_DIR, name + extension), 'rb') as f:
+        return f.read()
+
+
+@pytest.mark.parametrize('engine', sorted(CMLNetKitConfigCache.engines))
+@pytest.mark.parametrize('name', sorted(GOLDEN_EDITS))
+def test_golden_config(name, engine):
+    node_type, edits = GOLDEN_EDITS[name]
+    platform = CMLNetKitPlatform.get(node_type)
+    node_edits = [(getattr(platform, plan), iface_name, {'ip_addr': ip_addr, 'ip_netmask': ip_netmask})
+                  for plan, iface_name, ip_addr, ip_netmask in edits]
+
+    node_parsed_config = CMLNetKitConfigCache.engines[engine](_read_golden(name, '.cfg').decode('utf-8'))
+    CMLNetKit.apply_node_edits(node_parsed_config, node_edits)
+
+    assert node_parsed_config.changed is True
+    assert node_parsed_config.dumps().encode('utf-8') == _read_golden(name, '.expected')
+
+
+@pytest.mark.parametrize('name', sorted(GOLDEN_EDITS))
+def test_golden_config_engines_identical(name):
+    node_config = _read_golden(name, '.cfg').decode('utf-8')
+    dumps = [CMLNetKitConfigCache.engines[engine](node_config).dumps()
+             for engine in sorted(CMLNetKitConfigCache.engines)]
+
+    assert dumps[0] == dumps[1]
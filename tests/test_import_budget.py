@@ -0,0 +1,129 @@
+# -*- coding: utf-8 -*-
+# (c) 2020-2023 Piotr Wojciechowski <piotr@it-playground.pl>
+# GNU General Public License v3.0+ (see COPYING or https://www.gnu.org/licenses/gpl-3.0.txt)
+import os
+import subprocess
+import sys
+
+import pytest
+
+from CMLNetKit.AutoNetKit.CMLNetKit import CMLNetKit
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Libraries that take long to import and are not needed by the short commands and the offline mode
+HEAVY_MODULES = ['ciscoconfparse', 'virl2_client', 'httpx']
+
+# Libraries that are not needed to print the help or to list the labs from the stored catalog
+START_MODULES = HEAVY_MODULES + ['yaml', 'netaddr', 'prettytable', 'asyncio', 'multiprocessing']
+
+# Maximum time in seconds of the imports done by the command to print the help or to list the labs from the stored
+# catalog, best of the runs
+IMPORT_BUDGET = float(os.environ.get('CMLNETKIT_IMPORT_BUDGET', '0.1'))
+IMPORT_BUDGET_RUNS = 3
+
+LIST_LABS_ARGS = ['-H', 'cml.example.com', '-u', 'admin', '--list-labs', '--catalog-ttl', '3600']
+
+
+def _run(args):
+    """
+    Run cmlnetkit.py with -X importtime
+
+    :return: Standard output and the output of -X importtime
+    :rtype: tuple
+    """
+    result = subprocess.run([sys.executable, '-X', 'importtime', os.path.join(ROOT, 'cmlnetkit.py')] + args,
+                            capture_output=True, text=True, cwd=ROOT)
+    assert result.returncode == 0, result.stderr[-2000:]
+    return result.stdout, result.stderr
+
+
+def _imported(importtime, top_level=False):
+    """
+    Return the packages imported and their cumulative import time from -X importtime output. Imports of
+    a package and its submodules are counted under the package name.
+
+    :param top_level: Flag if only the imports done directly by the command are returned, not the nested ones
+    :type top_level: bool
+    :return: Dictionary of package names and import time in seconds
+    :rtype: dict
+    """
+    imported = {}
+    for line in importtime.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        _, cumulative, name = line[len('import time:'):].split('|')
+        if top_level and name.startswith('  '):
+            continue
+        name = name.strip().split('.')[0]
+        imported[name] = imported.get(name, 0) + int(cumulative) / 1e6
+    return imported
+
+
+def _import_time(args):
+    """
+    Return the time of the imports done by the command. Modules imported when the interpreter starts are not
+    counted.
+
+    :rtype: float
+    """
+    startup = _imported(subprocess.run([sys.executable, '-X', 'importtime', '-c', 'pass'], capture_output=True,
+                                       text=True, check=True).stderr)
+    return sum(time for name, time in _imported(_run(args)[1], top_level=True).items() if name not in startup)
+
+
+@pytest.fixture
+def stored_catalog(tmp_path, make_options):
+    """
+    Cache directory with the catalog of labs fetched in this hour, so the labs are listed without connection to
+    CML2 server
+    """
+    cache_dir = str(tmp_path / 'cache')
+    CMLNetKit(make_options(*LIST_LABS_ARGS + ['--cache-dir', cache_dir]))._get_lab_catalog().store(
+        [{'id': 'abc123', 'lab_title': 'Training 1', 'owner': 'admin', 'state': 'STOPPED', 'node_count': 4,
+          'link_count': 3, 'modified': '2023-03-06T10:00:00+00:00'}])
+    return cache_dir
+
+
+def test_help_imports():
+    imported = _imported(_run(['--help'])[1])
+
+    assert [module for module in START_MODULES if module in imported] == []
+
+
+@pytest.mark.parametrize('output_format', ['table', 'jsonl', 'csv'])
+def test_list_labs_imports(stored_catalog, output_format):
+    imported = _imported(_run(LIST_LABS_ARGS + ['--cache-dir', stored_catalog, '--format', output_format])[1])
+
+    assert [module for module in START_MODULES if module in imported] == []
+
+
+def test_list_labs_output(stored_catalog):
+    output, _ = _run(LIST_LABS_ARGS + ['--cache-dir', stored_catalog])
+
+    assert 'abc123\tTraining 1' in output
+
+
+@pytest.mark.parametrize('args', [['--help'], LIST_LABS_ARGS])
+def test_import_budget(stored_catalog, args):
+    if '--list-labs' in args:
+        args = args + ['--cache-dir', stored_catalog]
+    best = min(_import_time(args) for _ in range(IMPORT_BUDGET_RUNS))
+
+    assert best <= IMPORT_BUDGET
+
+
+@pytest.mark.parametrize('config_engine, allowed', [('native', []), ('ciscoconfparse', ['ciscoconfparse'])])
+def test_offline_imports(tmp_path, lab_file, addressing_args, config_engine, allowed):
+    output_file = str(tmp_path / 'updated.yaml')
+    imported = _imported(_run(['-i', lab_file(), '-o', output_file, '--config-engine', config_engine] +
+                              addressing_args)[1])
+
+    assert os.path.getsize(output_file) > 0
+    assert [module for module in HEAVY_MODULES if module in imported] == allowed
+
+
+def test_offline_list_ips_imports(lab_file):
+    imported = _imported(_run(['-i', lab_file(), '--list-ips', '--config-engine', 'native'])[1])
+
+    assert [module for module in HEAVY_MODULES if module in imported] == []
@@ -0,0 +1,63 @@
+# -*- coding: utf-8 -*-
+# (c) 2020-2023 Piotr Wojciechowski <piotr@it-playground.pl>
+# GNU General Public License v3.0+ (see COPYING or https://www.gnu.org/licenses/gpl-3.0.txt)
+from CMLNetKit.AutoNetKit.CMLNetKit import CMLNetKit
+from CMLNetKit.AutoNetKit.CMLNetKitYaml import CMLNetKitYaml
+
+
+def _run(make_options, input_file, output_file, state_dir, args):
+    cmlnetkit = CMLNetKit(make_options('-i', input_file, '-o', output_file, '--state-dir', state_dir, *args))
+    cmlnetkit.run()
+    return cmlnetkit
+
+
+def _read(path):
+    with open(path) as f:
+        return f.read()
+
+
+def test_rerun_without_changes_is_noop(tmp_path, lab_file, make_options, addressing_args):
+    state_dir = str(tmp_path / 'state')
+    first = _run(make_options, lab_file(), str(tmp_path / 'first.yaml'), state_dir, addressing_args)
+    assert len(first._changed_nodes) == len(first.lab_conf['nodes'])
+    assert first.lab_conf_changed is True
+
+    second = _run(make_options, str(tmp_path / 'first.yaml'), str(tmp_path / 'second.yaml'), state_dir,
+                  addressing_args)
+
+    assert second._changed_nodes == set()
+    assert second._node_edits == {}
+    assert second.profiler.counters.get('node_config_parses', 0) == 0
+    assert second.lab_conf_changed is False
+    assert _read(str(tmp_path / 'second.yaml')) == _read(str(tmp_path / 'first.yaml'))
+
+
+def test_rerun_updates_only_changed_nodes(tmp_path, lab_file, make_options, addressing_args):
+    state_dir = str(tmp_path / 'state')
+    original = CMLNetKitYaml.load(_read(lab_file()))
+    _run(make_options, lab_file(), str(tmp_path / 'first.yaml'), state_dir, addressing_args)
+    first = CMLNetKitYaml.load(_read(str(tmp_path / 'first.yaml')))
+
+    # The configuration of one node is reset to the one before the first run
+    changed = CMLNetKitYaml.load(_read(str(tmp_path / 'first.yaml')))
+    changed['nodes'][3]['configuration'] = original['nodes'][3]['configuration']
+    with open(str(tmp_path / 'changed.yaml'), 'w') as f:
+        f.write(CMLNetKitYaml.dump(changed))
+
+    second = _run(make_options, str(tmp_path / 'changed.yaml'), str(tmp_path / 'second.yaml'), state_dir,
+                  addressing_args)
+
+    assert second._changed_nodes == {3}
+    assert list(second._node_edits) == [3]
+    # The node gets back the addresses assigned in the first run
+    assert CMLNetKitYaml.load(_read(str(tmp_path / 'second.yaml'))) == first
+
+
+def test_changed_options_update_all_nodes(tmp_path, lab_file, make_options, addressing_args):
+    state_dir = str(tmp_path / 'state')
+    first = _run(make_options, lab_file(), str(tmp_path / 'first.yaml'), state_dir, addressing_args)
+
+    second = _run(make_options, str(tmp_path / 'first.yaml'), str(tmp_path / 'second.yaml'), state_dir,
+                  addressing_args + ['-b'])
+
+    assert len(second._changed_nodes) == len(first.lab_conf['nodes'])
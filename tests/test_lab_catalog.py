@@ -0,0 +1,183 @@
+# -*- coding: utf-8 -*-
+# (c) 2020-2023 Piotr Wojciechowski <piotr@it-playground.pl>
+# GNU General Public License v3.0+ (see COPYING or https://www.gnu.org/licenses/gpl-3.0.txt)
+import json
+import threading
+import types
+
+import pytest
+
+from CMLNetKit.AutoNetKit import CMLNetKitLabCatalog as lab_catalog_module
+from CMLNetKit.AutoNetKit.CMLNetKit import CMLNetKit
+from CMLNetKit.AutoNetKit.CMLNetKitLabCatalog import CMLNetKitLabCatalog
+
+KEY = 'cml.example.com:443 admin'
+
+LAB_TILES = {'lab_tiles': {
+    'a1': {'id': 'a1', 'lab_title': 'Training 1', 'owner_username': 'admin', 'state': 'STARTED', 'node_count': 4,
+           'link_count': 3, 'modified': '2023-03-06T10:00:00+00:00', 'topology': {}},
+    'a2': {'id': 'a2', 'lab_title': 'Training 2', 'owner_username': 'student', 'state': 'STOPPED', 'node_count': 2,
+           'link_count': 1, 'modified': '2023-03-06T11:00:00+00:00'},
+    'b1': {'id': 'b1', 'lab_title': 'Core', 'owner_username': 'admin', 'state': 'STOPPED', 'node_count': 40,
+           'link_count': 60, 'modified': '2023-03-06T12:00:00+00:00'},
+}}
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    """
+    Time seen by the catalog, moved forward by the tests
+    """
+    now = [1000000.0]
+    monkeypatch.setattr(lab_catalog_module, 'time', types.SimpleNamespace(time=lambda: now[0]))
+    return now
+
+
+class Fetch(object):
+    """
+    Fetch of lab tiles counting the calls, the response can be changed and the fetch can be held until released
+    """
+
+    def __init__(self, response=None):
+        self.response = response if response is not None else LAB_TILES
+        self.calls = 0
+        self.release = threading.Event()
+        self.release.set()
+
+    def __call__(self):
+        self.release.wait(5)
+        self.calls += 1
+        if isinstance(self.response, Exception):
+            raise self.response
+        return self.response
+
+
+def _ids(labs):
+    return sorted(lab['id'] for lab in labs)
+
+
+def test_from_lab_tiles():
+    labs = CMLNetKitLabCatalog.from_lab_tiles(LAB_TILES)
+
+    assert labs[0] == {'id': 'a1', 'lab_title': 'Training 1', 'owner': 'admin', 'state': 'STARTED',
+                       'node_count': 4, 'link_count': 3, 'modified': '2023-03-06T10:00:00+00:00'}
+    # CML2 before version 2.1 returned the lab details without the "lab_tiles" key
+    assert CMLNetKitLabCatalog.from_lab_tiles(LAB_TILES['lab_tiles']) == labs
+
+
+@pytest.mark.parametrize('filters, expected', [({}, ['a1', 'a2', 'b1']),
+                                               ({'title': 'Training*'}, ['a1', 'a2']),
+                                               ({'title': 'training*'}, []),
+                                               ({'owner': 'admin'}, ['a1', 'b1']),
+                                               ({'state': 'stopped'}, ['a2', 'b1']),
+                                               ({'title': 'Training ?', 'owner': 'admin', 'state': 'STARTED'},
+                                                ['a1'])])
+def test_select(filters, expected):
+    assert _ids(CMLNetKitLabCatalog.select(CMLNetKitLabCatalog.from_lab_tiles(LAB_TILES), **filters)) == expected
+
+
+def test_catalog_used_until_ttl(tmp_path, clock):
+    catalog = CMLNetKitLabCatalog(str(tmp_path), KEY, 300)
+    fetch = Fetch()
+
+    assert _ids(catalog.labs(fetch)) == ['a1', 'a2', 'b1']
+    clock[0] += 300
+    assert _ids(catalog.labs(fetch)) == ['a1', 'a2', 'b1']
+    assert fetch.calls == 1
+
+    fetch.response = {'lab_tiles': {'c1': dict(LAB_TILES['lab_tiles']['a1'], id='c1')}}
+    clock[0] += 1
+    assert _ids(catalog.labs(fetch)) == ['c1']
+    assert fetch.calls == 2
+
+
+def test_stored_catalog_read_by_other_instance(tmp_path, clock):
+    CMLNetKitLabCatalog(str(tmp_path), KEY, 300).labs(Fetch())
+    fetch = Fetch()
+
+    assert _ids(CMLNetKitLabCatalog(str(tmp_path), KEY, 300).labs(fetch)) == ['a1', 'a2', 'b1']
+    assert fetch.calls == 0
+    # Catalog of other server or user is not used
+    assert CMLNetKitLabCatalog(str(tmp_path), 'cml.example.com:443 student', 300).load() is None
+    with open(CMLNetKitLabCatalog(str(tmp_path), KEY, 300).path) as f:
+        assert json.load(f)['key'] == KEY
+
+
+def test_catalog_in_memory_only(clock):
+    catalog = CMLNetKitLabCatalog(None, KEY, 300)
+    fetch = Fetch()
+
+    catalog.labs(fetch)
+    catalog.labs(fetch)
+    assert fetch.calls == 1
+
+
+def test_background_refresh(tmp_path, clock):
+    catalog = CMLNetKitLabCatalog(str(tmp_path), KEY, 300)
+    catalog.labs(Fetch())
+    clock[0] += 301
+    fetch = Fetch({'lab_tiles': {'c1': dict(LAB_TILES['lab_tiles']['a1'], id='c1')}})
+    fetch.release.clear()
+
+    # The older catalog is returned at once, one refresh is started for all the requests
+    assert _ids(catalog.labs(fetch, background=True)) == ['a1', 'a2', 'b1']
+    assert _ids(catalog.labs(fetch, background=True)) == ['a1', 'a2', 'b1']
+    refresh_thread = catalog._refresh_thread
+    assert refresh_thread.daemon is True
+    fetch.release.set()
+    refresh_thread.join(5)
+
+    assert fetch.calls == 1
+    assert _ids(catalog.labs(fetch, background=True)) == ['c1']
+
+
+def test_background_refresh_without_stored_catalog(tmp_path, clock):
+    fetch = Fetch()
+
+    assert _ids(CMLNetKitLabCatalog(str(tmp_path), KEY, 300).labs(fetch, background=True)) == ['a1', 'a2', 'b1']
+    assert fetch.calls == 1
+
+
+def test_background_refresh_error(tmp_path, clock, capsys):
+    catalog = CMLNetKitLabCatalog(str(tmp_path), KEY, 300)
+    catalog.labs(Fetch())
+    clock[0] += 301
+
+    assert _ids(catalog.labs(Fetch(RuntimeError('server down')), background=True)) == ['a1', 'a2', 'b1']
+    catalog._refresh_thread.join(5)
+
+    assert 'Lab catalog refresh failed: RuntimeError: server down' in capsys.readouterr().err
+    assert catalog.load() is None
+
+
+class SessionClient(object):
+    """
+    Client with the session created by virl2_client the same way as ClientLibrary does, without the login
+    """
+
+    def __init__(self, base_url):
+        from virl2_client.models.authentication import make_session
+
+        self._session = make_session(base_url, False)
+
+
+def test_fetch_lab_tiles_with_client_session(cml_server, make_options):
+    pytest.importorskip('virl2_client')
+    cml_server.script['/api/v0/populate_lab_tiles'] = [(200, {}, json.dumps(LAB_TILES).encode())]
+    cmlnetkit = CMLNetKit(make_options('-H', 'cml.example.com', '--list-labs', '--lab-title', 'Training*'),
+                          cml_client=SessionClient(cml_server.base_url))
+
+    assert cmlnetkit._fetch_lab_tiles() == LAB_TILES
+    assert _ids(cmlnetkit.get_labs(refresh=True)) == ['a1', 'a2']
+    assert cml_server.requests == [('GET', '/api/v0/populate_lab_tiles')] * 2
+
+
+def test_fetch_lab_tiles_error(cml_server, make_options):
+    httpx = pytest.importorskip('httpx')
+    pytest.importorskip('virl2_client')
+    cml_server.script['/api/v0/populate_lab_tiles'] = [(403, {}, b'{"description": "forbidden"}')]
+    cmlnetkit = CMLNetKit(make_options('-H', 'cml.example.com', '--list-labs'),
+                          cml_client=SessionClient(cml_server.base_url))
+
+    with pytest.raises(httpx.HTTPStatusError):
+        cmlnetkit._fetch_lab_tiles()
@@ -0,0 +1,84 @@
+# -*- coding: utf-8 -*-
+# (c) 2020-2023 Piotr Wojciechowski <piotr@it-playground.pl>
+# GNU General Public License v3.0+ (see COPYING or https://www.gnu.org/licenses/gpl-3.0.txt)
+from CMLNetKit.AutoNetKit.CMLNetKit import CMLNetKit
+from CMLNetKit.AutoNetKit.CMLNetKitYaml import CMLNetKitYaml
+
+
+class FakeNode(object):
+    """
+    Node of the lab on CML2 server. As in virl2_client, the startup configuration is set with the configuration
+    property, other attributes cannot be set.
+    """
+
+    __slots__ = ['label', 'patches']
+
+    def __init__(self, label, patches):
+        self.label = label
+        self.patches = patches
+
+    @property
+    def configuration(self):
+        raise AssertionError('Node configuration is not read when the lab is patched')
+
+    @configuration.setter
+    def configuration(self, value):
+        self.patches.append((self.label, value))
+
+
+class FakeLab(object):
+    def __init__(self, topology):
+        self.topology = topology
+        self.patches = []
+
+    def download(self):
+        return self.topology
+
+    def get_node_by_label(self, label):
+        return FakeNode(label, self.patches)
+
+
+class FakeClient(object):
+    def __init__(self, lab):
+        self.lab = lab
+
+    def join_existing_lab(self, lab_id, sync_lab=True):
+        return self.lab
+
+    def import_lab(self, topology, title):
+        raise AssertionError('The lab is not uploaded in in-place mode')
+
+
+def _read(path):
+    with open(path) as f:
+        return f.read()
+
+
+def test_lab_patch_sends_only_changed_nodes(tmp_path, lab_file, make_options, addressing_args):
+    original = CMLNetKitYaml.load(_read(lab_file()))
+    CMLNetKit(make_options('-i', lab_file(), '-o', str(tmp_path / 'updated.yaml'), *addressing_args)).run()
+    updated = CMLNetKitYaml.load(_read(str(tmp_path / 'updated.yaml')))
+
+    # Two nodes of the updated lab lost their addresses, the other nodes are up to date
+    lab = CMLNetKitYaml.load(_read(str(tmp_path / 'updated.yaml')))
+    for node_index in [2, 7]:
+        lab['nodes'][node_index]['configuration'] = original['nodes'][node_index]['configuration']
+    fake_lab = FakeLab(CMLNetKitYaml.dump(lab))
+
+    cmlnetkit = CMLNetKit(make_options('-H', 'cml.example.com', '-l', 'abc123', '--in-place', *addressing_args),
+                          cml_client=FakeClient(fake_lab))
+
+    assert cmlnetkit.process_lab() == "Lab abc123 updated, 2 node configurations changed"
+    assert fake_lab.patches == [(updated['nodes'][node_index]['label'], updated['nodes'][node_index]['configuration'])
+                                for node_index in [2, 7]]
+
+
+def test_lab_patch_without_changes(tmp_path, lab_file, make_options, addressing_args):
+    CMLNetKit(make_options('-i', lab_file(), '-o', str(tmp_path / 'updated.yaml'), *addressing_args)).run()
+    fake_lab = FakeLab(_read(str(tmp_path / 'updated.yaml')))
+
+    cmlnetkit = CMLNetKit(make_options('-H', 'cml.example.com', '-l', 'abc123', '--in-place', *addressing_args),
+                          cml_client=FakeClient(fake_lab))
+
+    assert cmlnetkit.process_lab() == "Lab configuration unchanged"
+    assert fake_lab.patches == []
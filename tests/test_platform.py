@@ -0,0 +1,96 @@
+# -*- coding: utf-8 -*-
+# (c) 2020-2023 Piotr Wojciechowski <piotr@it-playground.pl>
+# GNU General Public License v3.0+ (see COPYING or https://www.gnu.org/licenses/gpl-3.0.txt)
+import pytest
+
+from CMLNetKit.AutoNetKit.CMLNetKit import CMLNetKit
+from CMLNetKit.AutoNetKit.CMLNetKitConfigCache import CMLNetKitConfigCache
+from CMLNetKit.AutoNetKit.CMLNetKitPlatform import CMLNetKitInterfaceEdit, CMLNetKitPlatform
+
+ENGINES = sorted(CMLNetKitConfigCache.engines)
+
+
+def _config(interfaces):
+    """
+    Node configuration with given interfaces, list of tuples with the interface name and its lines
+    """
+    lines = ['hostname r1', '!']
+    for iface_name, iface_lines in interfaces:
+        lines += ['interface %s' % iface_name] + [' %s' % line for line in iface_lines] + ['!']
+    return '\n'.join(lines + ['end'])
+
+
+def _apply(engine, node_type, node_config, edits):
+    """
+    Apply the plans of the platform to the node configuration, edits are tuples with the plan, the interface and
+    the address
+
+    :return: Updated node configuration
+    """
+    platform = CMLNetKitPlatform.get(node_type)
+    node_parsed_config = CMLNetKitConfigCache.engines[engine](node_config)
+    CMLNetKit.apply_node_edits(node_parsed_config, [(getattr(platform, plan), iface_name,
+                                                     {'ip_addr': ip_addr, 'ip_netmask': '255.255.255.0'})
+                                                    for plan, iface_name, ip_addr in edits])
+    return node_parsed_config.dumps()
+
+
+@pytest.mark.parametrize('iface_name, other', [('GigabitEthernet1', 'interface GigabitEthernet10'),
+                                               ('GigabitEthernet1', 'interface GigabitEthernet1.100'),
+                                               ('GigabitEthernet0/1.20', 'interface GigabitEthernet0/1020'),
+                                               ('GigabitEthernet0/1.20', 'interface GigabitEthernet0/1.200'),
+                                               ('Ethernet1/1', 'interface Ethernet1/10')])
+def test_parentspec_matches_exact_name(iface_name, other):
+    parentspec = CMLNetKitInterfaceEdit.parentspec(iface_name)
+
+    assert parentspec.match('interface %s' % iface_name)
+    assert parentspec.match('interface  %s ' % iface_name)
+    assert parentspec.match(other) is None
+
+
+@pytest.mark.parametrize('engine', ENGINES)
+def test_management_does_not_change_interfaces_with_longer_name(engine):
+    unaddressed = ['no ip address', 'shutdown']
+    node_config = _config([('GigabitEthernet1', unaddressed), ('GigabitEthernet10', unaddressed),
+                           ('GigabitEthernet11', unaddressed)])
+
+    updated = _apply(engine, 'csr1000v', node_config, [('management', 'GigabitEthernet1', '192.168.0.1')])
+
+    assert updated == _config([('GigabitEthernet1', ['ip address 192.168.0.1 255.255.255.0', 'no shutdown']),
+                               ('GigabitEthernet10', unaddressed), ('GigabitEthernet11', unaddressed)])
+
+
+@pytest.mark.parametrize('engine', ENGINES)
+def test_subinterface_name_with_dot(engine):
+    unaddressed = ['no ip address', 'shutdown']
+    node_config = _config([('GigabitEthernet0/1', unaddressed), ('GigabitEthernet0/1.20', unaddressed),
+                           ('GigabitEthernet0/1020', unaddressed)])
+
+    updated = _apply(engine, 'iosv', node_config, [('peer', 'GigabitEthernet0/1.20', '10.100.0.1')])
+
+    assert updated == _config([('GigabitEthernet0/1', unaddressed),
+                               ('GigabitEthernet0/1.20', ['ip address 10.100.0.1 255.255.255.0', 'no shutdown']),
+                               ('GigabitEthernet0/1020', unaddressed)])
+
+
+@pytest.mark.parametrize('engine', ENGINES)
+@pytest.mark.parametrize('switchport, expected', [('switchport', 'no switchport'),
+                                                  ('no switchport', 'no switchport')])
+def test_iosvl2_management_is_routed_port(engine, switchport, expected):
+    node_config = _config([('GigabitEthernet0/0', [switchport, 'no ip address', 'shutdown'])])
+
+    updated = _apply(engine, 'iosvl2', node_config, [('management', 'GigabitEthernet0/0', '192.168.0.1')])
+
+    assert updated == _config([('GigabitEthernet0/0', [expected, 'ip address 192.168.0.1 255.255.255.0',
+                                                       'no shutdown'])])
+
+
+@pytest.mark.parametrize('engine', ENGINES)
+@pytest.mark.parametrize('node_type', ['iosv', 'csr1000v', 'cat8000v', 'nxosv', 'nxosv9000', 'iosvl2'])
+@pytest.mark.parametrize('shutdown', ['shutdown', 'no shutdown'])
+def test_loopback_is_enabled(engine, node_type, shutdown):
+    node_config = _config([('Loopback0', ['no ip address', shutdown])])
+
+    updated = _apply(engine, node_type, node_config, [('loopback', 'Loopback0', '10.0.0.1')])
+
+    assert updated == _config([('Loopback0', ['ip address 10.0.0.1 255.255.255.255', 'no shutdown'])])
@@ -0,0 +1,48 @@
+# -*- coding: utf-8 -*-
+# (c) 2020-2023 Piotr Wojciechowski <piotr@it-playground.pl>
+# GNU General Public License v3.0+ (see COPYING or https://www.gnu.org/licenses/gpl-3.0.txt)
+import pytest
+
+from CMLNetKit.AutoNetKit.CMLNetKit import CMLNetKit
+from CMLNetKit.AutoNetKit.CMLNetKitConfigCache import CMLNetKitConfigCache
+from CMLNetKit.AutoNetKit.CMLNetKitTransform import CMLNetKitTransform
+
+
+def _read(path):
+    with open(path) as f:
+        return f.read()
+
+
+@pytest.fixture
+def transform_runs(monkeypatch):
+    """
+    Number of nodes updated by worker processes in each run. Labs of a few nodes are updated by the workers too.
+    """
+    runs = []
+    run = CMLNetKitTransform.run
+
+    def counted_run(self, tasks):
+        runs.append(len(tasks))
+        return run(self, tasks)
+
+    monkeypatch.setattr(CMLNetKitTransform, 'min_nodes', 4)
+    monkeypatch.setattr(CMLNetKitTransform, 'run', counted_run)
+    return runs
+
+
+@pytest.mark.parametrize('config_engine', sorted(CMLNetKitConfigCache.engines))
+def test_jobs_output_identical(tmp_path, lab_file, make_options, addressing_args, transform_runs, config_engine):
+    if config_engine == 'ciscoconfparse':
+        pytest.importorskip('ciscoconfparse')
+    input_file = lab_file(nodes=24, link_density=2)
+    outputs = {}
+    for jobs in [1, 3]:
+        output_file = str(tmp_path / ('jobs%d.yaml' % jobs))
+        CMLNetKit(make_options('-i', input_file, '-o', output_file, '--jobs', str(jobs), '--config-engine',
+                               config_engine, *addressing_args)).run()
+        outputs[jobs] = _read(output_file)
+
+    # Only the run with more jobs used the worker processes, for all the nodes
+    assert transform_runs == [24]
+    assert outputs[3] == outputs[1]
+    assert outputs[1] != _read(input_file)